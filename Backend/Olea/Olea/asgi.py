@@ -3,6 +3,14 @@ ASGI config for Olea project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Served this way, registration, forgot-password and Razorpay order creation
+use the async views in backend.async_views (see ``ASYNC_VIEWS``), which don't
+hold a thread while SMTP or the gateway respond; every other view is the DRF
+view WSGI serves, run in Django's thread pool. Run it with:
+
+    uvicorn Olea.asgi:application --workers 4
+    gunicorn Olea.asgi:application -c gunicorn.conf.py
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -12,5 +20,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Olea.settings')
+os.environ.setdefault('OLEA_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
@@ -10,7 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
+from corsheaders.defaults import default_headers
 from datetime import timedelta
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backend.middleware.PerformanceMiddleware',
+    'backend.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -55,6 +59,28 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Samples kept per view for the percentiles served on /api/_metrics/
+PERFORMANCE_METRICS_WINDOW = 1024
+
+# backend.middleware.CompressionMiddleware: 'br' and 'zstd' need the brotli / zstandard packages.
+# GET bodies of CACHE_MIN_SIZE bytes or more are compressed once per distinct content and cached.
+COMPRESSION = {
+    'ENCODINGS': ('zstd', 'br', 'gzip'),
+    'LEVELS': {'zstd': 3, 'br': 5, 'gzip': 6},
+    'MIN_SIZE': 1024,
+    'CACHE_MIN_SIZE': 32 * 1024,
+    'CACHE_TIMEOUT': 300,
+}
+
+# N+1 / slow query detection (backend.query_inspector). On staging, add
+# 'backend.middleware.QueryInspectorMiddleware' to MIDDLEWARE to log offenders.
+QUERY_INSPECTOR = {
+    'THRESHOLD': 5,
+    'SLOW_MS': 100,
+    'ACTION': 'warn',
+    'REPORT_PATH': None,
+}
+
 ROOT_URLCONF = 'Olea.urls'
 
 TEMPLATES = [
@@ -73,7 +99,11 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'Olea.wsgi.application'
+ASGI_APPLICATION = 'Olea.asgi.application'
 
+# Route registration, forgot-password and Razorpay order creation to backend.async_views.
+# Olea.asgi turns this on; see gunicorn.conf.py for the worker setup.
+ASYNC_VIEWS = os.environ.get('OLEA_ASYNC_VIEWS', '0') == '1'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -99,11 +129,21 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'backend.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # orjson-backed when it is installed, identical output to DRF's JSON classes
+    'DEFAULT_RENDERER_CLASSES': (
+        'backend.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'backend.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 SIMPLE_JWT = {
@@ -113,6 +153,21 @@ SIMPLE_JWT = {
 }
 
 
+# How long an authenticated user stays cached between token checks. Saves and
+# deletes invalidate immediately in the process that made them; with LocMemCache
+# other processes may serve the old row for up to this long, so use Redis in production.
+AUTH_USER_CACHE_TIMEOUT = 60
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    } if os.environ.get('REDIS_URL') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -137,6 +192,28 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+STORAGES = {
+    'default': {'BACKEND': 'backend.media.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# backend.media.serve. OFFLOAD is None (Python sends the file), 'x-accel-redirect' (nginx: an
+# `internal` location at ACCEL_PREFIX aliased to MEDIA_ROOT) or 'x-sendfile' (Apache/lighttpd).
+# With DEBUG off and no OFFLOAD, MEDIA_URL isn't routed to Django at all: the web server
+# serves MEDIA_ROOT there directly, so HASHED_URLS falls back to plain names (after
+# dedupe_media, every name is its own hashed URL).
+MEDIA_SERVING = {
+    'HASHED_URLS': True,
+    'MAX_AGE': 60 * 60 * 24 * 365,
+    'UNHASHED_MAX_AGE': 60 * 60,
+    'OFFLOAD': os.environ.get('MEDIA_OFFLOAD') or None,
+    'ACCEL_PREFIX': '/protected-media/',
+}
+
+# Uploads go straight to a temporary file and are hashed as they arrive, so
+# ContentAddressedStorage can move them into place without reading them again
+FILE_UPLOAD_HANDLERS = ['backend.media.HashingFileUploadHandler']
+
 
 AUTH_USER_MODEL = 'backend.CustomUser'
 
@@ -144,6 +221,35 @@ AUTH_USER_MODEL = 'backend.CustomUser'
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
 ]
+CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed', 'Retry-After']
+
+
+# Stored checkout/payment responses are replayed for retries within this window
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+# Lifetime of the in-flight lock; a crashed request frees its key after this long
+IDEMPOTENCY_LOCK_TIMEOUT = 30
+
+
+# Token buckets in the default cache (see backend.ratelimit). "N/period" is the burst
+# size and the rate the bucket refills at; each endpoint has one bucket per client IP
+# and one per account (the submitted email, or the signed-in user for checkout)
+RATE_LIMITS = {
+    'ENABLED': os.environ.get('RATE_LIMITS_ENABLED', '1') != '0',
+    # Proxies in front of Django that append to X-Forwarded-For; 0 uses REMOTE_ADDR
+    'TRUSTED_PROXIES': int(os.environ.get('RATE_LIMIT_TRUSTED_PROXIES', '0')),
+    'RATES': {
+        'login': {'ip': '30/minute', 'account': '10/minute'},
+        'forgot_password': {'ip': '10/hour', 'account': '3/hour'},
+        'checkout': {'ip': '30/minute', 'account': '10/minute'},
+        'create_razorpay_order': {'ip': '30/minute', 'account': '10/minute'},
+    },
+}
+
+
+GUEST_CART_COOKIE_NAME = 'olea_guest_cart'
+GUEST_CART_COOKIE_AGE = 60 * 60 * 24 * 30
 
 
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -157,5 +263,19 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
 RAZORPAY_KEY_ID = "rzp_test_RVkrzDquxzglxy"
 RAZORPAY_KEY_SECRET = "Hk3iPwodmvNNtiWUz5zECO99"
+# No default: with it unset every webhook is rejected
+RAZORPAY_WEBHOOK_SECRET = os.environ.get('RAZORPAY_WEBHOOK_SECRET', '')
+
+# backend.gateway: timeouts in seconds; BASE_URL can point at `manage.py fake_razorpay`
+RAZORPAY_GATEWAY = {
+    'BASE_URL': os.environ.get('RAZORPAY_API_BASE', 'https://api.razorpay.com/v1'),
+    'CONNECT_TIMEOUT': 3.0,
+    'READ_TIMEOUT': 10.0,
+    'MAX_RETRIES': 2,
+    'BACKOFF': 0.2,
+    'POOL_SIZE': 20,
+    'FAILURE_THRESHOLD': 5,
+    'RESET_TIMEOUT': 30,
+}
 
 
@@ -15,13 +15,22 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path , include
+from django.urls import path , include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+
+from backend import media
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/' , include('backend.urls')),
+]
+
+media_urlpatterns = [
+    re_path(rf'^{settings.MEDIA_URL.lstrip("/")}(?P<path>.+)$', media.serve, name='media'),
+]
 
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# In production Python only resolves media and hands the bytes to the proxy (OFFLOAD);
+# without that, the web server serves MEDIA_ROOT itself
+if settings.DEBUG or settings.MEDIA_SERVING['OFFLOAD']:
+    urlpatterns += media_urlpatterns
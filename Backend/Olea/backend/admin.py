@@ -1,11 +1,195 @@
+from datetime import datetime
+
 from django.contrib import admin
-from .models import Cart,Product,Wishlist,Order,OrderItem,CustomUser
+from django.core.paginator import Paginator
+from django.db.models import QuerySet
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .models import ArchivedOrder,ArchivedOrderItem,Cart,Product,Wishlist,Order,OrderItem,CustomUser
+from .order_events import STATUS_FIELDS, OrderEventWriter
+
+
+class CappedCount(int):
+    """A row count that stopped at the cap. Pages are numbered from the int; templates show "10000+"."""
+
+    def __str__(self):
+        return f'{int(self)}+'
+
+
+class CappedCountPaginator(Paginator):
+    """Counts at most ``limit`` rows, so a filtered change list never scans the whole table to number its pages."""
+
+    limit = 10000
+
+    @cached_property
+    def count(self):
+        count = self.object_list[:self.limit].count()
+        return CappedCount(count) if count >= self.limit else count
+
+
+class IndexedDatesQuerySet(QuerySet):
+    """datetimes() for the admin date hierarchy without a DISTINCT over every row.
+
+    Django truncates the column for each row and de-duplicates the result; this
+    instead asks, for each year/month/day between the first and last value,
+    whether any row falls in it, which is one index range probe per period.
+    """
+
+    max_periods = 366
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None):
+        # Two ORDER BY ... LIMIT 1 probes; SQLite scans the table for MIN() and MAX() in one query
+        values = self.exclude(**{f'{field_name}__isnull': True}).values_list(field_name, flat=True)
+        first = values.order_by(field_name).first()
+        if first is None:
+            return []
+        last = values.order_by(f'-{field_name}').first()
+        tzinfo = tzinfo or timezone.get_current_timezone()
+        first, last = first.astimezone(tzinfo), last.astimezone(tzinfo)
+        periods = list(self.periods(first, last, kind, tzinfo))
+        if kind not in ('year', 'month', 'day') or len(periods) > self.max_periods:
+            return super().datetimes(field_name, kind, order, tzinfo)
+        found = [
+            start for start, end in periods
+            if self.filter(**{f'{field_name}__gte': start, f'{field_name}__lt': end}).exists()
+        ]
+        return found if order == 'ASC' else found[::-1]
+
+    @staticmethod
+    def periods(first, last, kind, tzinfo):
+        if kind == 'year':
+            starts = [datetime(year, 1, 1) for year in range(first.year, last.year + 2)]
+        elif kind == 'month':
+            months = range(first.year * 12 + first.month - 1, last.year * 12 + last.month + 1)
+            starts = [datetime(month // 12, month % 12 + 1, 1) for month in months]
+        else:
+            starts = [datetime.combine(first.date(), datetime.min.time())]
+            while starts[-1].date() <= last.date():
+                starts.append(datetime.fromordinal(starts[-1].toordinal() + 1))
+        starts = [timezone.make_aware(start, tzinfo) for start in starts]
+        return zip(starts, starts[1:])
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    # Skip the unfiltered COUNT(*) next to the filtered one
+    show_full_result_count = False
+    paginator = CappedCountPaginator
+    list_per_page = 50
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if self.date_hierarchy:
+            queryset = IndexedDatesQuerySet(self.model, query=queryset.query.chain(), using=queryset.db)
+        return queryset
+
+
+# Search fields use exact (=) lookups on unique columns, or a name prefix (^) over a
+# NOCASE index, so they hit an index; they also back the autocomplete widgets that
+# replace full <select>s of users and products
+
+@admin.register(CustomUser)
+class CustomUserAdmin(LargeTableAdmin):
+    list_display = ('username', 'email', 'role', 'is_staff', 'is_active', 'date_joined')
+    list_filter = ('role', 'is_staff', 'is_active')
+    search_fields = ('=username', '=email')
+
+
+@admin.register(Product)
+class ProductAdmin(LargeTableAdmin):
+    list_display = ('name', 'category', 'price', 'stock', 'status', 'created_at', 'archived_at')
+    list_filter = ('category', 'status')
+    search_fields = ('^name',)
+    actions = ('archive_products',)
+
+    def get_queryset(self, request):
+        # The default manager hides archived products; they stay editable here
+        return Product.all_objects.order_by(*(self.get_ordering(request) or ()))
+
+    @admin.action(description='Archive selected products')
+    def archive_products(self, request, queryset):
+        now = timezone.now()
+        archived = queryset.filter(archived_at__isnull=True).update(status='inactive', archived_at=now, updated_at=now)
+        self.message_user(request, f'Archived {archived} products.')
+
+
+@admin.register(Cart)
+class CartAdmin(LargeTableAdmin):
+    list_display = ('user', 'product', 'quantity', 'updated_at')
+    list_select_related = ('user', 'product')
+    autocomplete_fields = ('user', 'product')
+    search_fields = ('=user__username', '=user__email')
+
+
+@admin.register(Wishlist)
+class WishlistAdmin(LargeTableAdmin):
+    list_display = ('user', 'product', 'created_at')
+    list_select_related = ('user', 'product')
+    autocomplete_fields = ('user', 'product')
+    search_fields = ('=user__username', '=user__email')
+
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    autocomplete_fields = ('product',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
+
+@admin.register(Order)
+class OrderAdmin(LargeTableAdmin):
+    list_display = ('order_id', 'user', 'item_count', 'total_amount', 'payment_method', 'status', 'payment_status', 'created_at')
+    list_select_related = ('user',)
+    list_filter = ('status', 'payment_status')
+    date_hierarchy = 'created_at'
+    search_fields = ('=order_id', '=razorpay_payment_id', '=user__username', '=user__email')
+    autocomplete_fields = ('user',)
+    inlines = (OrderItemInline,)
+
+    def save_model(self, request, obj, form, change):
+        # The change view already runs in a transaction
+        with OrderEventWriter('admin_site', request.user) as events:
+            super().save_model(request, obj, form, change)
+            if change:
+                events.add_changes(obj.pk, form.initial, {field: getattr(obj, field) for field in STATUS_FIELDS})
+            else:
+                events.add_created(obj)
+
+
+@admin.register(OrderItem)
+class OrderItemAdmin(LargeTableAdmin):
+    list_display = ('order', 'product_name', 'quantity', 'price', 'created_at')
+    list_select_related = ('order',)
+    autocomplete_fields = ('order', 'product')
+    search_fields = ('=order__order_id',)
+
+
+class ReadOnlyAdminMixin:
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class ArchivedOrderItemInline(ReadOnlyAdminMixin, admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+    fields = ('product_name', 'product_category', 'product_image', 'quantity', 'price')
 
-# Register your models here.
 
-admin.site.register(Cart),
-admin.site.register(Product),
-admin.site.register(Wishlist),
-admin.site.register(OrderItem),
-admin.site.register(Order),
-admin.site.register(CustomUser),
\ No newline at end of file
+# Archived orders are finished: archive_orders moves them here and nothing edits them afterwards.
+# The archive carries only the order_id and user indexes, so there's no date hierarchy
+# and no payment id search
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(ReadOnlyAdminMixin, LargeTableAdmin):
+    list_display = ('order_id', 'user', 'item_count', 'total_amount', 'payment_method', 'status', 'payment_status', 'created_at', 'archived_at')
+    list_select_related = ('user',)
+    list_filter = ('status', 'payment_status')
+    search_fields = ('=order_id', '=user__username', '=user__email')
+    inlines = (ArchivedOrderItemInline,)
@@ -0,0 +1,68 @@
+"""
+Archival of products and orders.
+
+Products are archived (``Product.archive``) rather than deleted: a delete
+cascades through every cart, guest cart and wishlist row in one transaction
+and locks those tables for as long as it runs. Reads already skip archived
+products; ``purge_archived_batch`` removes the rows still pointing at them a
+few hundred at a time, each batch in its own short transaction, and is run
+by ``manage.py purge_archived_products``.
+
+Delivered and cancelled orders past a cutoff are moved, with their items, to
+ArchivedOrder / ArchivedOrderItem by ``archive_orders_batch`` (``manage.py
+archive_orders``), keeping Order and OrderItem and their indexes down to the
+orders still in flight. ``FastOrderHistorySerializer`` reads both tables back
+as one list.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, Cart, GuestCartItem, Order, OrderItem, Product, Wishlist
+
+PRODUCT_REFERENCES = (Cart, GuestCartItem, Wishlist)
+ARCHIVED_STATUSES = ('delivered', 'cancelled')
+
+
+def purge_archived_batch(batch_size=500):
+    """Delete up to ``batch_size`` cart and wishlist rows of archived products; returns how many went."""
+    archived = Product.all_objects.filter(archived_at__isnull=False).values('pk')
+    deleted = 0
+    for model in PRODUCT_REFERENCES:
+        if deleted >= batch_size:
+            break
+        pks = list(model.objects.filter(product__in=archived).values_list('pk', flat=True)[:batch_size - deleted])
+        if pks:
+            deleted += model.objects.filter(pk__in=pks).delete()[0]
+    return deleted
+
+
+def archivable_orders(cutoff):
+    return Order.objects.filter(status__in=ARCHIVED_STATUSES, created_at__lt=cutoff)
+
+
+def copied_columns(model):
+    """The archive model's columns that come straight from the hot table."""
+    return [field.attname for field in model._meta.concrete_fields if field.name != 'archived_at']
+
+
+def archive_orders_batch(cutoff, batch_size=500):
+    """Move up to ``batch_size`` finished orders created before ``cutoff`` to the archive; returns how many moved.
+
+    Copy and delete share one transaction, so an interrupted run loses nothing
+    and the next one starts with the orders still left.
+    """
+    with transaction.atomic():
+        orders = list(
+            archivable_orders(cutoff).select_for_update().order_by('pk').values(*copied_columns(ArchivedOrder))[:batch_size]
+        )
+        if not orders:
+            return 0
+        pks = [order['id'] for order in orders]
+        items = OrderItem.objects.filter(order_id__in=pks).values(*copied_columns(ArchivedOrderItem))
+        now = timezone.now()
+        ArchivedOrder.objects.bulk_create([ArchivedOrder(**order, archived_at=now) for order in orders])
+        ArchivedOrderItem.objects.bulk_create([ArchivedOrderItem(**item) for item in items])
+        # Cascades to the items; the OrderEvent log is kept
+        Order.objects.filter(pk__in=pks).delete()
+    return len(orders)
+
@@ -0,0 +1,125 @@
+"""
+Async twins of the endpoints that wait on the network: Razorpay order
+creation, registration (welcome email) and forgot-password (OTP email).
+
+Routed instead of the sync views when ``settings.ASYNC_VIEWS`` is on, which
+Olea.asgi does. The gateway call goes through the httpx side of ``gateway``
+and SMTP sends run in a thread of their own, so a worker's event loop keeps
+serving other requests meanwhile.
+
+Everything else is the sync code: ``AsyncAPIView`` runs DRF's authentication,
+permissions and throttles, ``rate_limited`` and ``idempotent`` wrap async views
+as they do sync ones, and each view calls the same helpers as its twin in
+``views`` through ``sync_to_async``. Payment verification stays sync: it is a
+local HMAC check and database writes, with nothing to wait on.
+"""
+from asgiref.sync import sync_to_async
+from rest_framework import status
+from rest_framework.decorators import permission_classes
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from .gateway import get_gateway
+from .idempotency import idempotent
+from .models import CustomUser
+from .ratelimit import rate_limited, submitted_email, user_id
+from .serializer import RegisterSerializer
+from .views import (
+    EMAIL_REQUIRED, NO_USER_WITH_EMAIL, otp_sent_response, plan_razorpay_order, razorpay_order_failed_response,
+    record_razorpay_order, registered_response, send_otp_email, send_welcome_email,
+)
+
+
+class AsyncAPIView(APIView):
+    """APIView whose handlers are coroutines. DRF's request checks and exception handling run in a thread."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if not isinstance(response, Response):
+                # OPTIONS is answered by APIView itself, synchronously
+                response = await response
+        except Exception as exc:
+            response = await sync_to_async(self.handle_exception)(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+def async_api_view(http_method_names):
+    """@api_view for ``async def`` views; reads @permission_classes and the like from the function the same way."""
+
+    def decorator(func):
+        view = type(func.__name__, (AsyncAPIView,), {
+            'http_method_names': [method.lower() for method in http_method_names] + ['options'],
+            '__doc__': func.__doc__,
+        })
+        for method in http_method_names:
+            async def handler(self, *args, **kwargs):
+                return await func(*args, **kwargs)
+            setattr(view, method.lower(), handler)
+        for setting in ('renderer_classes', 'parser_classes', 'authentication_classes', 'throttle_classes'):
+            setattr(view, setting, getattr(func, setting, getattr(api_settings, f'DEFAULT_{setting.upper()}')))
+        view.permission_classes = getattr(func, 'permission_classes', APIView.permission_classes)
+        view.__module__ = func.__module__
+        return view.as_view()
+
+    return decorator
+
+
+@async_api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@rate_limited('create_razorpay_order', account=user_id)
+@idempotent
+async def create_razorpay_order(request):
+    plan = await sync_to_async(plan_razorpay_order)(request)
+    if isinstance(plan, Response):
+        return plan
+    _, _, amount_paise = plan
+    try:
+        razorpay_order = await get_gateway().acreate_order(amount_paise, currency="INR")
+        return await sync_to_async(record_razorpay_order)(request, plan, razorpay_order)
+    except Exception as e:
+        return razorpay_order_failed_response(e)
+
+
+@async_api_view(["POST"])
+@permission_classes([AllowAny])
+async def register(request):
+    serializer = RegisterSerializer(data=request.data)
+    if not await sync_to_async(serializer.is_valid)():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    user = await sync_to_async(serializer.save)(is_active=True, is_verified=True)
+    await sync_to_async(send_welcome_email, thread_sensitive=False)(user)
+    return await sync_to_async(registered_response)(request, user)
+
+
+@async_api_view(["POST"])
+@permission_classes([AllowAny])
+@rate_limited('forgot_password', account=submitted_email)
+async def forgot_password(request):
+    email = request.data.get("email")
+    if not email:
+        return Response(EMAIL_REQUIRED, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        user = await CustomUser.objects.aget(email=email)
+    except CustomUser.DoesNotExist:
+        return Response(NO_USER_WITH_EMAIL, status=status.HTTP_404_NOT_FOUND)
+
+    otp = await sync_to_async(user.generate_otp)()
+    await sync_to_async(send_otp_email, thread_sensitive=False)(user, otp)
+    return otp_sent_response(user)
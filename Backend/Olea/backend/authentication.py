@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+# What permission checks read. Only these are cached (never the password hash);
+# any other attribute of request.user is loaded from the database when first used
+CACHED_USER_FIELDS = ('id', 'is_active', 'is_staff', 'is_superuser', 'role')
+
+
+def user_cache_key(user_id):
+    return f'auth:user-fields:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+def invalidate_cached_users(user_ids):
+    cache.delete_many([user_cache_key(user_id) for user_id in user_ids])
+
+
+def load_deferred_fields(user):
+    """Load, in one query, the fields a cache hit left deferred on ``user``, before it is serialized."""
+    deferred = user.get_deferred_fields()
+    if deferred:
+        user.refresh_from_db(fields=deferred)
+    return user
+
+
+def tokens_for_user(user):
+    """RefreshToken carrying the access claims the SPA and permission checks read."""
+    refresh = RefreshToken.for_user(user)
+    refresh['role'] = user.role
+    refresh['is_staff'] = user.is_staff
+    refresh['is_active'] = user.is_active
+    return refresh
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that resolves the user from a short-lived cache instead of a query per request.
+
+    The cache holds CACHED_USER_FIELDS only; a hit builds the user with every
+    other field deferred. Entries are dropped whenever the user is saved or
+    deleted (see backend.signals) or one of those fields is changed with
+    QuerySet.update() (see UserQuerySet), so blocking a user takes effect on
+    their next request.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        key = user_cache_key(user_id)
+        values = cache.get(key)
+        if values is None:
+            user = super().get_user(validated_token)
+            cache.set(key, {field: getattr(user, field) for field in CACHED_USER_FIELDS}, settings.AUTH_USER_CACHE_TIMEOUT)
+            return user
+        # from_db() takes the values in model field order and defers the fields left out
+        fields = [field.attname for field in self.user_model._meta.concrete_fields if field.attname in values]
+        user = self.user_model.from_db(DEFAULT_DB_ALIAS, fields, [values[field] for field in fields])
+        if not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return user
@@ -0,0 +1,77 @@
+"""
+Content-Encoding negotiation and the precompressed-body cache behind
+``middleware.CompressionMiddleware``.
+
+gzip is always available; brotli ("br") and zstandard ("zstd") are used when
+their packages are installed. Large GET bodies are compressed once per
+distinct content: the compressed bytes are cached under a digest of the body,
+so an unchanged catalogue is served from the cache instead of being
+recompressed on every request.
+"""
+import gzip
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CODECS = {'gzip': lambda data, level: gzip.compress(data, compresslevel=level, mtime=0)}
+if brotli is not None:
+    CODECS['br'] = lambda data, level: brotli.compress(data, quality=level)
+if zstandard is not None:
+    CODECS['zstd'] = lambda data, level: zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def parse_accept_encoding(header):
+    """{'gzip': 1.0, 'br': 0.5, ...} from an Accept-Encoding header."""
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip().replace(' ', '')
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate(header):
+    """The best coding both sides support; ties go to the order in COMPRESSION['ENCODINGS']."""
+    accepted = parse_accept_encoding(header or '')
+    best, best_quality = None, 0.0
+    for coding in settings.COMPRESSION['ENCODINGS']:
+        if coding not in CODECS:
+            continue
+        quality = accepted.get(coding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(data, coding, cacheable=False):
+    config = settings.COMPRESSION
+    level = config['LEVELS'][coding]
+    if not cacheable or len(data) < config['CACHE_MIN_SIZE']:
+        return CODECS[coding](data, level)
+
+    key = f'compressed:{coding}:{level}:{hashlib.blake2b(data, digest_size=16).hexdigest()}'
+    body = cache.get(key)
+    if body is None:
+        body = CODECS[coding](data, level)
+        cache.set(key, body, config['CACHE_TIMEOUT'])
+    return body
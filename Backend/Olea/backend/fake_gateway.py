@@ -0,0 +1,141 @@
+"""
+Local HTTP stand-in for the parts of the Razorpay API the backend uses:
+creating orders, listing an order's payments and fetching a payment.
+
+Used by the tests and by ``manage.py fake_razorpay``. Failures and latency
+can be injected to exercise the retries and circuit breaker in ``gateway``.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+
+
+class FakeRazorpay:
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.ids = count(1)
+        self.orders = {}
+        self.payments = {}
+        self.requests = []
+        self.failures = []
+        self.server = ThreadingHTTPServer((host, port), self.handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def fail_next(self, *status_codes):
+        """Answer the next requests with these HTTP statuses (0 drops the connection)."""
+        with self.lock:
+            self.failures.extend(status_codes)
+
+    def add_order(self, amount=10000, currency='INR', order_id=None):
+        with self.lock:
+            order_id = order_id or f'order_fake{next(self.ids)}'
+            self.orders[order_id] = {
+                'id': order_id, 'entity': 'order', 'amount': amount, 'amount_paid': 0,
+                'currency': currency, 'status': 'created', 'receipt': None, 'created_at': int(time.time()),
+            }
+            return self.orders[order_id]
+
+    def add_payment(self, order_id, status='captured', payment_id=None):
+        with self.lock:
+            payment_id = payment_id or f'pay_fake{next(self.ids)}'
+            order = self.orders.get(order_id, {})
+            self.payments[payment_id] = {
+                'id': payment_id, 'entity': 'payment', 'amount': order.get('amount', 0),
+                'currency': order.get('currency', 'INR'), 'status': status, 'order_id': order_id,
+                'captured': status == 'captured', 'created_at': int(time.time()),
+            }
+            if status == 'captured' and order:
+                order.update(status='paid', amount_paid=order['amount'])
+            return self.payments[payment_id]
+
+    def handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self.dispatch()
+
+            def do_POST(self):
+                self.dispatch()
+
+            def dispatch(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}')
+                with fake.lock:
+                    fake.requests.append((self.command, self.path))
+                    failure = fake.failures.pop(0) if fake.failures else None
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if failure == 0:
+                    self.close_connection = True
+                    self.connection.close()
+                    return
+                if failure:
+                    return self.reply(failure, {'error': {'code': 'SERVER_ERROR', 'description': 'Injected failure'}})
+                status_code, payload = fake.route(self.command, self.path.split('?')[0], body)
+                self.reply(status_code, payload)
+
+            def reply(self, status_code, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status_code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up (read timeout tests)
+                    pass
+
+        return Handler
+
+    def route(self, method, path, body):
+        if method == 'POST' and path == '/v1/orders':
+            order = self.add_order(body.get('amount', 0), body.get('currency', 'INR'))
+            order['receipt'] = body.get('receipt')
+            return 200, order
+
+        match = re.fullmatch(r'/v1/orders/([\w-]+)/payments', path)
+        if method == 'GET' and match:
+            if match[1] not in self.orders:
+                return self.not_found('order')
+            with self.lock:
+                items = [payment for payment in self.payments.values() if payment['order_id'] == match[1]]
+            return 200, {'entity': 'collection', 'count': len(items), 'items': items}
+
+        match = re.fullmatch(r'/v1/payments/([\w-]+)', path)
+        if method == 'GET' and match:
+            if match[1] not in self.payments:
+                return self.not_found('payment')
+            return 200, self.payments[match[1]]
+
+        return self.not_found('resource')
+
+    @staticmethod
+    def not_found(entity):
+        return 400, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': f'The id provided does not exist for {entity}'}}
@@ -0,0 +1,355 @@
+"""
+Read-only serializers for the large list endpoints.
+
+Each class declares the same fields, in the same order, as its counterpart in
+``serializer`` and builds plain dicts from ``QuerySet.values()`` rows instead
+of model instances and per-field DRF ``to_representation`` calls. Forward
+relations are joined into the same query; reverse ones (order items) are
+fetched with one extra query per chunk of parents; ``Inline`` groups columns
+of the row itself, like a DRF serializer with ``source='*'``. ?fields= / ?omit= are
+honoured like on the DRF serializers, and unselected columns and relations
+are not queried at all. ``FastSerializerTests`` checks the output stays
+identical to the DRF serializers.
+"""
+from decimal import Decimal
+from itertools import islice
+
+from django.conf import settings
+from django.utils import timezone
+
+from .middleware import measure_serialization
+from .models import ArchivedOrder, ArchivedOrderItem, Cart, CustomUser, GuestCartItem, Order, OrderItem, Product, Wishlist
+from .serializer import descend, select_fields, sparse_fieldsets
+
+
+class Column:
+    """A model column; ``kind`` picks the matching DRF representation (None passes the value through)."""
+
+    def __init__(self, source=None, kind=None):
+        self.source = source
+        self.kind = kind
+
+
+class Nested:
+    """A forward foreign key rendered with another FastSerializer, joined into the parent query."""
+
+    def __init__(self, serializer, source=None):
+        self.serializer = serializer
+        self.source = source
+
+
+class Inline:
+    """Columns of the parent row itself rendered as a nested object (DRF ``source='*'``)."""
+
+    def __init__(self, serializer):
+        self.serializer = serializer
+
+
+class NestedMany:
+    """A reverse foreign key (``fk`` names the child's field pointing at the parent)."""
+
+    def __init__(self, serializer, fk):
+        self.serializer = serializer
+        self.fk = fk
+
+
+class FastSerializer:
+    model = None
+    fields = {}
+    chunk_size = 2000
+
+    def __init__(self, queryset, context=None, fields=None, omit=None):
+        """``fields``/``omit`` are trees from serializer.parse_field_paths; by default they come from the request."""
+        self.queryset = queryset
+        self.context = context or {}
+        self.request = self.context.get('request')
+        self.timezone = timezone.get_current_timezone() if settings.USE_TZ else None
+        if fields is None and omit is None:
+            fields, omit = sparse_fieldsets(self.request)
+        self.field_tree, self.omit_tree = fields, omit or {}
+
+    # Query
+
+    @classmethod
+    def selected(cls, field_tree, omit_tree):
+        return [(name, cls.fields[name]) for name in select_fields(cls.fields, field_tree, omit_tree)]
+
+    @classmethod
+    def columns(cls, field_tree=None, omit_tree=None, prefix=''):
+        # id is always read: it keys reverse relations and tells a null foreign key apart
+        omit_tree = omit_tree or {}
+        columns = [prefix + 'id']
+        for name, spec in cls.selected(field_tree, omit_tree):
+            if isinstance(spec, Column) and prefix + (spec.source or name) not in columns:
+                columns.append(prefix + (spec.source or name))
+            elif isinstance(spec, Nested):
+                columns.extend(spec.serializer.columns(
+                    *descend(field_tree, omit_tree, name), prefix=f'{prefix}{spec.source or name}__'
+                ))
+            elif isinstance(spec, Inline):
+                inline = spec.serializer.columns(*descend(field_tree, omit_tree, name), prefix=prefix)
+                columns.extend(column for column in inline if column not in columns)
+        return columns
+
+    def iter_rows(self):
+        """Raw ``values()`` rows; reverse relations are attached as lists of child rows."""
+        many = [
+            (name, spec, descend(self.field_tree, self.omit_tree, name))
+            for name, spec in self.selected(self.field_tree, self.omit_tree) if isinstance(spec, NestedMany)
+        ]
+        rows = self.rows(self.columns(self.field_tree, self.omit_tree)).iterator(chunk_size=self.chunk_size)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                return
+            for name, spec, trees in many:
+                children = {}
+                child_rows = self.children(spec, [row['id'] for row in chunk], spec.serializer.columns(*trees))
+                for child in child_rows:
+                    children.setdefault(child[f'{spec.fk}_id'], []).append(child)
+                for row in chunk:
+                    row[name] = children.get(row['id'], [])
+            yield from chunk
+
+    def rows(self, columns):
+        # values() can't be combined with prefetching; reverse relations are fetched by children() instead
+        return self.queryset.prefetch_related(None).values(*columns)
+
+    def children(self, spec, parent_ids, columns):
+        return spec.serializer.model.objects.filter(**{f'{spec.fk}__in': parent_ids}).values(f'{spec.fk}_id', *columns)
+
+    # Representation
+
+    def plan(self, serializer, field_tree, omit_tree, prefix=''):
+        steps = []
+        for name, spec in serializer.selected(field_tree, omit_tree):
+            trees = descend(field_tree, omit_tree, name)
+            if isinstance(spec, Column):
+                key = prefix + (spec.source or name)
+                convert = self.converter(serializer, spec) if spec.kind else None
+                steps.append((name, 'column', key, convert))
+            elif isinstance(spec, Nested):
+                nested_prefix = f'{prefix}{spec.source or name}__'
+                steps.append((name, 'nested', nested_prefix + 'id', self.plan(spec.serializer, *trees, nested_prefix)))
+            elif isinstance(spec, Inline):
+                steps.append((name, 'inline', None, self.plan(spec.serializer, *trees, prefix)))
+            else:
+                steps.append((name, 'many', name, self.plan(spec.serializer, *trees)))
+        return steps
+
+    def converter(self, serializer, spec):
+        if spec.kind == 'media':
+            storage = serializer.model._meta.get_field(spec.source).storage
+            return lambda name: self.to_media(storage, name)
+        return getattr(self, f'to_{spec.kind}')
+
+    def build(self, steps, row):
+        data = {}
+        for name, kind, key, extra in steps:
+            if kind == 'column':
+                value = row[key]
+                data[name] = extra(value) if extra is not None and value is not None else value
+            elif kind == 'nested':
+                data[name] = self.build(extra, row) if row[key] is not None else None
+            elif kind == 'inline':
+                data[name] = self.build(extra, row)
+            else:
+                data[name] = [self.build(extra, child) for child in row[key]]
+        return data
+
+    def to_representation(self, row):
+        if not hasattr(self, '_steps'):
+            self._steps = self.plan(type(self), self.field_tree, self.omit_tree)
+        return self.build(self._steps, row)
+
+    @property
+    def data(self):
+        if not hasattr(self, '_data'):
+            with measure_serialization():
+                self._data = [self.to_representation(row) for row in self.iter_rows()]
+        return self._data
+
+    # Same output as the matching DRF fields
+
+    @staticmethod
+    def to_decimal(value, exponent=Decimal('0.01')):
+        return f'{value.quantize(exponent):f}'
+
+    def to_datetime(self, value):
+        if self.timezone is not None and timezone.is_aware(value):
+            value = value.astimezone(self.timezone)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    def to_media(self, storage, name):
+        if not name:
+            return None
+        url = storage.url(name)
+        return self.request.build_absolute_uri(url) if self.request is not None else url
+
+
+TIMESTAMPS = {'created_at': Column(kind='datetime'), 'updated_at': Column(kind='datetime')}
+
+
+class FastProductSerializer(FastSerializer):
+    model = Product
+    fields = {
+        'id': Column(),
+        **TIMESTAMPS,
+        'category': Column(),
+        'age_range': Column(),
+        'name': Column(),
+        'image': Column('image', kind='media'),
+        'description': Column(),
+        'price': Column(kind='decimal'),
+        'stock': Column(),
+        'status': Column(),
+    }
+
+
+class FastUserSerializer(FastSerializer):
+    model = CustomUser
+    fields = {
+        'id': Column(),
+        'username': Column(),
+        'email': Column(),
+        'phone': Column(),
+        'role': Column(),
+        'terms': Column(),
+    }
+
+
+class FastCartSerializer(FastSerializer):
+    model = Cart
+    fields = {
+        'id': Column(),
+        'user': Column('user_id'),
+        'product': Nested(FastProductSerializer),
+        'quantity': Column(),
+        **TIMESTAMPS,
+    }
+
+
+class FastGuestCartItemSerializer(FastSerializer):
+    model = GuestCartItem
+    fields = {
+        'id': Column(),
+        'product': Nested(FastProductSerializer),
+        'quantity': Column(),
+        **TIMESTAMPS,
+    }
+
+
+class FastWishlistSerializer(FastSerializer):
+    model = Wishlist
+    fields = {
+        'id': Column(),
+        'user': Column('user_id'),
+        'product': Nested(FastProductSerializer),
+        **TIMESTAMPS,
+    }
+
+
+class FastProductSnapshotSerializer(FastSerializer):
+    model = OrderItem
+    fields = {
+        'id': Column('product_id'),
+        'name': Column('product_name'),
+        'category': Column('product_category'),
+        'image': Column('product_image', kind='media'),
+    }
+
+
+class FastOrderItemSerializer(FastSerializer):
+    model = OrderItem
+    fields = {
+        'id': Column(),
+        'product': Inline(FastProductSnapshotSerializer),
+        'quantity': Column(),
+        'price': Column(kind='decimal'),
+        **TIMESTAMPS,
+    }
+
+
+class FastOrderSerializer(FastSerializer):
+    model = Order
+    fields = {
+        'id': Column(),
+        'order_id': Column(),
+        'user': Nested(FastUserSerializer),
+        'items': NestedMany(FastOrderItemSerializer, fk='order'),
+        'item_count': Column(),
+        'first_item_thumbnail': Column('first_item_thumbnail', kind='media'),
+        'subtotal': Column(kind='decimal'),
+        'shipping': Column(kind='decimal'),
+        'total_amount': Column(kind='decimal'),
+        'payment_method': Column(),
+        'status': Column(),
+        'payment_status': Column(),
+        'razorpay_payment_id': Column(),
+        'razorpay_order_id': Column(),
+        **TIMESTAMPS,
+    }
+
+
+class FastArchivedOrderItemSerializer(FastOrderItemSerializer):
+    model = ArchivedOrderItem
+
+
+class FastArchivedOrderSerializer(FastOrderSerializer):
+    """Archived orders, in the same shape as FastOrderSerializer."""
+    model = ArchivedOrder
+    fields = {**FastOrderSerializer.fields, 'items': NestedMany(FastArchivedOrderItemSerializer, fk='order')}
+
+
+class FastOrderSummarySerializer(FastSerializer):
+    model = Order
+    fields = {
+        'id': Column(),
+        'order_id': Column(),
+        'user': Column('user_id'),
+        'item_count': Column(),
+        'first_item_thumbnail': Column('first_item_thumbnail', kind='media'),
+        'total_amount': Column(kind='decimal'),
+        'payment_method': Column(),
+        'status': Column(),
+        'payment_status': Column(),
+        'created_at': Column(kind='datetime'),
+    }
+
+
+class FastAdminOrderSummarySerializer(FastOrderSummarySerializer):
+    """Summary rows for staff, with the customer joined in instead of a bare id."""
+    fields = {**FastOrderSummarySerializer.fields, 'user': Nested(FastUserSerializer)}
+
+
+class ArchiveUnionMixin:
+    """Reads ``archived`` orders along with the queryset, newest first, each level with a single UNION ALL."""
+
+    def __init__(self, queryset, archived, **kwargs):
+        super().__init__(queryset, **kwargs)
+        self.archived = archived
+
+    def rows(self, columns):
+        hot = super().rows(columns).order_by()
+        archived = self.archived.prefetch_related(None).values(*columns).order_by()
+        # Archived orders keep their ids, so ids order both tables the same way
+        return hot.union(archived, all=True).order_by('-id')
+
+    def children(self, spec, parent_ids, columns):
+        archived = ArchivedOrderItem.objects.filter(order_id__in=parent_ids).values('order_id', *columns)
+        return super().children(spec, parent_ids, columns).union(archived, all=True)
+
+
+class FastOrderHistorySerializer(ArchiveUnionMixin, FastOrderSerializer):
+    pass
+
+
+class FastOrderSummaryHistorySerializer(ArchiveUnionMixin, FastOrderSummarySerializer):
+    pass
+
+
+class FastAdminOrderSummaryHistorySerializer(ArchiveUnionMixin, FastAdminOrderSummarySerializer):
+    pass
@@ -0,0 +1,264 @@
+"""
+Razorpay adapter used by the payment views and jobs.
+
+Every call goes through one pooled session (httpx under async views) with
+strict connect/read timeouts. Failed attempts are retried a bounded number of
+times with full-jitter backoff; POSTs are only retried when the request never
+reached the gateway or was rate-limited, so an order is not created twice.
+A process-wide circuit breaker fails fast while the gateway keeps failing,
+and every call is recorded in ``gateway_metrics``.
+
+Configured through ``settings.RAZORPAY_GATEWAY``; point ``BASE_URL`` at
+``manage.py fake_razorpay`` (backend.fake_gateway) to run without the real API.
+"""
+import asyncio
+import random
+import threading
+import time
+import weakref
+
+import httpx
+import razorpay
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from .middleware import gateway_metrics
+
+
+class GatewayError(Exception):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class GatewayUnavailable(GatewayError):
+    """Raised without calling the gateway while the circuit is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self.lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            # Half-open lets a single trial call through; its outcome closes or reopens the circuit
+            if state == 'half-open' and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+            self.trial_running = False
+
+    def retry_after(self):
+        if self.opened_at is None:
+            return 0
+        return max(0.0, self.reset_timeout - (self.clock() - self.opened_at))
+
+
+def never_sent(error):
+    """True when the request provably did not reach the gateway."""
+    if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, requests.ConnectTimeout)):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class RazorpayGateway:
+    def __init__(self, key_id=None, key_secret=None, **options):
+        config = {**settings.RAZORPAY_GATEWAY, **options}
+        self.key_id = key_id or settings.RAZORPAY_KEY_ID
+        self.key_secret = key_secret or settings.RAZORPAY_KEY_SECRET
+        self.base_url = config['BASE_URL'].rstrip('/')
+        self.timeout = (config['CONNECT_TIMEOUT'], config['READ_TIMEOUT'])
+        self.max_retries = config['MAX_RETRIES']
+        self.backoff = config['BACKOFF']
+        self.pool_size = config['POOL_SIZE']
+        self.breaker = CircuitBreaker(config['FAILURE_THRESHOLD'], config['RESET_TIMEOUT'])
+
+        self.session = requests.Session()
+        self.session.auth = (self.key_id, self.key_secret)
+        self.session.mount(self.base_url, HTTPAdapter(pool_maxsize=self.pool_size, max_retries=0))
+        # Signature checks are local HMACs and never hit the network
+        self.utility = razorpay.Client(auth=(self.key_id, self.key_secret)).utility
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    # API calls
+
+    def create_order(self, amount, currency='INR', receipt=None):
+        return self.request('POST', '/orders', 'orders.create', self.order_payload(amount, currency, receipt))
+
+    async def acreate_order(self, amount, currency='INR', receipt=None):
+        return await self.arequest('POST', '/orders', 'orders.create', self.order_payload(amount, currency, receipt))
+
+    def fetch_order_payments(self, razorpay_order_id):
+        return self.request('GET', f'/orders/{razorpay_order_id}/payments', 'orders.payments')['items']
+
+    def fetch_payment(self, razorpay_payment_id):
+        return self.request('GET', f'/payments/{razorpay_payment_id}', 'payments.fetch')
+
+    @staticmethod
+    def order_payload(amount, currency, receipt):
+        payload = {"amount": amount, "currency": currency, "payment_capture": 1}
+        if receipt:
+            payload["receipt"] = receipt
+        return payload
+
+    def verify_payment_signature(self, params):
+        return self.utility.verify_payment_signature(params)
+
+    def verify_webhook_signature(self, body, signature, secret):
+        return self.utility.verify_webhook_signature(body, signature, secret)
+
+    # Transport
+
+    def request(self, method, path, call, payload=None):
+        self.check_circuit(call)
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = self.session.request(method, self.base_url + path, json=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                error, retry = e, self.should_retry(method, sent=not never_sent(e))
+            else:
+                if not self.is_server_failure(response.status_code):
+                    return self.finish(call, started, attempt, response.status_code, self.decode(response))
+                error, retry = self.http_error(response.status_code, response.text), self.should_retry(method, response.status_code)
+            if not retry or attempt > self.max_retries:
+                self.fail(call, started, attempt, error)
+            time.sleep(self.delay(attempt))
+
+    async def arequest(self, method, path, call, payload=None):
+        self.check_circuit(call)
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = await self.async_client().request(method, path, json=payload)
+            except httpx.HTTPError as e:
+                error, retry = e, self.should_retry(method, sent=not never_sent(e))
+            else:
+                if not self.is_server_failure(response.status_code):
+                    return self.finish(call, started, attempt, response.status_code, self.decode(response))
+                error, retry = self.http_error(response.status_code, response.text), self.should_retry(method, response.status_code)
+            if not retry or attempt > self.max_retries:
+                self.fail(call, started, attempt, error)
+            await asyncio.sleep(self.delay(attempt))
+
+    def async_client(self):
+        # One pooled client per event loop; under WSGI each request gets its own loop
+        loop = asyncio.get_running_loop()
+        http = self._async_clients.get(loop)
+        if http is None:
+            http = self._async_clients[loop] = httpx.AsyncClient(
+                base_url=self.base_url,
+                auth=(self.key_id, self.key_secret),
+                timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+                limits=httpx.Limits(max_connections=self.pool_size),
+            )
+        return http
+
+    def check_circuit(self, call):
+        if not self.breaker.allow():
+            gateway_metrics.record(call, duration_seconds=0.0, attempts=0, errors=1)
+            raise GatewayUnavailable('Payment gateway is temporarily unavailable', status_code=503)
+
+    @staticmethod
+    def is_server_failure(status_code):
+        return status_code >= 500 or status_code == 429
+
+    @staticmethod
+    def should_retry(method, status_code=None, sent=True):
+        if status_code == 429:
+            return True
+        if method == 'GET':
+            return True
+        # A POST that reached the gateway may have created the order already
+        return status_code is None and not sent
+
+    def delay(self, attempt):
+        return random.uniform(0, self.backoff * 2 ** (attempt - 1))
+
+    @staticmethod
+    def decode(response):
+        try:
+            return response.json()
+        except ValueError:
+            return {}
+
+    @staticmethod
+    def http_error(status_code, text):
+        return GatewayError(f'Gateway returned HTTP {status_code}: {text[:200]}', status_code=status_code)
+
+    def finish(self, call, started, attempts, status_code, body):
+        # 4xx answers mean the gateway is healthy, so they close the circuit too
+        self.breaker.record_success()
+        client_error = status_code >= 400
+        gateway_metrics.record(
+            call, duration_seconds=time.perf_counter() - started, attempts=attempts, errors=int(client_error)
+        )
+        if client_error:
+            description = (body.get('error') or {}).get('description', '') if isinstance(body, dict) else ''
+            raise GatewayError(description or f'Gateway returned HTTP {status_code}', status_code=status_code)
+        return body
+
+    def fail(self, call, started, attempts, error):
+        self.breaker.record_failure()
+        gateway_metrics.record(call, duration_seconds=time.perf_counter() - started, attempts=attempts, errors=1)
+        if isinstance(error, GatewayError):
+            raise error
+        raise GatewayError(f'Gateway request failed: {error}') from error
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = RazorpayGateway()
+    return _gateway
+
+
+@receiver(setting_changed)
+def reset_gateway(setting, **kwargs):
+    global _gateway
+    if setting in ('RAZORPAY_GATEWAY', 'RAZORPAY_KEY_ID', 'RAZORPAY_KEY_SECRET'):
+        _gateway = None
@@ -0,0 +1,148 @@
+"""
+``Idempotency-Key`` support for the order-creating endpoints.
+
+The first response for a (user, endpoint, key) is stored in IdempotencyKey and
+replayed for every retry. A cache lock guards the key while a request is in
+flight: a concurrent duplicate gets 409 with Retry-After straight away, rather
+than holding a worker until the first finishes, and its retry is answered with
+the stored response. Server errors are not stored, so they can be retried.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAY_HEADER = 'Idempotent-Replayed'
+
+
+def request_hash(data):
+    body = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder, default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def lock_key(user_id, endpoint, key):
+    return f'idempotency:{user_id}:{endpoint}:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def find_record(user, endpoint, key):
+    cutoff = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    record = IdempotencyKey.objects.filter(user=user, endpoint=endpoint, key=key).first()
+    if record and record.created_at < cutoff:
+        record.delete()
+        return None
+    return record
+
+
+def store_record(user, endpoint, key, digest, status_code, body):
+    if status_code >= 500:
+        return
+    try:
+        IdempotencyKey.objects.create(
+            user=user, endpoint=endpoint, key=key, request_hash=digest,
+            status_code=status_code, response_body=body,
+        )
+    except IntegrityError:
+        # Another process stored it first (lock expired under a very slow request)
+        pass
+
+
+def replay(record, digest):
+    if record.request_hash != digest:
+        return status.HTTP_422_UNPROCESSABLE_ENTITY, {
+            "error": f"{HEADER} was already used with a different request body."
+        }
+    return record.status_code, record.response_body
+
+
+def invalid_key(key):
+    if len(key) > 255:
+        return {"error": f"{HEADER} must be at most 255 characters."}
+    return None
+
+
+IN_PROGRESS = {"error": f"A request with this {HEADER} is still being processed."}
+IN_PROGRESS_HEADERS = {'Retry-After': '1'}
+
+
+def claim(request, endpoint):
+    """Start an idempotent request: (key, response).
+
+    With no key, the view just runs. Otherwise the response is the one to send
+    instead of running the view (a bad key, a duplicate in flight or a stored
+    replay), or None when the lock on the key is now held by this request.
+    """
+    key = request.headers.get(HEADER)
+    if not key:
+        return None, None
+    error = invalid_key(key)
+    if error:
+        return key, Response(error, status=status.HTTP_400_BAD_REQUEST)
+
+    lock = lock_key(request.user.pk, endpoint, key)
+    if not cache.add(lock, True, settings.IDEMPOTENCY_LOCK_TIMEOUT):
+        return key, Response(IN_PROGRESS, status=status.HTTP_409_CONFLICT, headers=IN_PROGRESS_HEADERS)
+    try:
+        record = find_record(request.user, endpoint, key)
+    except BaseException:
+        cache.delete(lock)
+        raise
+    if record:
+        cache.delete(lock)
+        status_code, body = replay(record, request_hash(request.data))
+        return key, Response(body, status=status_code, headers={REPLAY_HEADER: 'true'})
+    return key, None
+
+
+def complete(request, endpoint, key, response):
+    """Store the view's response for the key claimed by claim(), if any, and release the lock."""
+    try:
+        if response is not None:
+            store_record(request.user, endpoint, key, request_hash(request.data), response.status_code, response.data)
+    finally:
+        cache.delete(lock_key(request.user.pk, endpoint, key))
+
+
+def idempotent(view):
+    """For DRF function views, sync or async (backend.async_views); place it under @api_view/@permission_classes."""
+    endpoint = view.__name__
+
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapped(request, *args, **kwargs):
+            key, response = await sync_to_async(claim)(request, endpoint)
+            if response is not None:
+                return response
+            if key is None:
+                return await view(request, *args, **kwargs)
+            try:
+                response = await view(request, *args, **kwargs)
+            finally:
+                await sync_to_async(complete)(request, endpoint, key, response)
+            return response
+    else:
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            key, response = claim(request, endpoint)
+            if response is not None:
+                return response
+            if key is None:
+                return view(request, *args, **kwargs)
+            try:
+                response = view(request, *args, **kwargs)
+            finally:
+                complete(request, endpoint, key, response)
+            return response
+
+    return wrapped
@@ -0,0 +1,37 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from backend.archival import ARCHIVED_STATUSES, archivable_orders, archive_orders_batch
+
+
+class Command(BaseCommand):
+    help = 'Move delivered and cancelled orders older than a cutoff, with their items, to the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, required=True, metavar='DAYS', help='Archive orders created more than DAYS ago')
+        parser.add_argument('--batch-size', type=int, default=500, help='Orders moved per transaction')
+        parser.add_argument('--pause', type=float, default=0.1, help='Seconds between batches, to let other writers in')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the orders that would move')
+
+    def handle(self, *args, **options):
+        if options['older_than'] < 1:
+            raise CommandError('--older-than must be at least 1 day')
+        cutoff = timezone.now() - timedelta(days=options['older_than'])
+        if options['dry_run']:
+            count = archivable_orders(cutoff).count()
+            self.stdout.write(f'Would archive {count} {"/".join(ARCHIVED_STATUSES)} orders created before {cutoff:%Y-%m-%d}')
+            return
+
+        # Every batch commits on its own; rerunning after an interruption picks up the rest
+        total = 0
+        while True:
+            moved = archive_orders_batch(cutoff, options['batch_size'])
+            if not moved:
+                break
+            total += moved
+            self.stdout.write(f'  archived {total} orders')
+            time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} orders created before {cutoff:%Y-%m-%d}'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from backend.models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+
+class Command(BaseCommand):
+    help = 'Fill Order.item_count and first_item_thumbnail (archived orders included) from their items'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Orders per UPDATE, by id range')
+        parser.add_argument('--all', action='store_true', help='Recompute every order, not only ones without a count')
+
+    def handle(self, *args, **options):
+        for model, item_model in ((Order, OrderItem), (ArchivedOrder, ArchivedOrderItem)):
+            updated = self.backfill(model, item_model, options['batch_size'], options['all'])
+            self.stdout.write(f'  {updated:>9} {model._meta.verbose_name_plural}')
+        self.stdout.write(self.style.SUCCESS('Order summaries are up to date'))
+
+    @staticmethod
+    def backfill(model, item_model, batch_size, everything):
+        # One UPDATE per id range, each committed on its own; a rerun skips what is already filled
+        orders = model.objects.all() if everything else model.objects.filter(item_count=0)
+        first = orders.order_by('pk').values_list('pk', flat=True).first()
+        if first is None:
+            return 0
+        last = orders.order_by('-pk').values_list('pk', flat=True).first()
+        summary = Order.summary_expressions(item_model)
+        updated = 0
+        for start in range(first, last + 1, batch_size):
+            with transaction.atomic():
+                updated += orders.filter(pk__gte=start, pk__lt=start + batch_size).update(**summary)
+        return updated
@@ -0,0 +1,185 @@
+import json
+import platform
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from backend.middleware import QueryTimer, RequestMetrics
+from backend.models import Cart, CustomUser, Product
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Drive the main API endpoints in-process and report latency percentiles and queries per request'
+
+    ENDPOINTS = ['product_list', 'cart_list', 'cart_add', 'cart_update', 'cart_delete', 'checkout', 'admin_dashboard', 'admin_orders']
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--endpoints', nargs='+', choices=self.ENDPOINTS, default=self.ENDPOINTS)
+        parser.add_argument('--user', help='Email of the shopper to benchmark as (defaults to a user with a cart)')
+        parser.add_argument('--output', help='Write results to this JSON file')
+        parser.add_argument('--compare', help='Previous JSON results to compare against')
+
+    def handle(self, *args, **options):
+        # Test environment: locmem email, 'testserver' allowed. All writes are rolled back.
+        try:
+            setup_test_environment()
+            own_environment = True
+        except RuntimeError:
+            # Already running under the test runner
+            own_environment = False
+        # Timed requests run back to back from one client; rate limits would turn them into 429s
+        unlimited = override_settings(RATE_LIMITS={**settings.RATE_LIMITS, 'ENABLED': False})
+        try:
+            with unlimited, transaction.atomic():
+                results = self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            if own_environment:
+                teardown_test_environment()
+
+        report = {
+            'timestamp': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'debug': settings.DEBUG,
+            'requests': options['requests'],
+            'results': results,
+        }
+        self.print_report(report, options['compare'])
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def run(self, options):
+        shopper = self.get_shopper(options['user'])
+        admin = CustomUser.objects.filter(is_staff=True, role='admin').first() or CustomUser.objects.create_user(
+            username='benchmark-admin', email='benchmark-admin@example.com', password='benchmark', is_staff=True, role='admin'
+        )
+        self.shopper_client = self.client_for(shopper)
+        self.admin_client = self.client_for(admin)
+        self.shopper = shopper
+        self.cart_snapshot = list(Cart.objects.filter(user=shopper).values_list('product_id', 'quantity'))
+        self.spare_product = Product.objects.exclude(cart__user=shopper).values_list('pk', flat=True).first()
+
+        results = {}
+        for name in options['endpoints']:
+            self.stdout.write(f'  {name} ...', ending='')
+            self.stdout.flush()
+            results[name] = self.measure(name, options['requests'], options['warmup'])
+            self.stdout.write(f" p50 {results[name]['p50_ms']:.1f} ms")
+        return results
+
+    def get_shopper(self, email):
+        users = CustomUser.objects.filter(is_active=True)
+        if email:
+            shopper = users.filter(email=email).first()
+        else:
+            shopper = users.filter(cart__isnull=False).order_by('pk').first() or users.order_by('pk').first()
+        if shopper is None:
+            raise CommandError('No user to benchmark with; run manage.py seed_perf_data first.')
+        return shopper
+
+    def client_for(self, user):
+        api_client = APIClient()
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        return api_client
+
+    def measure(self, name, requests, warmup):
+        # prepare_<name> resets state outside the timed section
+        prepare = getattr(self, f'prepare_{name}', lambda: None)
+        call = getattr(self, f'call_{name}')
+        for _ in range(warmup):
+            prepare()
+            call()
+        latencies, queries, statuses = [], [], set()
+        for _ in range(requests):
+            prepare()
+            timer = QueryTimer()
+            with connection.execute_wrapper(timer):
+                started = time.perf_counter()
+                response = call()
+                latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(timer.count)
+            statuses.add(response.status_code)
+        latencies.sort()
+        return {
+            'p50_ms': RequestMetrics.percentile(latencies, 0.5),
+            'p95_ms': RequestMetrics.percentile(latencies, 0.95),
+            'p99_ms': RequestMetrics.percentile(latencies, 0.99),
+            'mean_ms': statistics.fmean(latencies),
+            'queries': max(queries),
+            'bytes': len(response.content),
+            'statuses': sorted(statuses),
+        }
+
+    def prepare_cart_add(self):
+        Cart.objects.filter(user=self.shopper, product_id=self.spare_product).delete()
+
+    def prepare_cart_update(self):
+        self.cart_item, _ = Cart.objects.get_or_create(user=self.shopper, product_id=self.spare_product)
+
+    prepare_cart_delete = prepare_cart_update
+
+    def prepare_checkout(self):
+        Cart.objects.filter(user=self.shopper).delete()
+        Cart.objects.bulk_create([
+            Cart(user=self.shopper, product_id=product_id, quantity=quantity)
+            for product_id, quantity in self.cart_snapshot
+        ])
+
+    def call_product_list(self):
+        return self.shopper_client.get('/api/products/')
+
+    def call_cart_list(self):
+        return self.shopper_client.get('/api/cart/')
+
+    def call_cart_add(self):
+        return self.shopper_client.post('/api/cart/', {'product_id': self.spare_product, 'quantity': 1}, format='json')
+
+    def call_cart_update(self):
+        return self.shopper_client.patch(f'/api/cart/{self.cart_item.pk}/', {'quantity': 2}, format='json')
+
+    def call_cart_delete(self):
+        return self.shopper_client.delete(f'/api/cart/{self.cart_item.pk}/')
+
+    def call_checkout(self):
+        return self.shopper_client.post('/api/cart/checkout/', {'payment_method': 'cash'}, format='json')
+
+    def call_admin_dashboard(self):
+        return self.admin_client.get('/api/admin-dashboard/')
+
+    def call_admin_orders(self):
+        return self.admin_client.get('/api/manage-orders/')
+
+    def print_report(self, report, compare_path):
+        previous = {}
+        if compare_path:
+            with open(compare_path) as compare_file:
+                previous = json.load(compare_file)['results']
+
+        self.stdout.write(f"\n{'endpoint':<16}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}{'bytes':>11}")
+        for name, result in report['results'].items():
+            line = (
+                f"{name:<16}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+                f"{result['p99_ms']:>10.2f}{result['queries']:>9}{result['bytes']:>11}"
+            )
+            if name in previous and previous[name]['p50_ms']:
+                change = (result['p50_ms'] / previous[name]['p50_ms'] - 1) * 100
+                line += f"   p50 {change:+.0f}% (queries {previous[name]['queries']} -> {result['queries']})"
+            self.stdout.write(line)
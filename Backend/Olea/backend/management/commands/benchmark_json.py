@@ -0,0 +1,85 @@
+import io
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from backend.models import CustomUser
+from backend.renderers import FastJSONParser, FastJSONRenderer, orjson
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare DRF JSON rendering/parsing with the orjson-backed classes on real API payloads'
+
+    PAYLOADS = {
+        'product_list': '/api/products/',
+        'admin_dashboard': '/api/admin-dashboard/',
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--payloads', nargs='+', choices=list(self.PAYLOADS), default=list(self.PAYLOADS))
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            raise CommandError('orjson is not installed; FastJSONRenderer is using the stdlib fallback.')
+
+        payloads = self.fetch_payloads(options['payloads'])
+        self.stdout.write(f"{'payload':<18}{'bytes':>11}{'':>4}{'json ms':>10}{'orjson ms':>11}{'speedup':>9}")
+        for name, data in payloads.items():
+            slow_bytes = JSONRenderer().render(data)
+            fast_bytes = FastJSONRenderer().render(data)
+            if slow_bytes != fast_bytes:
+                raise CommandError(f'{name}: FastJSONRenderer output differs from JSONRenderer')
+
+            rows = [
+                ('render', self.time(lambda: JSONRenderer().render(data), options['repeat']),
+                 self.time(lambda: FastJSONRenderer().render(data), options['repeat'])),
+                ('parse', self.time(lambda: JSONParser().parse(io.BytesIO(slow_bytes)), options['repeat']),
+                 self.time(lambda: FastJSONParser().parse(io.BytesIO(slow_bytes)), options['repeat'])),
+            ]
+            for step, slow, fast in rows:
+                self.stdout.write(
+                    f'{name:<18}{len(slow_bytes):>11}{step:>8}{slow:>10.2f}{fast:>11.2f}{slow / fast:>8.1f}x'
+                )
+
+    def fetch_payloads(self, names):
+        # Payloads come from the real views so the data has the same shape and types as in production
+        admin = CustomUser.objects.filter(is_staff=True, role='admin').first()
+        payloads = {}
+        try:
+            with transaction.atomic():
+                if admin is None:
+                    admin = CustomUser.objects.create_user(
+                        username='benchmark-admin', email='benchmark-admin@example.com', password='benchmark',
+                        is_staff=True, role='admin',
+                    )
+                client = APIClient()
+                client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(admin).access_token}')
+                for name in names:
+                    response = client.get(self.PAYLOADS[name], HTTP_HOST='localhost')
+                    if response.status_code != 200:
+                        raise CommandError(f'{name}: GET {self.PAYLOADS[name]} returned {response.status_code}')
+                    payloads[name] = response.data
+                raise Rollback
+        except Rollback:
+            pass
+        return payloads
+
+    @staticmethod
+    def time(func, repeat):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples)
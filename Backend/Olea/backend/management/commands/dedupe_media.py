@@ -0,0 +1,95 @@
+import os
+import posixpath
+import shutil
+import time
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+
+from backend.media import CONTENT_NAME, ContentAddressedStorage, file_digest
+
+
+class Command(BaseCommand):
+    help = 'Move media files to content-addressed names, repoint rows at them and delete files nothing references'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', default='products', help='Media subdirectory to process')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without touching files or rows')
+        parser.add_argument('--no-gc', action='store_true', help='Keep files no row references')
+        parser.add_argument(
+            '--min-age', type=int, default=60,
+            help='Minutes since a file was written before it may be collected (its row may not be committed yet)',
+        )
+
+    def handle(self, *args, **options):
+        storage = default_storage
+        if not isinstance(storage, ContentAddressedStorage):
+            raise CommandError("STORAGES['default'] must be backend.media.ContentAddressedStorage")
+        dry_run = options['dry_run']
+        fields = file_fields()
+
+        referenced = set()
+        for model, field in fields:
+            referenced.update(model._base_manager.exclude(**{field: ''}).values_list(field, flat=True).distinct())
+
+        # Unreferenced files are left to the collection below rather than copied first
+        renames = {}
+        for name in self.list_files(options['directory']):
+            stem, ext = posixpath.splitext(posixpath.basename(name))
+            if name not in referenced or CONTENT_NAME.match(stem):
+                continue
+            with storage.open(name) as file:
+                target = posixpath.join(options['directory'], file_digest(file) + ext.lower())
+            renames[name] = target
+            if not dry_run and not storage.exists(target):
+                link_or_copy(storage.path(name), storage.path(target))
+        self.stdout.write(f'{len(renames)} files map to {len(set(renames.values()))} content-addressed names')
+
+        if not dry_run and renames:
+            with transaction.atomic():
+                for model, field in fields:
+                    for old, new in renames.items():
+                        model._base_manager.filter(**{field: old}).update(**{field: new})
+
+        if options['no_gc']:
+            return
+        referenced = {renames.get(name, name) for name in referenced}
+        cutoff = time.time() - options['min_age'] * 60
+        removed = freed = 0
+        for name in self.list_files(options['directory']):
+            if name in referenced:
+                continue
+            stat = os.stat(storage.path(name))
+            if stat.st_mtime > cutoff:
+                continue
+            removed += 1
+            freed += stat.st_size
+            if not dry_run:
+                storage.delete(name)
+        verb = 'Would remove' if dry_run else 'Removed'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {removed} unreferenced files ({freed / 1024:.1f} KiB)'))
+
+    @staticmethod
+    def list_files(directory):
+        if not default_storage.exists(directory):
+            return []
+        return [posixpath.join(directory, name) for name in default_storage.listdir(directory)[1]]
+
+
+def file_fields():
+    """(model, field name) for every FileField kept in the default storage."""
+    return [
+        (model, field.name)
+        for model in apps.get_models()
+        for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField) and field.storage is default_storage
+    ]
+
+
+def link_or_copy(source, destination):
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from backend.fake_gateway import FakeRazorpay
+
+
+class Command(BaseCommand):
+    help = 'Serve a local fake of the Razorpay orders/payments API (set RAZORPAY_API_BASE to its URL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before every response')
+
+    def handle(self, *args, **options):
+        fake = FakeRazorpay(options['host'], options['port'], latency=options['latency'])
+        self.stdout.write(f'Fake Razorpay listening on {fake.url}')
+        try:
+            fake.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            fake.server.server_close()
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from backend.webhooks import process_webhook_batch
+
+
+class Command(BaseCommand):
+    help = 'Drain the Razorpay webhook inbox and apply payment transitions to orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--once', action='store_true', help='Exit once the inbox is empty instead of polling')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the inbox is empty')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            processed = process_webhook_batch(options['batch_size'])
+            total += processed
+            if processed:
+                self.stdout.write(f'  processed {processed} events')
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Processed {total} webhook events'))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from backend.archival import purge_archived_batch
+
+
+class Command(BaseCommand):
+    help = 'Remove cart and wishlist rows of archived products in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--once', action='store_true', help='Exit once nothing is left instead of polling')
+        parser.add_argument('--interval', type=float, default=30.0, help='Seconds to sleep when nothing is left')
+        parser.add_argument('--pause', type=float, default=0.1, help='Seconds between batches, to let other writers in')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            deleted = purge_archived_batch(options['batch_size'])
+            total += deleted
+            if deleted:
+                self.stdout.write(f'  removed {deleted} rows')
+                time.sleep(options['pause'])
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Removed {total} cart and wishlist rows of archived products'))
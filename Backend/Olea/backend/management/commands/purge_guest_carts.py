@@ -0,0 +1,40 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from backend.models import GuestCart
+
+
+class Command(BaseCommand):
+    help = 'Delete guest carts nobody has added to since their cookie expired'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=settings.GUEST_CART_COOKIE_AGE // (60 * 60 * 24), metavar='DAYS',
+            help='Delete carts with no changes in DAYS days (defaults to the cookie lifetime)',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Carts deleted per transaction')
+        parser.add_argument('--pause', type=float, default=0.1, help='Seconds between batches, to let other writers in')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['older_than'])
+        # The cookie is renewed on every add, which also touches an item, so a cart whose
+        # cart row and items are all older than the cookie lifetime can't be reached any more
+        stale = (
+            GuestCart.objects.filter(updated_at__lt=cutoff).exclude(items__updated_at__gte=cutoff)
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        total = 0
+        while True:
+            pks = list(stale[:options['batch_size']])
+            if not pks:
+                break
+            # Cascades to the items
+            GuestCart.objects.filter(pk__in=pks).delete()
+            total += len(pks)
+            self.stdout.write(f'  removed {total} carts')
+            time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(f'Removed {total} guest carts untouched since {cutoff:%Y-%m-%d}'))
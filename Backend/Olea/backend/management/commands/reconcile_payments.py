@@ -0,0 +1,159 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from backend import order_status
+from backend.gateway import GatewayError, GatewayUnavailable, get_gateway
+from backend.models import Order
+from backend.order_events import OrderEventWriter
+from backend.views import clear_ordered_cart_items
+
+
+def payment_outcome(payments, expired=False):
+    """(payment_status, razorpay_payment_id) the gateway reports for an order, or None to leave it as is.
+
+    Failed attempts settle nothing, since the customer may retry inside the same
+    order. An ``expired`` order with nothing captured or authorized was abandoned
+    at checkout; it comes back as 'expired' and is cancelled.
+    """
+    for payment in payments:
+        if payment['status'] == 'captured':
+            return 'paid', payment['id']
+    if expired and not any(payment['status'] == 'authorized' for payment in payments):
+        return 'expired', None
+    return None
+
+
+class Command(BaseCommand):
+    help = 'Reconcile pending Razorpay orders with the payment status reported by the gateway'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent gateway requests')
+        parser.add_argument('--older-than', type=int, default=15, help='Skip orders created in the last N minutes')
+        parser.add_argument(
+            '--expire-after', type=int, default=24 * 60, metavar='MINUTES',
+            help='Cancel card/UPI orders still unpaid this long after checkout',
+        )
+        parser.add_argument('--checkpoint', help='File recording the last reconciled order id, updated after every batch')
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Start after the id stored in --checkpoint; orders that hit gateway errors wait for the next full run',
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['resume'] and not options['checkpoint']:
+            raise CommandError('--resume needs --checkpoint')
+        last_pk = self.read_checkpoint(options['checkpoint']) if options['resume'] else 0
+        cutoff = timezone.now() - timedelta(minutes=options['older_than'])
+        expire_cutoff = timezone.now() - timedelta(minutes=options['expire_after'])
+        # Orders a failed attempt left 'failed' may still be paid or expire, until they're cancelled
+        pending = Order.objects.filter(
+            payment_status__in=order_status.CAPTURABLE, razorpay_order_id__isnull=False, created_at__lt=cutoff
+        ).exclude(status='cancelled').order_by('pk')
+
+        started = time.perf_counter()
+        totals = {'checked': 0, 'paid': 0, 'expired': 0, 'errors': 0}
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                # Keyset pagination: each page starts after the last id seen, so it stays cheap deep into the table
+                batch = list(
+                    pending.filter(pk__gt=last_pk).values_list('pk', 'razorpay_order_id', 'created_at')[:options['batch_size']]
+                )
+                if not batch:
+                    break
+                try:
+                    results = list(pool.map(
+                        self.fetch,
+                        [razorpay_order_id for _, razorpay_order_id, _ in batch],
+                        [created_at < expire_cutoff for _, _, created_at in batch],
+                    ))
+                except GatewayUnavailable as e:
+                    raise CommandError(f'Stopped after order {last_pk}: {e}. Rerun with --resume to continue.')
+
+                outcomes = {}
+                for (pk, _, _), result in zip(batch, results):
+                    if isinstance(result, GatewayError):
+                        totals['errors'] += 1
+                    elif result:
+                        outcomes[pk] = result
+                totals['checked'] += len(batch)
+                if not options['dry_run']:
+                    for payment_status, count in self.apply(outcomes).items():
+                        totals[payment_status] += count
+
+                last_pk = batch[-1][0]
+                if options['checkpoint'] and not options['dry_run']:
+                    self.write_checkpoint(options['checkpoint'], last_pk)
+                self.stdout.write(f'  up to order {last_pk}: {len(outcomes)} of {len(batch)} resolved')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {totals['checked']} orders in {time.perf_counter() - started:.1f}s: "
+            f"{totals['paid']} paid, {totals['expired']} expired, {totals['errors']} gateway errors"
+        ))
+
+    def fetch(self, razorpay_order_id, expired=False):
+        try:
+            return payment_outcome(get_gateway().fetch_order_payments(razorpay_order_id), expired)
+        except GatewayUnavailable:
+            raise
+        except GatewayError as e:
+            return e
+
+    def apply(self, outcomes):
+        if not outcomes:
+            return {}
+        now = timezone.now()
+        with transaction.atomic(), OrderEventWriter('reconcile') as events:
+            # Lock the rows and re-check them: a webhook or verify call may have settled some meanwhile
+            orders = list(
+                Order.objects.select_for_update()
+                .filter(pk__in=outcomes, payment_status__in=order_status.CAPTURABLE).exclude(status='cancelled')
+                .only('pk', 'status', 'payment_status', 'razorpay_payment_id')
+            )
+            taken = set(
+                Order.objects.filter(razorpay_payment_id__in=[payment_id for _, payment_id in outcomes.values() if payment_id])
+                .values_list('razorpay_payment_id', flat=True)
+            )
+            changed = []
+            for order in orders:
+                payment_status, payment_id = outcomes[order.pk]
+                if payment_id in taken:
+                    continue
+                before = {'status': order.status, 'payment_status': order.payment_status}
+                if payment_status == 'paid':
+                    changes = order_status.captured_changes(order.status)
+                    order.razorpay_payment_id = payment_id
+                else:
+                    changes = {'status': 'cancelled', 'payment_status': 'failed'}
+                order.status, order.payment_status = changes['status'], changes['payment_status']
+                order.updated_at = now
+                events.add_changes(order.pk, before, changes)
+                changed.append(order)
+            Order.objects.bulk_update(changed, ['status', 'payment_status', 'razorpay_payment_id', 'updated_at'])
+            clear_ordered_cart_items([order.pk for order in changed if order.payment_status == 'paid'])
+
+        counts = {}
+        for order in changed:
+            outcome = 'expired' if order.status == 'cancelled' else order.payment_status
+            counts[outcome] = counts.get(outcome, 0) + 1
+        return counts
+
+    def read_checkpoint(self, path):
+        try:
+            with open(path) as checkpoint:
+                return json.load(checkpoint)['last_order_pk']
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f'Unreadable checkpoint {path}: {e}')
+
+    def write_checkpoint(self, path, last_pk):
+        with open(path, 'w') as checkpoint:
+            json.dump({'last_order_pk': last_pk, 'updated_at': timezone.now().isoformat()}, checkpoint)
@@ -0,0 +1,163 @@
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.crypto import get_random_string
+
+from backend.models import Cart, CustomUser, Order, OrderItem, Product, Wishlist
+
+PRODUCT_IMAGES = [
+    'products/athletic-sneakers.jpg', 'products/boy6.jpg', 'products/building-blocks.jpg',
+    'products/cargo-joggers.jpg', 'products/denim-jacket.jpg', 'products/dino-tee.jpg',
+    'products/floral-sundress.jpg', 'products/kids-blue-hoodie.jpg', 'products/princess-dress.jpg',
+    'products/rainbow-stacker.jpg', 'products/rocking-horse.jpg', 'products/unicorn-hoodie.jpg',
+]
+PRODUCT_NAMES = {
+    'boys': ['Denim Jacket', 'Cargo Joggers', 'Dino Tee', 'Flannel Shirt', 'Swim Trunks', 'Polo Set'],
+    'girls': ['Floral Sundress', 'Tutu Skirt', 'Unicorn Hoodie', 'Leggings', 'Princess Dress', 'Mary Janes'],
+    'toys': ['Building Blocks', 'Rainbow Stacker', 'Rocking Horse', 'Pull Duck', 'Activity Cube', 'Soft Book'],
+}
+STATUSES = ['pending', 'processing', 'shipped', 'delivered', 'cancelled']
+
+
+class Command(BaseCommand):
+    help = 'Bulk-generate users, products, carts, wishlists and orders for performance testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--products', type=int, default=50_000)
+        parser.add_argument('--orders', type=int, default=250_000)
+        parser.add_argument('--items-per-order', type=int, default=4)
+        parser.add_argument('--cart-items', type=int, default=2, help='Cart rows per user')
+        parser.add_argument('--wishlist-items', type=int, default=2, help='Wishlist rows per user')
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        # Run tag keeps usernames, emails and order ids unique across repeated seeding
+        self.run = get_random_string(length=4, allowed_chars='ABCDEFGHJKLMNPQRSTUVWXYZ23456789')
+        started = time.perf_counter()
+
+        user_ids = self.timed('users', self.seed_users, options['users'])
+        products = self.timed('products', self.seed_products, options['products'])
+        self.timed('cart rows', self.seed_user_products, Cart, user_ids, products, options['cart_items'])
+        self.timed('wishlist rows', self.seed_user_products, Wishlist, user_ids, products, options['wishlist_items'])
+        self.timed('order items', self.seed_orders, user_ids, products, options['orders'], options['items_per_order'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded run {self.run} in {time.perf_counter() - started:.1f}s'
+        ))
+
+    def timed(self, label, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        count = result if isinstance(result, int) else len(result)
+        self.stdout.write(f'  {count:>9} {label:<14} {time.perf_counter() - started:6.1f}s')
+        return result
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield range(start, min(start + self.batch_size, total))
+
+    def seed_users(self, total):
+        # Hashing once keeps seeding fast; every perf user logs in with "perf-password"
+        password = make_password('perf-password')
+        user_ids = []
+        for batch in self.batches(total):
+            with transaction.atomic():
+                users = CustomUser.objects.bulk_create([
+                    CustomUser(
+                        username=f'perf_{self.run}_{index}',
+                        email=f'perf_{self.run}_{index}@example.com',
+                        phone=f'9{self.rng.randrange(10 ** 9):09d}',
+                        password=password,
+                        terms=True,
+                        is_verified=True,
+                    )
+                    for index in batch
+                ], batch_size=self.batch_size)
+            user_ids.extend(user.pk for user in users)
+        return user_ids
+
+    def seed_products(self, total):
+        products = []
+        for batch in self.batches(total):
+            rows = []
+            for index in batch:
+                category = self.rng.choice(list(PRODUCT_NAMES))
+                rows.append(Product(
+                    category=category,
+                    age_range=self.rng.choice(['0-6', '6-12', '1-2', '2-3', 'all']),
+                    name=f'{self.rng.choice(PRODUCT_NAMES[category])} #{index}',
+                    image=self.rng.choice(PRODUCT_IMAGES),
+                    description='Soft, durable and made for little explorers.',
+                    price=Decimal(self.rng.randrange(19900, 499900)) / 100,
+                    stock=self.rng.randrange(0, 500),
+                ))
+            with transaction.atomic():
+                created = Product.objects.bulk_create(rows, batch_size=self.batch_size)
+            products.extend(created)
+        return products
+
+    def seed_user_products(self, model, user_ids, products, per_user):
+        per_user = min(per_user, len(products))
+        if not per_user:
+            return 0
+        total = 0
+        for batch in self.batches(len(user_ids)):
+            rows = []
+            for index in batch:
+                for product in self.rng.sample(products, per_user):
+                    row = model(user_id=user_ids[index], product_id=product.pk)
+                    if model is Cart:
+                        row.quantity = self.rng.randint(1, 3)
+                    rows.append(row)
+            with transaction.atomic():
+                model.objects.bulk_create(rows, batch_size=self.batch_size, ignore_conflicts=True)
+            total += len(rows)
+        return total
+
+    def seed_orders(self, user_ids, products, total, items_per_order):
+        if not user_ids or not products:
+            return 0
+        shipping = Decimal(50)
+        item_count = 0
+        for batch in self.batches(total):
+            orders, lines = [], []
+            for index in batch:
+                picked = self.rng.sample(products, min(items_per_order, len(products)))
+                quantities = [self.rng.randint(1, 3) for _ in picked]
+                subtotal = sum(product.price * quantity for product, quantity in zip(picked, quantities))
+                status = self.rng.choice(STATUSES)
+                orders.append(Order(
+                    user_id=self.rng.choice(user_ids),
+                    order_id=f'P{self.run}{index:010d}',
+                    subtotal=subtotal,
+                    shipping=shipping,
+                    total_amount=subtotal + shipping,
+                    payment_method=self.rng.choice(['card', 'cash', 'upi']),
+                    status=status,
+                    payment_status='paid' if status in ('shipped', 'delivered') else 'pending',
+                    item_count=len(picked),
+                    first_item_thumbnail=picked[0].image.name if picked else '',
+                ))
+                lines.append(list(zip(picked, quantities)))
+
+            with transaction.atomic():
+                orders = Order.objects.bulk_create(orders, batch_size=self.batch_size)
+                items = [
+                    OrderItem(
+                        order_id=order.pk, product_id=product.pk, quantity=quantity, price=product.price,
+                        **OrderItem.product_snapshot(product)
+                    )
+                    for order, order_lines in zip(orders, lines)
+                    for product, quantity in order_lines
+                ]
+                OrderItem.objects.bulk_create(items, batch_size=self.batch_size)
+            item_count += len(items)
+        return item_count
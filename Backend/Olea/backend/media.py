@@ -0,0 +1,305 @@
+"""
+Media storage and serving.
+
+``HashedMediaStorage`` (the default storage, see STORAGES) puts a prefix of
+each file's content hash into its URL: ``products/boy6.jpg`` is served as
+``/media/products/boy6.3f2a9c1b04de.jpg``. Those URLs change whenever the
+bytes do, so ``serve`` can mark them immutable for a year. Plain
+names still work, with a short max-age. Only ``serve`` understands hashed
+names, so they are handed out only while Olea.urls routes MEDIA_URL to it
+(DEBUG or OFFLOAD); otherwise the web server serves MEDIA_ROOT and URLs are
+plain names.
+
+``serve`` answers conditional (ETag / If-Modified-Since) and single Range
+requests itself. With MEDIA_SERVING['OFFLOAD'] set, it only resolves the file
+and its headers and hands the bytes to the front proxy through
+X-Accel-Redirect (nginx) or X-Sendfile (Apache, lighttpd).
+
+``ContentAddressedStorage`` goes one step further and stores every upload
+under its sha256 (``products/<sha256>.jpg``): identical uploads share one
+file, and the name itself is the immutable URL. ``manage.py dedupe_media``
+moves existing files to that layout and removes ones nothing references.
+"""
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import time
+import uuid
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, HttpResponseRedirect, StreamingHttpResponse
+from django.urls import get_resolver, get_urlconf
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.static import was_modified_since
+
+URL_HASH_LENGTH = 12
+HASHED_NAME = re.compile(rf'^(?P<stem>.+)\.(?P<hash>[0-9a-f]{{{URL_HASH_LENGTH}}})(?P<ext>\.[^./]+)?$')
+RANGE = re.compile(r'^bytes=(?P<start>\d*)-(?P<end>\d*)$')
+CHUNK_SIZE = 64 * 1024
+CONTENT_NAME = re.compile(r'^[0-9a-f]{64}$')
+
+
+def file_digest(file):
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def media_routed():
+    """Whether the active URLconf sends MEDIA_URL to ``serve``, the only thing that resolves hashed names."""
+    return 'media' in get_resolver(get_urlconf()).reverse_dict
+
+
+class HashedMediaStorage(FileSystemStorage):
+    # Seconds a digest is trusted before the file is stat()ed again: a product list builds
+    # thousands of URLs, and re-checking each one on every call costs more than the rest of the row
+    recheck_interval = 5
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # name -> (checked_at, mtime_ns, size, sha256)
+        self.digests = {}
+
+    def content_hash(self, name):
+        """sha256 of the file's bytes, or None if it doesn't exist."""
+        cached = self.digests.get(name)
+        now = time.monotonic()
+        if cached and now - cached[0] < self.recheck_interval:
+            return cached[3]
+        try:
+            stat = os.stat(self.path(name))
+        except (OSError, SuspiciousFileOperation):
+            self.digests.pop(name, None)
+            return None
+        if cached and cached[1:3] == (stat.st_mtime_ns, stat.st_size):
+            digest = cached[3]
+        else:
+            with self.open(name) as file:
+                digest = file_digest(file)
+        self.digests[name] = (now, stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def hashed_name(self, name):
+        digest = self.content_hash(name)
+        if digest is None:
+            return name
+        stem, ext = posixpath.splitext(name)
+        return f'{stem}.{digest[:URL_HASH_LENGTH]}{ext}'
+
+    def url(self, name):
+        if name and settings.MEDIA_SERVING['HASHED_URLS'] and media_routed():
+            name = self.hashed_name(name)
+        return super().url(name)
+
+    def _save(self, name, content):
+        name = super()._save(name, content)
+        self.digests.pop(name, None)
+        return name
+
+    def delete(self, name):
+        super().delete(name)
+        self.digests.pop(name, None)
+
+
+class ContentAddressedStorage(HashedMediaStorage):
+    """Names files after the sha256 of their bytes, so the same image is only ever stored once."""
+
+    def content_hash(self, name):
+        stem = posixpath.splitext(posixpath.basename(name))[0]
+        if CONTENT_NAME.match(stem):
+            return stem
+        # Files from before the switch (see dedupe_media)
+        return super().content_hash(name)
+
+    def hashed_name(self, name):
+        if CONTENT_NAME.match(posixpath.splitext(posixpath.basename(name))[0]):
+            return name
+        return super().hashed_name(name)
+
+    def get_available_name(self, name, max_length=None):
+        # The final name depends on the content, see _save; identical content may overwrite itself
+        return name
+
+    def _save(self, name, content):
+        directory, basename = posixpath.split(name)
+        digest = getattr(content, 'sha256', None)
+        spooled = digest is None or not hasattr(content, 'temporary_file_path')
+        if spooled:
+            source, digest = self.spool(directory, content)
+        else:
+            # Hashed by HashingFileUploadHandler while it arrived: just move it into place
+            source = content.temporary_file_path()
+        name = posixpath.join(directory, digest + posixpath.splitext(basename)[1].lower())
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            if spooled:
+                os.remove(source)
+            return name
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        # Same name, same bytes: losing a race to another upload of this file is harmless
+        file_move_safe(source, full_path, allow_overwrite=True)
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        return name
+
+    def spool(self, directory, content):
+        """Write ``content`` to a temporary file next to its destination, hashing it on the way."""
+        full_directory = self.path(directory)
+        os.makedirs(full_directory, exist_ok=True)
+        path = os.path.join(full_directory, f'.upload-{uuid.uuid4().hex}')
+        digest = hashlib.sha256()
+        with open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666), 'wb') as file:
+            for chunk in content.chunks():
+                digest.update(chunk)
+                file.write(chunk)
+        return path, digest.hexdigest()
+
+
+class HashingFileUploadHandler(TemporaryFileUploadHandler):
+    """Streams every upload to a temporary file and hashes it chunk by chunk as it arrives."""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.digest = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.sha256 = self.digest.hexdigest()
+        return file
+
+
+def resolve(path):
+    """(stored name, URL hash or None) for a /media/ path."""
+    storage = default_storage
+    if storage.exists(path):
+        return path, None
+    match = HASHED_NAME.match(path)
+    if match is None or not hasattr(storage, 'content_hash'):
+        raise Http404('No such file')
+    name = match['stem'] + (match['ext'] or '')
+    if not storage.exists(name):
+        raise Http404('No such file')
+    return name, match['hash']
+
+
+def serve(request, path):
+    config = settings.MEDIA_SERVING
+    try:
+        name, url_hash = resolve(path)
+    except SuspiciousFileOperation:
+        raise Http404('No such file')
+
+    storage = default_storage
+    digest = storage.content_hash(name) if hasattr(storage, 'content_hash') else None
+    if url_hash is not None and digest[:URL_HASH_LENGTH] != url_hash:
+        # The file changed since this URL was issued; send the client to the current one
+        return HttpResponseRedirect(storage.url(name))
+    # Content-addressed names are already their own hashed URL
+    immutable = url_hash is not None or (digest is not None and storage.hashed_name(name) == name)
+
+    full_path = storage.path(name)
+    stat = os.stat(full_path)
+    etag = quote_etag(digest) if digest else None
+    last_modified = stat.st_mtime
+
+    # If-None-Match wins over If-Modified-Since when both are sent (RFC 9110 13.2.2)
+    if_none_match = request.headers.get('If-None-Match')
+    if etag and if_none_match:
+        not_modified = etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+    else:
+        not_modified = not was_modified_since(request.headers.get('If-Modified-Since'), last_modified)
+    if not_modified:
+        return cache_headers(HttpResponseNotModified(), etag, last_modified, immutable, config)
+
+    content_type, encoding = mimetypes.guess_type(name)
+    content_type = content_type or 'application/octet-stream'
+
+    if config['OFFLOAD']:
+        response = HttpResponse(content_type=content_type)
+        if config['OFFLOAD'] == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = quote(config['ACCEL_PREFIX'].rstrip('/') + '/' + name)
+        else:
+            response['X-Sendfile'] = full_path
+        return cache_headers(response, etag, last_modified, immutable, config)
+
+    byte_range = requested_range(request, etag, last_modified, stat.st_size)
+    if byte_range == 'unsatisfiable':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+
+    if byte_range is None:
+        # FileResponse goes through wsgi.file_wrapper, i.e. sendfile() under most servers
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(read_range(full_path, start, end), status=206, content_type=content_type)
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Accept-Ranges'] = 'bytes'
+    return cache_headers(response, etag, last_modified, immutable, config)
+
+
+def cache_headers(response, etag, last_modified, immutable, config):
+    if etag:
+        response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if immutable:
+        patch_cache_control(response, public=True, max_age=config['MAX_AGE'], immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=config['UNHASHED_MAX_AGE'])
+    return response
+
+
+def requested_range(request, etag, last_modified, size):
+    """(start, end) inclusive for a single satisfiable byte range, None to send the whole file."""
+    header = request.headers.get('Range')
+    if not header or request.method not in ('GET', 'HEAD'):
+        return None
+    if_range = request.headers.get('If-Range')
+    if if_range:
+        # A range only applies to the representation the client already holds part of
+        if if_range.startswith(('"', 'W/')):
+            if if_range != etag:
+                return None
+        elif parse_http_date_safe(if_range) != int(last_modified):
+            return None
+    match = RANGE.match(header.replace(' ', ''))
+    if match is None or not (match['start'] or match['end']):
+        # Malformed or multi-range requests get the whole file
+        return None
+    if not match['start']:
+        start, end = max(size - int(match['end']), 0), size - 1
+    else:
+        start = int(match['start'])
+        end = min(int(match['end']), size - 1) if match['end'] else size - 1
+    if start >= size or start > end:
+        return 'unsatisfiable'
+    return start, end
+
+
+def read_range(path, start, end):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = file.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
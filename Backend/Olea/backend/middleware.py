@@ -0,0 +1,260 @@
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from .compression import compress, negotiate
+from .query_inspector import QueryInspector
+
+
+class RequestMetrics:
+    """Rolling per-view samples kept in process, scraped through /api/_metrics/."""
+
+    PREFIX = 'olea_request'
+    LABEL = 'view'
+    FIELDS = (
+        ('duration_seconds', 'Wall time spent handling the request'),
+        ('db_queries', 'Database queries executed per request'),
+        ('db_seconds', 'Time spent in the database per request'),
+        ('serialize_seconds', 'Time spent building serializer data, including the queries it triggers'),
+        ('render_seconds', 'Time spent rendering the response body'),
+        ('response_bytes', 'Size of the response body'),
+    )
+    QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+    def __init__(self, window=1024):
+        self.window = window
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.samples = defaultdict(lambda: deque(maxlen=self.window))
+            self.totals = defaultdict(lambda: [0, 0.0])
+
+    def record(self, view, **values):
+        with self.lock:
+            for field, value in values.items():
+                self.samples[(view, field)].append(value)
+                total = self.totals[(view, field)]
+                total[0] += 1
+                total[1] += value
+
+    def snapshot(self):
+        with self.lock:
+            return {key: sorted(values) for key, values in self.samples.items()}, dict(self.totals)
+
+    @staticmethod
+    def percentile(values, q):
+        if not values:
+            return 0
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    def to_prometheus(self):
+        samples, totals = self.snapshot()
+        views = sorted({view for view, _ in samples})
+        lines = []
+        for field, help_text in self.FIELDS:
+            name = f'{self.PREFIX}_{field}'
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} summary')
+            for view in views:
+                values = samples.get((view, field))
+                if values is None:
+                    continue
+                label = view.replace('\\', '\\\\').replace('"', '\\"')
+                for q in self.QUANTILES:
+                    lines.append(f'{name}{{{self.LABEL}="{label}",quantile="{q}"}} {self.percentile(values, q)}')
+                count, total = totals[(view, field)]
+                lines.append(f'{name}_sum{{{self.LABEL}="{label}"}} {total}')
+                lines.append(f'{name}_count{{{self.LABEL}="{label}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+class GatewayMetrics(RequestMetrics):
+    """Per-call samples for outbound payment gateway requests."""
+
+    PREFIX = 'olea_gateway'
+    LABEL = 'call'
+    FIELDS = (
+        ('duration_seconds', 'Wall time of the gateway call including retries'),
+        ('attempts', 'HTTP attempts made per gateway call'),
+        ('errors', 'Calls that failed after retries or were short-circuited'),
+    )
+
+
+metrics = RequestMetrics(getattr(settings, 'PERFORMANCE_METRICS_WINDOW', 1024))
+gateway_metrics = GatewayMetrics(getattr(settings, 'PERFORMANCE_METRICS_WINDOW', 1024))
+
+
+class QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+class SerializeTimer:
+    def __init__(self):
+        self.seconds = 0.0
+        self.depth = 0
+
+
+# The current request's timer; sync_to_async copies the context, so a sync view under ASGI sees it too
+serialize_timer = ContextVar('serialize_timer', default=None)
+
+
+@contextmanager
+def measure_serialization():
+    """Adds the time spent in the block to the request's serialize timing; nested blocks count once."""
+    timer = serialize_timer.get()
+    if timer is None:
+        yield
+        return
+    timer.depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.depth -= 1
+        if not timer.depth:
+            timer.seconds += time.perf_counter() - start
+
+
+class PerformanceMiddleware:
+    """Times each request, its queries, its serialization and its rendering, and reports them via Server-Timing."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request._render_seconds = 0.0
+        queries = QueryTimer()
+        serializing = SerializeTimer()
+        token = serialize_timer.set(serializing)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(queries):
+                response = self.get_response(request)
+        finally:
+            serialize_timer.reset(token)
+        return self.finish(request, response, time.perf_counter() - start, queries, serializing)
+
+    async def __acall__(self, request):
+        # Under ASGI every thread-sensitive sync_to_async call of a request (sync views,
+        # the async ORM) runs in one thread, so the timer goes on that thread's connection
+        request._render_seconds = 0.0
+        queries = QueryTimer()
+        serializing = SerializeTimer()
+        token = serialize_timer.set(serializing)
+        await sync_to_async(self.attach)(queries)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            duration = time.perf_counter() - start
+            await sync_to_async(self.detach)(queries)
+            serialize_timer.reset(token)
+        return self.finish(request, response, duration, queries, serializing)
+
+    @staticmethod
+    def attach(queries):
+        # Looked up here, in the worker thread, so it's that thread's connection
+        connection.execute_wrappers.append(queries)
+
+    @staticmethod
+    def detach(queries):
+        connection.execute_wrappers.remove(queries)
+
+    def finish(self, request, response, duration, queries, serializing):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match and match.view_name else '<unresolved>'
+        size = 0 if response.streaming else len(response.content)
+
+        metrics.record(
+            view,
+            duration_seconds=duration,
+            db_queries=queries.count,
+            db_seconds=queries.seconds,
+            serialize_seconds=serializing.seconds,
+            render_seconds=request._render_seconds,
+            response_bytes=size,
+        )
+        response['Server-Timing'] = ', '.join([
+            f'total;dur={duration * 1000:.2f}',
+            f'db;dur={queries.seconds * 1000:.2f};desc="{queries.count} queries"',
+            f'serialize;dur={serializing.seconds * 1000:.2f}',
+            f'render;dur={request._render_seconds * 1000:.2f}',
+        ])
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered lazily; render here so the cost is measured on its own
+        start = time.perf_counter()
+        response.render()
+        request._render_seconds += time.perf_counter() - start
+        return response
+
+
+class QueryInspectorMiddleware:
+    """Staging aid: logs repeated (N+1) and slow statements per request; not enabled by default."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryInspector(action='log', label=f'{request.method} {request.path}'):
+            return self.get_response(request)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Negotiated zstd/br/gzip for text and JSON bodies of at least COMPRESSION['MIN_SIZE'] bytes."""
+
+    COMPRESSIBLE = ('application/json', 'text/', 'application/javascript', 'image/svg+xml')
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding') or response.has_header('Content-Range'):
+            return response
+        content_type = response.get('Content-Type', '')
+        if not content_type.startswith(self.COMPRESSIBLE) or len(response.content) < settings.COMPRESSION['MIN_SIZE']:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = negotiate(request.headers.get('Accept-Encoding'))
+        if coding is None:
+            return response
+
+        cacheable = request.method in ('GET', 'HEAD') and response.status_code == 200
+        body = compress(response.content, coding, cacheable=cacheable)
+        if len(body) >= len(response.content):
+            return response
+
+        response.content = body
+        response['Content-Length'] = str(len(body))
+        response['Content-Encoding'] = coding
+        # The compressed body differs byte for byte, so a strong ETag would be wrong (same as GZipMiddleware)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0015_product_age_range'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GuestCart',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('key', models.CharField(max_length=32, unique=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='GuestCartItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('guest_cart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='backend.guestcart')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='backend.product')),
+            ],
+            options={
+                'unique_together': {('guest_cart', 'product')},
+            },
+        ),
+    ]
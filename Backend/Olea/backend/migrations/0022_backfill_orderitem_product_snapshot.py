@@ -0,0 +1,46 @@
+from django.db import migrations, transaction
+from django.db.models import OuterRef, Subquery
+
+CHUNK_SIZE = 5000
+
+
+def backfill_snapshot(apps, schema_editor):
+    """Copy product name, category and image onto existing order items.
+
+    One UPDATE per range of CHUNK_SIZE item ids, each committed on its own, so
+    the table is never locked for the whole backfill and an interrupted run
+    picks up where it stopped (items that already have a name are skipped).
+    """
+    OrderItem = apps.get_model('backend', 'OrderItem')
+    Product = apps.get_model('backend', 'Product')
+    db_alias = schema_editor.connection.alias
+    items = OrderItem.objects.using(db_alias)
+    first = items.order_by('pk').values_list('pk', flat=True).first()
+    if first is None:
+        return
+    last = items.order_by('-pk').values_list('pk', flat=True).first()
+
+    product = Product.objects.using(db_alias).filter(pk=OuterRef('product_id'))
+    snapshot = {
+        'product_name': Subquery(product.values('name')[:1]),
+        'product_category': Subquery(product.values('category')[:1]),
+        'product_image': Subquery(product.values('image')[:1]),
+    }
+    for start in range(first, last + 1, CHUNK_SIZE):
+        with transaction.atomic(using=db_alias):
+            items.filter(
+                pk__gte=start, pk__lt=start + CHUNK_SIZE, product_name='', product__isnull=False
+            ).update(**snapshot)
+
+
+class Migration(migrations.Migration):
+    # Each chunk commits separately, see backfill_snapshot
+    atomic = False
+
+    dependencies = [
+        ('backend', '0021_orderitem_product_snapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_snapshot, migrations.RunPython.noop, elidable=True),
+    ]
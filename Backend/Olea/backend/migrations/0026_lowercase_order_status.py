@@ -0,0 +1,29 @@
+from django.db import migrations
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+FIELDS = ('status', 'payment_status')
+
+
+def lowercase_statuses(apps, schema_editor):
+    """Lowercase statuses the admin page saved capitalised ('Shipped', 'Delivered', ...).
+
+    The state machine and order archival only know the lowercase values, so
+    such orders could neither move on nor be archived.
+    """
+    db_alias = schema_editor.connection.alias
+    for model_name in ('Order', 'ArchivedOrder'):
+        model = apps.get_model('backend', model_name)
+        for field in FIELDS:
+            model.objects.using(db_alias).filter(~Q(**{field: Lower(field)})).update(**{field: Lower(field)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0025_order_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(lowercase_statuses, migrations.RunPython.noop, elidable=True),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:36
+
+import backend.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0026_lowercase_order_status'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='customuser',
+            managers=[
+                ('objects', backend.models.CustomUserManager()),
+            ],
+        ),
+    ]
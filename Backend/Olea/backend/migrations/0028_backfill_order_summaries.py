@@ -0,0 +1,48 @@
+from django.db import migrations, transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+CHUNK_SIZE = 5000
+
+
+def summary_expressions(item_model):
+    """Order.summary_expressions() over the historical item model."""
+    items = item_model.objects.filter(order_id=OuterRef('pk')).order_by()
+    return {
+        'item_count': Coalesce(Subquery(items.values('order_id').annotate(count=Count('pk')).values('count')), 0),
+        'first_item_thumbnail': Coalesce(Subquery(items.order_by('pk').values('product_image')[:1]), Value('')),
+    }
+
+
+def backfill_summaries(apps, schema_editor):
+    """Fill item_count and first_item_thumbnail on orders placed before 0025.
+
+    One UPDATE per range of CHUNK_SIZE order ids, each committed on its own, so
+    the tables are never locked for the whole backfill and an interrupted run
+    picks up where it stopped (orders that already have a count are skipped).
+    """
+    db_alias = schema_editor.connection.alias
+    for order_name, item_name in (('Order', 'OrderItem'), ('ArchivedOrder', 'ArchivedOrderItem')):
+        orders = apps.get_model('backend', order_name).objects.using(db_alias)
+        first = orders.order_by('pk').values_list('pk', flat=True).first()
+        if first is None:
+            continue
+        last = orders.order_by('-pk').values_list('pk', flat=True).first()
+
+        summary = summary_expressions(apps.get_model('backend', item_name))
+        for start in range(first, last + 1, CHUNK_SIZE):
+            with transaction.atomic(using=db_alias):
+                orders.filter(pk__gte=start, pk__lt=start + CHUNK_SIZE, item_count=0).update(**summary)
+
+
+class Migration(migrations.Migration):
+    # Each chunk commits separately, see backfill_summaries
+    atomic = False
+
+    dependencies = [
+        ('backend', '0027_customuser_managers'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop, elidable=True),
+    ]
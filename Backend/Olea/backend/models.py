@@ -1,9 +1,14 @@
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.db.models import Count, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Collate
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone  
 import random
 import datetime
 
+from .authentication import CACHED_USER_FIELDS, invalidate_cached_users
+
 class BaseModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -11,7 +16,24 @@ class BaseModel(models.Model):
     class Meta:
         abstract = True
 
+class UserQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        # Bulk updates send no post_save, so drop the auth cache entries of the rows changed here
+        if not set(kwargs) & set(CACHED_USER_FIELDS):
+            return super().update(**kwargs)
+        user_ids = list(self.values_list('pk', flat=True))
+        updated = super().update(**kwargs)
+        invalidate_cached_users(user_ids)
+        return updated
+
+
+class CustomUserManager(UserManager.from_queryset(UserQuerySet)):
+    """UserManager whose querysets keep the auth cache in step with bulk updates."""
+
+
 class CustomUser(AbstractUser):
+    objects = CustomUserManager()
+
     email = models.EmailField(unique=True)
     phone = models.CharField(max_length=10)
     ROLE_CHOICES = (('admin', 'Admin'), ('user', 'User'))
@@ -37,6 +59,13 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return self.username  
 
+class LiveProductManager(models.Manager):
+    """Products that haven't been archived."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(archived_at__isnull=True)
+
+
 class Product(BaseModel):
     CATEGORY_CHOICES = ( 
         ('boys', 'Boys'), 
@@ -65,10 +94,32 @@ class Product(BaseModel):
         choices=[('active', 'Active'), ('inactive', 'Inactive')], 
         default='active'
     )
+    # Set instead of deleting: carts and wishlists are cleared in batches by
+    # purge_archived_products, and order items keep their snapshot of the product
+    archived_at = models.DateTimeField(null=True, blank=True)
+
+    objects = LiveProductManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['category'], name='product_category_idx'),
+            # SQLite only uses an index for a case-insensitive LIKE 'prefix%' (the admin's ^name search) under NOCASE
+            models.Index(Collate('name', 'NOCASE'), name='product_name_nocase_idx'),
+            models.Index(fields=['-created_at'], condition=models.Q(archived_at__isnull=True), name='product_live_created_idx'),
+            models.Index(fields=['archived_at'], condition=models.Q(archived_at__isnull=False), name='product_archived_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def archive(self):
+        """Take the product off the store without touching the rows that reference it."""
+        if self.archived_at is None:
+            self.status = 'inactive'
+            self.archived_at = timezone.now()
+            self.save(update_fields=['status', 'archived_at', 'updated_at'])
+
 class Cart(BaseModel): 
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -80,6 +131,43 @@ class Cart(BaseModel):
     class Meta:
         unique_together = ('user', 'product')
 
+class GuestCart(BaseModel):
+    key = models.CharField(max_length=32, unique=True)
+
+    def __str__(self):
+        return self.key
+
+    def merge_into(self, user):
+        items = list(self.items.filter(product__archived_at=None).values_list('product_id', 'quantity'))
+        if not items:
+            return 0
+
+        existing = dict(
+            Cart.objects.filter(user=user, product_id__in=[product_id for product_id, _ in items])
+            .values_list('product_id', 'quantity')
+        )
+        Cart.objects.bulk_create(
+            [
+                Cart(user=user, product_id=product_id, quantity=existing.get(product_id, 0) + quantity)
+                for product_id, quantity in items
+            ],
+            update_conflicts=True,
+            unique_fields=['user', 'product'],
+            update_fields=['quantity', 'updated_at'],
+        )
+        return len(items)
+
+class GuestCartItem(BaseModel):
+    guest_cart = models.ForeignKey(GuestCart, related_name='items', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+
+    def __str__(self):
+        return f'{self.guest_cart.key} - {self.product.name}'
+
+    class Meta:
+        unique_together = ('guest_cart', 'product')
+
 class Wishlist(BaseModel):  
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -109,6 +197,8 @@ class Order(BaseModel):
         ('failed', 'Failed'),
         ('refunded', 'Refunded'),
     )
+    # Written when checkout opens the payment sheet, before any money has moved
+    ONLINE_PAYMENT_METHODS = ('card', 'upi')
 
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     order_id = models.CharField(max_length=20, unique=True)
@@ -120,19 +210,188 @@ class Order(BaseModel):
     payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='pending')  
     razorpay_payment_id = models.CharField(max_length=100, blank=True, null=True)
     razorpay_order_id = models.CharField(max_length=100, blank=True, null=True)  
+    # Copies of what order lists show, so they never read the items: set at checkout,
+    # refreshed by OrderItem.save()/delete() and by backfill_order_summaries
+    item_count = models.PositiveIntegerField(default=0)
+    first_item_thumbnail = models.ImageField(upload_to='products/', blank=True)
+
+    class Meta:
+        constraints = [
+            # One order per captured payment, so a retried verification can't create a second one
+            models.UniqueConstraint(
+                fields=['razorpay_payment_id'],
+                condition=models.Q(razorpay_payment_id__isnull=False),
+                name='unique_razorpay_payment_id',
+            ),
+        ]
+        indexes = [
+            # Admin list filters and date hierarchy
+            models.Index(fields=['status'], name='order_status_idx'),
+            models.Index(fields=['payment_status'], name='order_payment_status_idx'),
+            models.Index(fields=['created_at'], name='order_created_at_idx'),
+        ]
 
     def __str__(self):
         return self.order_id
 
+    @classmethod
+    def unpaid_online(cls, settled=('paid', 'refunded')):
+        """Card/UPI orders whose payment never went through: checkout attempts, not sales.
+
+        Refunded orders were paid, so they count as settled unless ``settled`` says otherwise.
+        Works on ArchivedOrder querysets too.
+        """
+        return Q(payment_method__in=cls.ONLINE_PAYMENT_METHODS) & ~Q(payment_status__in=settled)
+
+    @staticmethod
+    def summary_expressions(item_model):
+        """item_count and first_item_thumbnail as subqueries over ``item_model`` rows, for QuerySet.update()."""
+        items = item_model.objects.filter(order_id=OuterRef('pk')).order_by()
+        return {
+            'item_count': Coalesce(Subquery(items.values('order_id').annotate(count=Count('pk')).values('count')), 0),
+            'first_item_thumbnail': Coalesce(Subquery(items.order_by('pk').values('product_image')[:1]), Value('')),
+        }
+
 class OrderItem(BaseModel): 
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)  
-    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    # The product as it was ordered is kept in the product_* columns, so history
+    # renders without joining products and survives edits and deletion
+    product = models.ForeignKey(Product, null=True, on_delete=models.SET_NULL)
+    product_name = models.CharField(max_length=200, blank=True, default='')
+    product_category = models.CharField(max_length=20, blank=True, default='')
+    product_image = models.ImageField(upload_to='products/', blank=True)
     quantity = models.PositiveIntegerField()
     price = models.DecimalField(max_digits=10, decimal_places=2)  
     def __str__(self):
-        return f'{self.product.name} x {self.quantity}'
+        return f'{self.product_name} x {self.quantity}'
+
+    @staticmethod
+    def product_snapshot(product):
+        """The product columns copied onto a line item when it's ordered."""
+        return {'product_name': product.name, 'product_category': product.category, 'product_image': product.image.name}
 
     def save(self, *args, **kwargs):
         if not self.price and self.product:
             self.price = self.product.price
-        super().save(*args, **kwargs)
\ No newline at end of file
+        if not self.product_name and self.product:
+            for field, value in self.product_snapshot(self.product).items():
+                setattr(self, field, value)
+        super().save(*args, **kwargs)
+        Order.objects.filter(pk=self.order_id).update(**Order.summary_expressions(OrderItem))
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        Order.objects.filter(pk=self.order_id).update(**Order.summary_expressions(OrderItem))
+        return result
+
+class OrderEvent(models.Model):
+    """One status or payment status change of an order. Rows are only ever inserted.
+
+    The foreign keys have no database constraint and are never cascaded, so the
+    history outlives archived or deleted orders and writing it never locks them.
+    """
+    SOURCE_CHOICES = (
+        ('checkout', 'Checkout'),
+        ('payment', 'Payment verification'),
+        ('webhook', 'Payment webhook'),
+        ('reconcile', 'Payment reconciliation'),
+        ('admin', 'Admin API'),
+        ('admin_site', 'Django admin'),
+    )
+
+    order = models.ForeignKey(Order, related_name='events', on_delete=models.DO_NOTHING, db_constraint=False, db_index=False)
+    field = models.CharField(max_length=20)
+    from_value = models.CharField(max_length=20, null=True, blank=True)
+    to_value = models.CharField(max_length=20)
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    actor = models.ForeignKey(
+        CustomUser, null=True, blank=True, related_name='+', on_delete=models.DO_NOTHING, db_constraint=False
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # An order's timeline is one range scan of this index
+            models.Index(fields=['order', 'created_at'], name='orderevent_order_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.order_id} {self.field}: {self.from_value} -> {self.to_value}'
+
+class ArchivedOrder(models.Model):
+    """A delivered or cancelled order moved out of Order by archive_orders.
+
+    Same columns as Order, keeping its id, so OrderEvent rows still point at
+    it; timestamps are copied, not set on insert.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    order_id = models.CharField(max_length=20, unique=True)
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2)
+    shipping = models.DecimalField(max_digits=10, decimal_places=2)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    payment_method = models.CharField(max_length=10, choices=Order.PAYMENT_METHOD_CHOICES)
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    payment_status = models.CharField(max_length=20, choices=Order.PAYMENT_STATUS_CHOICES)
+    razorpay_payment_id = models.CharField(max_length=100, blank=True, null=True)
+    razorpay_order_id = models.CharField(max_length=100, blank=True, null=True)
+    item_count = models.PositiveIntegerField(default=0)
+    first_item_thumbnail = models.ImageField(upload_to='products/', blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.order_id
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, related_name='items', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, null=True, on_delete=models.SET_NULL)
+    product_name = models.CharField(max_length=200, blank=True, default='')
+    product_category = models.CharField(max_length=20, blank=True, default='')
+    product_image = models.ImageField(upload_to='products/', blank=True)
+    quantity = models.PositiveIntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.product_name} x {self.quantity}'
+
+class IdempotencyKey(BaseModel):
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    endpoint = models.CharField(max_length=100)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    response_body = models.JSONField(encoder=DjangoJSONEncoder)
+
+    class Meta:
+        unique_together = ('user', 'endpoint', 'key')
+
+    def __str__(self):
+        return f'{self.endpoint} {self.key}'
+
+class PaymentWebhookEvent(BaseModel):
+    OUTCOME_CHOICES = (
+        ('applied', 'Applied'),
+        ('duplicate', 'Duplicate'),
+        ('unmatched', 'Unmatched'),
+        ('ignored', 'Ignored'),
+    )
+
+    event_id = models.CharField(max_length=100, db_index=True)
+    event = models.CharField(max_length=100)
+    payload = models.JSONField()
+    processed_at = models.DateTimeField(null=True, blank=True)
+    outcome = models.CharField(max_length=20, choices=OUTCOME_CHOICES, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker only ever scans the unprocessed tail of the inbox
+            models.Index(fields=['id'], condition=models.Q(processed_at__isnull=True), name='webhook_inbox_pending'),
+        ]
+
+    def __str__(self):
+        return f'{self.event} {self.event_id}'
@@ -0,0 +1,56 @@
+"""
+Buffered writer for the OrderEvent log.
+
+Status changes are recorded with ``OrderEventWriter.add`` and inserted with
+bulk_create, ``batch_size`` rows per statement. Use the writer as a context
+manager inside the transaction that changes the orders: what is still
+buffered is written on a clean exit and dropped on an exception, so the
+events commit or roll back together with the changes they describe.
+"""
+from django.utils import timezone
+
+from .models import OrderEvent
+
+STATUS_FIELDS = ('status', 'payment_status')
+
+
+class OrderEventWriter:
+    batch_size = 500
+
+    def __init__(self, source, actor=None):
+        self.source = source
+        self.actor_id = getattr(actor, 'pk', actor)
+        self.pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.flush()
+        else:
+            self.pending.clear()
+
+    def add(self, order_id, field, from_value, to_value):
+        if from_value == to_value:
+            return
+        self.pending.append(OrderEvent(
+            order_id=order_id, field=field, from_value=from_value, to_value=to_value,
+            source=self.source, actor_id=self.actor_id, created_at=timezone.now(),
+        ))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def add_changes(self, order_id, before, after):
+        """Record every status field whose value differs between the two mappings."""
+        for field in STATUS_FIELDS:
+            if field in after:
+                self.add(order_id, field, before.get(field), after[field])
+
+    def add_created(self, order):
+        self.add_changes(order.pk, {}, {field: getattr(order, field) for field in STATUS_FIELDS})
+
+    def flush(self):
+        if self.pending:
+            OrderEvent.objects.bulk_create(self.pending, batch_size=self.batch_size)
+            self.pending = []
@@ -0,0 +1,82 @@
+"""
+Order status state machine.
+
+TRANSITIONS lists, for ``Order.status`` and ``Order.payment_status``, where
+each value may move next. ``transition`` applies a change to many orders with
+one conditional UPDATE: only rows currently in an allowed source state are
+touched, their ids are returned and each change is logged as an OrderEvent.
+"""
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .models import Order
+from .order_events import OrderEventWriter
+
+TRANSITIONS = {
+    'status': {
+        'pending': {'processing', 'cancelled'},
+        'processing': {'shipped', 'cancelled'},
+        'shipped': {'delivered'},
+        'delivered': set(),
+        'cancelled': set(),
+    },
+    'payment_status': {
+        'pending': {'paid', 'failed'},
+        'paid': {'refunded'},
+        # Razorpay lets the customer retry inside the same order, so a capture can follow a failed attempt
+        'failed': {'paid'},
+        'refunded': set(),
+    },
+}
+
+
+class TransitionError(ValueError):
+    pass
+
+
+def sources(field, target):
+    """Values of ``field`` an order may move to ``target`` from."""
+    if field not in TRANSITIONS:
+        raise TransitionError(f"'{field}' is not a status field.")
+    if not isinstance(target, str) or target not in TRANSITIONS[field]:
+        raise TransitionError(f"'{target}' is not a valid {field}.")
+    return sorted(source for source, targets in TRANSITIONS[field].items() if target in targets)
+
+
+# Payment statuses a captured payment settles
+CAPTURABLE = tuple(sources('payment_status', 'paid'))
+
+
+def captured_changes(status):
+    """The changes a captured payment makes to an order in ``status``.
+
+    Only a pending order starts processing; one cancelled meanwhile stays
+    cancelled, but is recorded as paid so it shows up to be refunded.
+    """
+    return {'status': 'processing' if status == 'pending' else status, 'payment_status': 'paid'}
+
+
+def captured_status():
+    """captured_changes()['status'] as an expression, for QuerySet.update()."""
+    return Case(When(status='pending', then=Value('processing')), default=F('status'))
+
+
+def transition(queryset, source, actor=None, **changes):
+    """Move every order in ``queryset`` that may legally make all ``changes``; returns the changed pks.
+
+    Each change is appended to the OrderEvent log, attributed to ``source`` and ``actor``.
+    """
+    if not changes:
+        raise TransitionError('No status change given.')
+    conditions = {f'{field}__in': sources(field, target) for field, target in changes.items()}
+    with transaction.atomic(), OrderEventWriter(source, actor) as events:
+        # The locked rows are exactly the ones the conditional UPDATE below changes
+        rows = list(
+            queryset.select_for_update().filter(**conditions).order_by('pk').values_list('pk', *changes)
+        )
+        if rows:
+            Order.objects.filter(pk__in=[row[0] for row in rows], **conditions).update(**changes, updated_at=timezone.now())
+        for pk, *before in rows:
+            events.add_changes(pk, dict(zip(changes, before)), changes)
+    return [row[0] for row in rows]
@@ -0,0 +1,147 @@
+import json
+import logging
+import re
+import time
+import warnings
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'THRESHOLD': 5,
+    'SLOW_MS': 100,
+    'ACTION': 'warn',
+    'REPORT_PATH': None,
+}
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*\?\s*,?)+\)', re.IGNORECASE)
+_VALUES_LIST = re.compile(r'\bVALUES\s*(?:\((?:\s*\?\s*,?)+\)\s*,?\s*)+', re.IGNORECASE)
+_PLACEHOLDER = re.compile(r'%s|\?')
+_SPACES = re.compile(r'\s+')
+
+
+def inspector_setting(name):
+    return getattr(settings, 'QUERY_INSPECTOR', {}).get(name, DEFAULTS[name])
+
+
+def fingerprint(sql):
+    """Collapse literals and parameter lists so queries differing only in values compare equal."""
+    sql = _STRING.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _VALUES_LIST.sub('VALUES (...) ', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+class NPlusOneError(AssertionError):
+    pass
+
+
+class QueryInspector:
+    """Collects the SQL run inside the block and flags statements repeated past a threshold.
+
+    Usage::
+
+        with QueryInspector(threshold=3, action='raise') as inspector:
+            client.get('/api/orders/')
+        inspector.report()
+    """
+
+    def __init__(self, threshold=None, slow_ms=None, action=None, report_path=None, label=''):
+        self.threshold = inspector_setting('THRESHOLD') if threshold is None else threshold
+        self.slow_ms = inspector_setting('SLOW_MS') if slow_ms is None else slow_ms
+        self.action = action or inspector_setting('ACTION')
+        self.report_path = report_path or inspector_setting('REPORT_PATH')
+        self.label = label
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, (time.perf_counter() - start) * 1000))
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._wrapper.__exit__(exc_type, exc, tb)
+        if exc_type is None:
+            self.check()
+        return False
+
+    def groups(self):
+        grouped = defaultdict(lambda: {'count': 0, 'total_ms': 0.0, 'sample': ''})
+        for sql, duration in self.queries:
+            group = grouped[fingerprint(sql)]
+            group['count'] += 1
+            group['total_ms'] += duration
+            group['sample'] = group['sample'] or sql
+        return sorted(
+            ({'fingerprint': key, **value} for key, value in grouped.items()),
+            key=lambda group: (group['count'], group['total_ms']),
+            reverse=True,
+        )
+
+    def repeated(self):
+        return [group for group in self.groups() if group['count'] > self.threshold]
+
+    def slow(self):
+        return [
+            {'sql': sql, 'ms': duration}
+            for sql, duration in self.queries
+            if duration > self.slow_ms
+        ]
+
+    def check(self):
+        if self.report_path:
+            self.report(self.report_path)
+
+        problems = [
+            f"{group['count']}x {group['fingerprint']}" for group in self.repeated()
+        ] + [
+            f"slow ({query['ms']:.1f} ms): {query['sql']}" for query in self.slow()
+        ]
+        if not problems:
+            return
+
+        message = f"{self.label or 'Query inspector'}: " + '; '.join(problems)
+        if self.action == 'raise':
+            raise NPlusOneError(message)
+        if self.action == 'log':
+            logger.warning(message)
+        else:
+            warnings.warn(message, stacklevel=3)
+
+    def report(self, path=None, limit=10):
+        data = {
+            'label': self.label,
+            'total_queries': len(self.queries),
+            'total_ms': sum(duration for _, duration in self.queries),
+            'worst': self.groups()[:limit],
+            'slow': self.slow(),
+        }
+        if path:
+            with open(path, 'a') as report_file:
+                report_file.write(json.dumps(data) + '\n')
+        return data
+
+
+class QueryInspectorMixin:
+    """TestCase mixin: ``with self.assertNoNPlusOne(): self.client.get(...)``."""
+
+    @contextmanager
+    def assertNoNPlusOne(self, threshold=None, slow_ms=None, label=''):
+        inspector = QueryInspector(threshold, slow_ms, action='raise', label=label or self.id())
+        with inspector:
+            yield inspector
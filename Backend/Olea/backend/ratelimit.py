@@ -0,0 +1,141 @@
+"""
+Token-bucket rate limiting for the endpoints that are expensive to call:
+login (password hashing), forgot-password (an OTP write and an SMTP send) and
+checkout.
+
+Each endpoint has a bucket per client IP and per account (see
+settings.RATE_LIMITS); a request takes one token from each and is answered
+with 429 and Retry-After, before the view runs, when either is empty.
+
+A bucket is a single integer in the shared cache: the time its next token
+frees up (GCRA, which admits exactly what a token bucket does). Taking a token
+is one atomic ``incr``; a rejected request gives it back with ``decr``. The
+key expires once the bucket is full again.
+"""
+import hashlib
+import math
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+
+
+def parse_rate(rate):
+    """'5/minute' -> (5 tokens, 60 seconds to refill all of them)."""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period.strip()[0]]
+
+
+def client_ip(request):
+    # With N proxies in front, the client is the Nth address from the right of X-Forwarded-For
+    proxies = settings.RATE_LIMITS['TRUSTED_PROXIES']
+    forwarded = [address.strip() for address in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if address.strip()]
+    if proxies and len(forwarded) >= proxies:
+        return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def bucket_key(endpoint, scope, identity):
+    digest = hashlib.sha256(str(identity).encode()).hexdigest()[:32]
+    return f'ratelimit:{endpoint}:{scope}:{digest}'
+
+
+def expiry(milliseconds):
+    return max(1, math.ceil(milliseconds / 1000))
+
+
+def take(key, rate):
+    """Take a token from the bucket at ``key``; returns 0, or the seconds until one is available."""
+    capacity, period = parse_rate(rate)
+    interval = max(1, period * 1000 // capacity)
+    now = int(time.time() * 1000)
+    # No key: the bucket is full
+    if cache.add(key, now + interval, expiry(interval)):
+        return 0
+    try:
+        ready_at = cache.incr(key, interval)
+    except ValueError:
+        # Expired since the add(), so full again
+        cache.set(key, now + interval, expiry(interval))
+        return 0
+    wait = ready_at - now - capacity * interval
+    if wait > 0:
+        cache.decr(key, interval)
+        return expiry(wait)
+    cache.touch(key, expiry(ready_at - now))
+    return 0
+
+
+def retry_after(request, endpoint, account):
+    """Seconds the client has to wait before ``endpoint`` may run, 0 if it may run now."""
+    config = settings.RATE_LIMITS
+    rates = config['RATES'].get(endpoint, {})
+    if not config['ENABLED'] or not rates:
+        return 0
+    identities = {'ip': client_ip(request)}
+    if account is not None:
+        identities['account'] = account(request)
+    for scope, rate in rates.items():
+        identity = identities.get(scope)
+        if identity:
+            wait = take(bucket_key(endpoint, scope, identity), rate)
+            if wait:
+                return wait
+    return 0
+
+
+def too_many(wait):
+    return {"detail": f"Too many requests. Try again in {wait} seconds."}, {'Retry-After': str(wait)}
+
+
+def submitted_email(request):
+    email = request.data.get('email')
+    return email.strip().lower() if isinstance(email, str) else None
+
+
+def user_id(request):
+    return request.user.pk
+
+
+def limit(request, endpoint, account):
+    """The 429 response when ``endpoint`` may not run now, else None."""
+    wait = retry_after(request, endpoint, account)
+    if wait:
+        body, headers = too_many(wait)
+        return Response(body, status=status.HTTP_429_TOO_MANY_REQUESTS, headers=headers)
+    return None
+
+
+def rate_limited(endpoint, account=None):
+    """For DRF views: function views under @api_view/@permission_classes, or wrap ``post`` with method_decorator.
+
+    Async views (backend.async_views) are supported the same way; the buckets are
+    taken in a thread. ``account`` maps the request to the account it acts for
+    (None to skip that bucket).
+    """
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapped(request, *args, **kwargs):
+                rejected = await sync_to_async(limit)(request, endpoint, account)
+                if rejected is not None:
+                    return rejected
+                return await view(request, *args, **kwargs)
+        else:
+            @wraps(view)
+            def wrapped(request, *args, **kwargs):
+                rejected = limit(request, endpoint, account)
+                if rejected is not None:
+                    return rejected
+                return view(request, *args, **kwargs)
+
+        return wrapped
+
+    return decorator
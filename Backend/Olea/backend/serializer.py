@@ -1,9 +1,131 @@
+from django.core.exceptions import FieldDoesNotExist
 from rest_framework import serializers
-from .models import Cart, Product, Wishlist, Order, OrderItem, CustomUser
+from rest_framework.permissions import SAFE_METHODS
+from .middleware import measure_serialization
+from .models import Cart, GuestCartItem, Product, Wishlist, Order, OrderEvent, OrderItem, CustomUser
 from django.contrib.auth.hashers import make_password
 
 
-class RegisterSerializer(serializers.ModelSerializer):
+def parse_field_paths(value):
+    """'id,items.product.name' -> {'id': {}, 'items': {'product': {'name': {}}}}; {} means the whole field."""
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in path.strip().split('.'):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+def sparse_fieldsets(request):
+    """(fields, omit) trees from ?fields= / ?omit= on reads; fields is None when every field is wanted."""
+    if request is None or request.method not in SAFE_METHODS:
+        return None, {}
+    params = getattr(request, 'query_params', request.GET)
+    fields, omit = params.get('fields'), params.get('omit')
+    return (parse_field_paths(fields) if fields else None), (parse_field_paths(omit) if omit else {})
+
+
+def descend(fields, omit, name):
+    """The (fields, omit) trees that apply inside the nested field ``name``."""
+    return (fields.get(name) or None) if fields is not None else None, omit.get(name, {})
+
+
+def select_fields(names, fields, omit):
+    """The names kept by the fields/omit trees, in their declared order."""
+    return [
+        name for name in names
+        if (fields is None or name in fields) and not (name in omit and not omit[name])
+    ]
+
+
+def only_fields(serializer, field_tree, omit_tree, joined, prefix=''):
+    """
+    Paths for QuerySet.only() covering the fields kept in ``serializer``, or None
+    when one of them isn't a plain column. Nested serializers for forward
+    relations in ``joined`` (the queryset's select_related) add their own columns.
+    """
+    model = serializer.Meta.model
+    paths = []
+    for name in select_fields(serializer.fields, field_tree, omit_tree):
+        field = serializer.fields[name]
+        if field.write_only or isinstance(field, serializers.ListSerializer):
+            # Reverse relations are prefetched with their own queryset
+            continue
+        if field.source == '*' and isinstance(field, serializers.BaseSerializer):
+            # Columns of this same row grouped into a nested object
+            nested = only_fields(field, *descend(field_tree, omit_tree, name), joined, prefix=prefix)
+            if nested is None:
+                return None
+            paths.extend(nested)
+            continue
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+        if not model_field.concrete or model_field.many_to_many:
+            return None
+        paths.append(prefix + model_field.name)
+        relation = prefix + model_field.name
+        if isinstance(field, serializers.BaseSerializer) and relation in joined:
+            nested = only_fields(field, *descend(field_tree, omit_tree, name), joined, prefix=f'{relation}__')
+            if nested is None:
+                return None
+            paths.extend(nested)
+    return paths
+
+
+def joined_relations(select_related, prefix=''):
+    relations = set()
+    for name, nested in select_related.items():
+        relations.add(prefix + name)
+        relations |= joined_relations(nested, f'{prefix}{name}__')
+    return relations
+
+
+class SparseFieldsMixin:
+    """Drops readable fields not asked for by ?fields= or excluded by ?omit=, nested paths included."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        field_tree, omit_tree = sparse_fieldsets(self.context.get('request'))
+        if field_tree is None and not omit_tree:
+            return fields
+
+        # Walk down from the root serializer; list serializers bind their child with an empty name
+        path, node = [], self
+        while node.parent is not None:
+            if node.field_name:
+                path.append(node.field_name)
+            node = node.parent
+        for name in reversed(path):
+            field_tree, omit_tree = descend(field_tree, omit_tree, name)
+
+        kept = set(select_fields(fields, field_tree, omit_tree))
+        return {name: field for name, field in fields.items() if field.write_only or name in kept}
+
+
+class TimedDataMixin:
+    """Counts the time spent building ``.data`` as the request's serialize timing (see PerformanceMiddleware)."""
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # many=True hands back a list serializer, and its .data is the one views read
+        meta = getattr(cls, 'Meta', None)
+        if meta is not None and not hasattr(meta, 'list_serializer_class'):
+            meta.list_serializer_class = TimedListSerializer
+
+    @property
+    def data(self):
+        with measure_serialization():
+            return super().data
+
+
+class TimedListSerializer(TimedDataMixin, serializers.ListSerializer):
+    pass
+
+
+class RegisterSerializer(TimedDataMixin, SparseFieldsMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
     
     class Meta:
@@ -23,7 +145,7 @@ class RegisterSerializer(serializers.ModelSerializer):
         return user
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedDataMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta: 
         model = CustomUser
         fields = ['id', 'username', 'email', 'phone', 'role', 'terms', 'password']
@@ -34,13 +156,14 @@ class UserSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(TimedDataMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = '__all__'
+        # Only live products are served, archived_at is always null
+        exclude = ['archived_at']
 
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(TimedDataMixin, SparseFieldsMixin, serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
     product_id = serializers.PrimaryKeyRelatedField(
         queryset=Product.objects.all(),
@@ -54,7 +177,20 @@ class CartSerializer(serializers.ModelSerializer):
         extra_kwargs = {'user': {'read_only': True}}
 
 
-class WishlistSerializer(serializers.ModelSerializer):
+class GuestCartItemSerializer(TimedDataMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    product = ProductSerializer(read_only=True)
+    product_id = serializers.PrimaryKeyRelatedField(
+        queryset=Product.objects.all(),
+        write_only=True,
+        source='product'
+    )
+
+    class Meta:
+        model = GuestCartItem
+        fields = ['id', 'product', 'product_id', 'quantity', 'created_at', 'updated_at']
+
+
+class WishlistSerializer(TimedDataMixin, SparseFieldsMixin, serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
     product_id = serializers.PrimaryKeyRelatedField(
         queryset=Product.objects.all(),
@@ -68,8 +204,20 @@ class WishlistSerializer(serializers.ModelSerializer):
         extra_kwargs = {'user': {'read_only': True}}
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
-    product = ProductSerializer(read_only=True)
+class ProductSnapshotSerializer(TimedDataMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    """The ordered product as recorded on the OrderItem itself; id is null once the product is deleted."""
+    id = serializers.IntegerField(source='product_id', read_only=True)
+    name = serializers.CharField(source='product_name', read_only=True)
+    category = serializers.CharField(source='product_category', read_only=True)
+    image = serializers.ImageField(source='product_image', read_only=True)
+
+    class Meta:
+        model = OrderItem
+        fields = ['id', 'name', 'category', 'image']
+
+
+class OrderItemSerializer(TimedDataMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    product = ProductSnapshotSerializer(source='*', read_only=True)
     product_id = serializers.PrimaryKeyRelatedField(
         queryset=Product.objects.all(), 
         source='product', 
@@ -80,8 +228,13 @@ class OrderItemSerializer(serializers.ModelSerializer):
         model = OrderItem
         fields = ['id', 'product', 'product_id', 'quantity', 'price', 'created_at', 'updated_at']
 
+    def validate(self, attrs):
+        if 'product' in attrs:
+            attrs.update(OrderItem.product_snapshot(attrs['product']))
+        return attrs
 
-class OrderSerializer(serializers.ModelSerializer):
+
+class OrderSerializer(TimedDataMixin, SparseFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)  
     user = UserSerializer(read_only=True)   
     user_id = serializers.PrimaryKeyRelatedField(
@@ -94,9 +247,35 @@ class OrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = [
-            'id', 'order_id', 'user', 'user_id', 'items', 'subtotal', 'shipping', 
-            'total_amount', 'payment_method', 'status', 'payment_status', 
+            'id', 'order_id', 'user', 'user_id', 'items', 'item_count', 'first_item_thumbnail',
+            'subtotal', 'shipping', 'total_amount', 'payment_method', 'status', 'payment_status', 
             'razorpay_payment_id', 'razorpay_order_id', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['order_id', 'created_at', 'updated_at']
+        read_only_fields = ['order_id', 'item_count', 'first_item_thumbnail', 'created_at', 'updated_at']
+
 
+class OrderSummarySerializer(TimedDataMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    """Compact order list rows (?view=summary): only Order's own columns, no items."""
+    user = serializers.IntegerField(source='user_id', read_only=True)
+
+    class Meta:
+        model = Order
+        fields = [
+            'id', 'order_id', 'user', 'item_count', 'first_item_thumbnail', 'total_amount',
+            'payment_method', 'status', 'payment_status', 'created_at',
+        ]
+        read_only_fields = fields
+
+
+class AdminOrderSummarySerializer(OrderSummarySerializer):
+    """Summary rows for staff, with the customer joined in instead of a bare id."""
+    user = UserSerializer(read_only=True)
+
+    class Meta(OrderSummarySerializer.Meta):
+        pass
+
+
+class OrderEventSerializer(TimedDataMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = OrderEvent
+        fields = ['id', 'field', 'from_value', 'to_value', 'source', 'created_at']
@@ -1,3 +1,1905 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import hashlib
+import hmac
+import importlib
+import io
+import json
+import os
+import posixpath
+import re
+import tempfile
+import time
+from unittest import mock, skipUnless
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction
+from django.apps import apps
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from Olea import urls as root_urls
+from . import admin as admin_module, archival, async_views, compression, media
+from .authentication import tokens_for_user, user_cache_key
+from .fake_gateway import FakeRazorpay
+from . import fast_serializers, serializer
+from .idempotency import lock_key
+from .gateway import GatewayError, GatewayUnavailable, RazorpayGateway, get_gateway
+from .middleware import SerializeTimer, gateway_metrics, metrics, serialize_timer
+from .models import ArchivedOrder, ArchivedOrderItem, Cart, CustomUser, GuestCart, GuestCartItem, Order, OrderEvent, OrderItem, PaymentWebhookEvent, Product, Wishlist
+from .query_inspector import NPlusOneError, QueryInspector, QueryInspectorMixin, fingerprint
+from .renderers import FastJSONParser, FastJSONRenderer
+from .order_events import OrderEventWriter
+from .views import place_order
+from .webhooks import process_webhook_batch
+
+
+# Olea.urls routes MEDIA_URL only with DEBUG or OFFLOAD on; the media tests run against this URLconf
+urlpatterns = [*root_urls.urlpatterns, *root_urls.media_urlpatterns]
+
+
+def make_product(index, **kwargs):
+    fields = {
+        'category': 'boys',
+        'name': f'Product {index}',
+        'image': 'products/boy6.jpg',
+        'description': 'Test product',
+        'price': '100.00',
+        'stock': 10,
+    }
+    fields.update(kwargs)
+    return Product.objects.create(**fields)
+
+
+class QueryInspectorTests(APITestCase):
+    def test_fingerprint_ignores_parameter_values(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM "backend_product" WHERE "id" = 1'),
+            fingerprint('SELECT * FROM "backend_product" WHERE "id" = 42'),
+        )
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE name = 'a' AND id IN (1, 2, 3)"),
+            fingerprint("SELECT * FROM t WHERE name = 'b' AND id IN (4)"),
+        )
+
+    def test_repeated_statements_raise(self):
+        products = [make_product(index) for index in range(4)]
+        with self.assertRaises(NPlusOneError):
+            with QueryInspector(threshold=2, action='raise'):
+                for product in products:
+                    Product.objects.get(pk=product.pk)
+
+    def test_report_lists_worst_offender_first(self):
+        make_product(0)
+        with QueryInspector(threshold=100, action='raise') as inspector:
+            for _ in range(3):
+                list(Product.objects.all())
+            CustomUser.objects.count()
+        report = inspector.report()
+        self.assertEqual(report['total_queries'], 4)
+        self.assertEqual(report['worst'][0]['count'], 3)
+
+
+class ViewQueryTests(QueryInspectorMixin, APITestCase):
+    """Endpoints must run a constant number of statements however many rows they return."""
+
+    threshold = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='shopper', email='shopper@example.com', password='pass-12345')
+        cls.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='pass-12345', role='admin', is_staff=True
+        )
+        cls.products = [make_product(index) for index in range(6)]
+        for product in cls.products:
+            Cart.objects.create(user=cls.user, product=product, quantity=2)
+            Wishlist.objects.create(user=cls.user, product=product)
+        for index in range(4):
+            order = Order.objects.create(
+                user=cls.user, order_id=f'ORDER{index}', subtotal='200.00', shipping='50.00',
+                total_amount='250.00', payment_method='cash',
+            )
+            for product in cls.products[:3]:
+                OrderItem.objects.create(order=order, product=product, quantity=1, price=product.price)
+
+    def assertQueriesBounded(self, method, url, user=None, **kwargs):
+        self.client.force_authenticate(user)
+        with self.assertNoNPlusOne(threshold=self.threshold):
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertLess(response.status_code, 300, response.content)
+        return response
+
+    def test_product_list(self):
+        self.assertQueriesBounded('get', '/api/products/')
+
+    def test_cart_list(self):
+        self.assertQueriesBounded('get', '/api/cart/', self.user)
+
+    def test_wishlist_list(self):
+        self.assertQueriesBounded('get', '/api/wishlist/', self.user)
+
+    def test_order_list(self):
+        self.assertQueriesBounded('get', '/api/orders/', self.user)
+
+    def test_admin_orders(self):
+        self.assertQueriesBounded('get', '/api/manage-orders/', self.admin)
+
+    def test_admin_dashboard(self):
+        self.assertQueriesBounded('get', '/api/admin-dashboard/', self.admin)
+
+    def test_checkout(self):
+        response = self.assertQueriesBounded('post', '/api/cart/checkout/', self.user, data={'payment_method': 'cash'})
+        self.assertEqual(len(response.data['order']['items']), len(self.products))
+        self.assertFalse(Cart.objects.filter(user=self.user).exists())
+
+
+class PerfToolingTests(TestCase):
+    def test_seed_then_benchmark(self):
+        call_command('seed_perf_data', users=6, products=8, orders=5, items_per_order=2, seed=1, stdout=StringIO())
+        self.assertEqual(CustomUser.objects.count(), 6)
+        self.assertEqual(OrderItem.objects.count(), 10)
+        self.assertEqual(Cart.objects.count(), 12)
+
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command('benchmark', requests=2, warmup=0, output=output.name, stdout=StringIO())
+            results = json.load(output)['results']
+
+        self.assertEqual(results['checkout']['statuses'], [201])
+        self.assertIn('p99_ms', results['admin_dashboard'])
+        # Benchmark writes are rolled back
+        self.assertEqual(Order.objects.count(), 5)
+
+
+class PerformanceMiddlewareTests(APITestCase):
+    TIMING = re.compile(
+        r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="(\d+) queries", serialize;dur=([\d.]+), render;dur=[\d.]+$'
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(
+            username='ops', email='ops@example.com', password=None, role='admin', is_staff=True
+        )
+        cls.customer = CustomUser.objects.create_user(username='browser', email='browser@example.com', password=None)
+        for index in range(3):
+            make_product(index)
+
+    def setUp(self):
+        metrics.reset()
+
+    def recorded(self, field):
+        samples, _ = metrics.snapshot()
+        return samples[('products-list', field)]
+
+    def test_sync_request_reports_its_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/products/')
+        match = self.TIMING.match(response['Server-Timing'])
+        self.assertIsNotNone(match, response['Server-Timing'])
+        self.assertEqual(int(match.group(1)), len(queries))
+        self.assertEqual(self.recorded('db_queries'), [len(queries)])
+        self.assertEqual(self.recorded('response_bytes'), [len(response.content)])
+        self.assertGreater(self.recorded('serialize_seconds')[0], 0)
+        self.assertGreater(self.recorded('render_seconds')[0], 0)
+
+    def test_serializer_data_is_timed_apart_from_rendering(self):
+        product = Product.objects.first()
+        to_representation = serializer.ProductSerializer.to_representation
+
+        def slow(self, instance):
+            time.sleep(0.05)
+            return to_representation(self, instance)
+
+        with mock.patch.object(serializer.ProductSerializer, 'to_representation', slow):
+            response = self.client.get(f'/api/products/{product.pk}/')
+        match = self.TIMING.match(response['Server-Timing'])
+        self.assertIsNotNone(match, response['Server-Timing'])
+        self.assertGreaterEqual(float(match.group(2)), 50)
+        samples, _ = metrics.snapshot()
+        self.assertGreaterEqual(samples[('products-detail', 'serialize_seconds')][0], 0.05)
+        self.assertLess(samples[('products-detail', 'render_seconds')][0], 0.05)
+
+    def test_list_serializers_are_timed_once(self):
+        timer = SerializeTimer()
+        token = serialize_timer.set(timer)
+        self.addCleanup(serialize_timer.reset, token)
+        many = serializer.ProductSerializer(Product.objects.all(), many=True)
+        self.assertEqual(len(many.data), 3)
+        self.assertGreater(timer.seconds, 0)
+        self.assertEqual(timer.depth, 0)
+
+    async def test_async_request_reports_its_queries(self):
+        response = await self.async_client.get('/api/products/')
+        self.assertEqual(response.status_code, 200)
+        match = self.TIMING.match(response['Server-Timing'])
+        self.assertIsNotNone(match, response['Server-Timing'])
+        self.assertGreater(int(match.group(1)), 0)
+        samples, _ = metrics.snapshot()
+        self.assertEqual(samples[('products-list', 'db_queries')], [int(match.group(1))])
+
+    def test_metrics_endpoint_is_admin_only(self):
+        self.client.get('/api/products/')
+        self.assertEqual(self.client.get('/api/_metrics/').status_code, 401)
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get('/api/_metrics/').status_code, 403)
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/_metrics/')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('# TYPE olea_request_db_queries summary', body)
+        self.assertIn('olea_request_db_queries_count{view="products-list"} 1', body)
+
+
+class AsgiTests(TestCase):
+    """The DRF views served through the ASGI handler, as Olea.asgi deploys them."""
+
+    def setUp(self):
+        cache.clear()
+
+    def post(self, path, data, user=None):
+        headers = {'Authorization': f'Bearer {RefreshToken.for_user(user).access_token}'} if user else {}
+        return self.async_client.post(path, data, content_type='application/json', headers=headers)
+
+    async def test_cash_order_is_placed_from_cart(self):
+        user = await CustomUser.objects.acreate_user(username='async', email='async@example.com', password='pass-12345')
+        product = await Product.objects.acreate(
+            category='toys', name='Blocks', image='products/boy6.jpg', description='d', price='120.00'
+        )
+        await Cart.objects.acreate(user=user, product=product, quantity=2)
+
+        response = await self.post('/api/create-razorpay-order/', {'payment_method': 'cash'}, user)
+
+        self.assertEqual(response.status_code, 201)
+        data = json.loads(response.content)
+        self.assertEqual(data['order']['total_amount'], '290.00')
+        self.assertFalse(await Cart.objects.filter(user=user).aexists())
+
+    async def test_requires_authentication(self):
+        response = await self.post('/api/verify-razorpay-payment/', {})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_register_and_forgot_password_send_mail(self):
+        response = await self.post('/api/register/', {
+            'username': 'newbie', 'email': 'newbie@example.com', 'phone': '9876543210',
+            'password': 'pass-12345', 'terms': True,
+        })
+        self.assertEqual(response.status_code, 201)
+
+        response = await self.post('/api/forgot-password/', {'email': 'newbie@example.com'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([message.subject for message in mail.outbox], ['🎉 Welcome to Olea!', 'Password Reset OTP'])
+
+    def test_failed_welcome_email_is_logged(self):
+        with mock.patch('backend.views.send_mail', side_effect=OSError('smtp down')), self.assertLogs('backend.views', 'ERROR') as logs:
+            response = self.client.post('/api/register/', {
+                'username': 'offline', 'email': 'offline@example.com', 'phone': '9876543210',
+                'password': 'pass-12345', 'terms': True,
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('offline@example.com', logs.output[0])
+
+
+class AsyncViewTests(TestCase):
+    """backend.async_views, which Olea.asgi routes registration, forgot-password and Razorpay orders to."""
+
+    factory = AsyncRequestFactory()
+
+    def setUp(self):
+        cache.clear()
+        self.fake = FakeRazorpay().start()
+        self.addCleanup(self.fake.stop)
+        self.enterContext(override_settings(RAZORPAY_GATEWAY={**settings.RAZORPAY_GATEWAY, 'BASE_URL': self.fake.url}))
+
+    async def post(self, view, data, user=None, **headers):
+        if user:
+            headers['Authorization'] = f'Bearer {RefreshToken.for_user(user).access_token}'
+        request = self.factory.post('/', data, content_type='application/json', headers=headers)
+        # The handler renders responses; called directly, the view leaves that to us
+        return (await view(request)).render()
+
+    async def make_cart(self, username):
+        user = await CustomUser.objects.acreate_user(username=username, email=f'{username}@example.com', password='pass-12345')
+        product = await Product.objects.acreate(
+            category='toys', name='Blocks', image='products/boy6.jpg', description='d', price='120.00'
+        )
+        await Cart.objects.acreate(user=user, product=product, quantity=2)
+        return user
+
+    async def test_cash_order_is_placed_from_cart(self):
+        user = await self.make_cart('async')
+
+        response = await self.post(async_views.create_razorpay_order, {'payment_method': 'cash'}, user)
+
+        self.assertEqual(response.status_code, 201)
+        data = json.loads(response.content)
+        self.assertEqual(data['order']['total_amount'], '290.00')
+        self.assertFalse(await Cart.objects.filter(user=user).aexists())
+
+    async def test_card_order_is_created_at_the_gateway_and_replayed(self):
+        user = await self.make_cart('card')
+
+        first = await self.post(async_views.create_razorpay_order, {'payment_method': 'card'}, user, idempotency_key='c1')
+        retry = await self.post(async_views.create_razorpay_order, {'payment_method': 'card'}, user, idempotency_key='c1')
+
+        self.assertEqual(first.status_code, 200)
+        data = json.loads(first.content)
+        self.assertEqual(self.fake.orders[data['razorpay_order_id']]['amount'], 29000)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(json.loads(retry.content), data)
+        self.assertEqual((len(self.fake.orders), await Order.objects.acount()), (1, 1))
+        self.assertTrue(await Cart.objects.filter(user=user).aexists())
+
+    async def test_gateway_calls_overlap(self):
+        users = [await self.make_cart(f'shopper{index}') for index in range(3)]
+        self.fake.latency = 0.3
+
+        started = time.perf_counter()
+        responses = await asyncio.gather(*[
+            self.post(async_views.create_razorpay_order, {'payment_method': 'card'}, user) for user in users
+        ])
+
+        self.assertEqual([response.status_code for response in responses], [200] * 3)
+        self.assertLess(time.perf_counter() - started, 0.8)
+
+    async def test_requires_authentication(self):
+        response = await self.post(async_views.create_razorpay_order, {'payment_method': 'cash'})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_register_and_forgot_password_send_mail(self):
+        response = await self.post(async_views.register, {
+            'username': 'newbie', 'email': 'newbie@example.com', 'phone': '9876543210',
+            'password': 'pass-12345', 'terms': True,
+        })
+        self.assertEqual(response.status_code, 201)
+
+        response = await self.post(async_views.forgot_password, {'email': 'newbie@example.com'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([message.subject for message in mail.outbox], ['🎉 Welcome to Olea!', 'Password Reset OTP'])
+
+        response = await self.post(async_views.forgot_password, {'email': 'nobody@example.com'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_asgi_routes_to_async_views(self):
+        from . import urls as backend_urls
+
+        self.addCleanup(importlib.reload, backend_urls)
+        with override_settings(ASYNC_VIEWS=True):
+            importlib.reload(backend_urls)
+        views = {pattern.name: pattern.callback for pattern in backend_urls.urlpatterns if getattr(pattern, 'name', None)}
+        self.assertIs(views['register'], async_views.register)
+        self.assertIs(views['forgot-password'], async_views.forgot_password)
+        self.assertIs(views['create-razorpay-order'], async_views.create_razorpay_order)
+        self.assertTrue(iscoroutinefunction(views['create-razorpay-order']))
+
+
+class GuestCartTests(APITestCase):
+    def setUp(self):
+        self.products = [make_product(index) for index in range(3)]
+
+    def add(self, product, quantity=1):
+        return self.client.post('/api/guest-cart/', {'product_id': product.pk, 'quantity': quantity}, format='json')
+
+    def test_adds_accumulate_in_one_cookie_cart(self):
+        self.assertEqual(self.add(self.products[0], 2).status_code, 201)
+        self.assertIn(settings.GUEST_CART_COOKIE_NAME, self.client.cookies)
+        response = self.add(self.products[0], 3)
+        self.assertEqual((response.status_code, response.data['quantity']), (201, 5))
+        self.assertEqual(GuestCart.objects.count(), 1)
+        self.assertEqual([item['quantity'] for item in self.client.get('/api/guest-cart/').data], [5])
+
+    def test_invalid_add_creates_no_cart(self):
+        response = self.client.post('/api/guest-cart/', {'product_id': 999999}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn(settings.GUEST_CART_COOKIE_NAME, response.cookies)
+        self.assertFalse(GuestCart.objects.exists())
+
+    def test_login_upserts_guest_items_into_cart(self):
+        user = CustomUser.objects.create_user(username='guest', email='guest@example.com', password='pass-12345')
+        Cart.objects.create(user=user, product=self.products[0], quantity=1)
+        self.add(self.products[0], 2)
+        self.add(self.products[1])
+        self.add(self.products[2])
+        self.products[2].archive()
+
+        response = self.client.post('/api/login/', {'email': 'guest@example.com', 'password': 'pass-12345'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.cookies[settings.GUEST_CART_COOKIE_NAME]['max-age'], 0)
+        self.assertEqual(
+            sorted(Cart.objects.filter(user=user).values_list('product_id', 'quantity')),
+            [(self.products[0].pk, 3), (self.products[1].pk, 1)],
+        )
+        self.assertFalse(GuestCartItem.objects.exists())
+
+    def test_stale_carts_are_purged(self):
+        for product in self.products:
+            cart = GuestCart.objects.create(key=f'cart{product.pk}')
+            GuestCartItem.objects.create(guest_cart=cart, product=product)
+        old = timezone.now() - timedelta(days=31)
+        GuestCart.objects.update(updated_at=old)
+        GuestCartItem.objects.exclude(product=self.products[2]).update(updated_at=old)
+        GuestCart.objects.filter(key=f'cart{self.products[1].pk}').update(updated_at=timezone.now())
+
+        out = StringIO()
+        call_command('purge_guest_carts', '--batch-size', '1', '--pause', '0', stdout=out)
+        self.assertIn('Removed 1 guest carts', out.getvalue())
+        self.assertEqual(
+            sorted(GuestCart.objects.values_list('key', flat=True)), [f'cart{self.products[1].pk}', f'cart{self.products[2].pk}']
+        )
+
+
+class CachedAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username='cached', email='cached@example.com', password='pass-12345')
+        self.admin = CustomUser.objects.create_user(
+            username='boss', email='boss@example.com', password='pass-12345', role='admin', is_staff=True
+        )
+
+    def authorize(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(user).access_token}')
+
+    def test_token_carries_access_claims(self):
+        token = tokens_for_user(self.admin).access_token
+        self.assertEqual((token['role'], token['is_staff'], token['is_active']), ('admin', True, True))
+
+    def test_user_lookup_is_cached(self):
+        self.authorize(self.user)
+        self.client.get('/api/cart/')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/cart/').status_code, 200)
+
+    def test_cache_holds_only_authorization_fields(self):
+        self.authorize(self.user)
+        self.client.get('/api/cart/')
+        cached = cache.get(user_cache_key(self.user.pk))
+        self.assertEqual(cached, {'id': self.user.pk, 'is_active': True, 'is_staff': False, 'is_superuser': False, 'role': 'user'})
+
+        # The rest of the user is loaded on demand
+        self.assertEqual(self.client.get('/api/bootstrap/', {'include': 'profile'}).data['profile']['email'], 'cached@example.com')
+
+    def test_bulk_updates_drop_cached_users(self):
+        self.authorize(self.admin)
+        self.assertEqual(self.client.get('/api/manage-orders/').status_code, 200)
+        CustomUser.objects.filter(pk=self.admin.pk).update(role='user', is_staff=False)
+        self.assertEqual(self.client.get('/api/manage-orders/').status_code, 403)
+
+        self.authorize(self.user)
+        self.client.get('/api/cart/')
+        with self.assertNumQueries(1):
+            CustomUser.objects.filter(pk=self.user.pk).update(last_login=timezone.now())
+        self.assertIsNotNone(cache.get(user_cache_key(self.user.pk)))
+        CustomUser.objects.filter(email__startswith='cached').update(is_active=False)
+        self.assertEqual(self.client.get('/api/cart/').status_code, 401)
+
+    def test_serializing_cached_user_loads_it_once(self):
+        self.authorize(self.user)
+        self.client.get('/api/cart/')
+        Cart.objects.create(user=self.user, product=make_product(0))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/cart/checkout/', {'payment_method': 'cash'}, format='json')
+        self.assertEqual(response.data['order']['user']['email'], 'cached@example.com')
+        # The deferred user fields come back in one SELECT, not one per serialized field
+        self.assertEqual(len(queries), 9)
+        self.assertEqual(len([query for query in queries if 'FROM "backend_customuser"' in query['sql']]), 1)
+
+    def test_blocking_user_takes_effect_immediately(self):
+        self.authorize(self.user)
+        self.assertEqual(self.client.get('/api/cart/').status_code, 200)
+
+        self.authorize(self.admin)
+        self.client.patch(f'/api/block-user/{self.user.pk}/', {'is_active': False}, format='json')
+
+        self.authorize(self.user)
+        self.assertEqual(self.client.get('/api/cart/').status_code, 401)
+
+
+class IdempotencyTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='retry', email='retry@example.com', password='pass-12345')
+        self.product = make_product(0)
+        self.client.force_authenticate(self.user)
+
+    def fill_cart(self):
+        Cart.objects.create(user=self.user, product=self.product, quantity=1)
+
+    def test_checkout_retry_replays_first_order(self):
+        self.fill_cart()
+        first = self.client.post('/api/cart/checkout/', {'payment_method': 'cash'}, format='json', HTTP_IDEMPOTENCY_KEY='k1')
+        self.fill_cart()
+        retry = self.client.post('/api/cart/checkout/', {'payment_method': 'cash'}, format='json', HTTP_IDEMPOTENCY_KEY='k1')
+
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.data['order']['order_id'], first.data['order']['order_id'])
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_reused_key_with_different_body_is_rejected(self):
+        self.fill_cart()
+        self.client.post('/api/cart/checkout/', {'payment_method': 'cash'}, format='json', HTTP_IDEMPOTENCY_KEY='k2')
+        response = self.client.post('/api/cart/checkout/', {'payment_method': 'upi'}, format='json', HTTP_IDEMPOTENCY_KEY='k2')
+        self.assertEqual(response.status_code, 422)
+
+    def test_duplicate_in_flight_is_turned_away(self):
+        self.fill_cart()
+        cache.add(lock_key(self.user.pk, 'Checkout', 'k3'), True)
+        self.addCleanup(cache.delete, lock_key(self.user.pk, 'Checkout', 'k3'))
+        started = time.monotonic()
+        response = self.client.post('/api/cart/checkout/', {'payment_method': 'cash'}, format='json', HTTP_IDEMPOTENCY_KEY='k3')
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual((response.status_code, response['Retry-After']), (409, '1'))
+        self.assertFalse(Order.objects.exists())
+
+    def test_payment_on_another_users_order_is_rejected(self):
+        other = CustomUser.objects.create_user(username='payer', email='payer@example.com', password=None)
+        Order.objects.create(
+            user=other, order_id='TAKEN', subtotal=100, shipping=0, total_amount=100, payment_method='card',
+            payment_status='paid', razorpay_payment_id='pay_1',
+        )
+        payload = {'razorpay_order_id': 'order_1', 'razorpay_payment_id': 'pay_1'}
+        payload['razorpay_signature'] = hmac.new(
+            settings.RAZORPAY_KEY_SECRET.encode(), b'order_1|pay_1', hashlib.sha256
+        ).hexdigest()
+
+        # From the cart, and by confirming a pending order
+        self.fill_cart()
+        response = self.client.post('/api/verify-razorpay-payment/', payload, format='json')
+        self.assertEqual(response.status_code, 409)
+        place_order(self.user, list(Cart.objects.filter(user=self.user).select_related('product')), clear_cart=False,
+                    payment_method='card', status='pending', payment_status='pending', razorpay_order_id='order_1')
+        response = self.client.post('/api/verify-razorpay-payment/', payload, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Order.objects.filter(user=self.user).get().payment_status, 'pending')
+
+    def test_payment_is_verified_once(self):
+        payload = {'razorpay_order_id': 'order_1', 'razorpay_payment_id': 'pay_1'}
+        payload['razorpay_signature'] = hmac.new(
+            settings.RAZORPAY_KEY_SECRET.encode(), b'order_1|pay_1', hashlib.sha256
+        ).hexdigest()
+
+        self.fill_cart()
+        first = self.client.post('/api/verify-razorpay-payment/', payload, format='json')
+        self.fill_cart()
+        retry = self.client.post('/api/verify-razorpay-payment/', payload, format='json')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.data['order_id'], first.data['order_id'])
+        self.assertEqual(Order.objects.count(), 1)
+
+
+@override_settings(RAZORPAY_WEBHOOK_SECRET='test-webhook-secret')
+class WebhookTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='hook', email='hook@example.com', password='pass-12345')
+        self.product = make_product(0)
+        Cart.objects.create(user=self.user, product=self.product, quantity=1)
+        cart_items = list(Cart.objects.filter(user=self.user).select_related('product'))
+        self.captured = place_order(
+            self.user, cart_items, clear_cart=False, payment_method='card',
+            status='pending', payment_status='pending', razorpay_order_id='order_sample_1',
+        )
+        self.failed = place_order(
+            self.user, cart_items, clear_cart=False, payment_method='upi',
+            status='pending', payment_status='pending', razorpay_order_id='order_sample_2',
+        )
+
+    def post_event(self, body, event_id=None, signature=None):
+        raw = json.dumps(body).encode()
+        signature = signature or hmac.new(settings.RAZORPAY_WEBHOOK_SECRET.encode(), raw, hashlib.sha256).hexdigest()
+        headers = {'X-Razorpay-Signature': signature}
+        if event_id:
+            headers['X-Razorpay-Event-Id'] = event_id
+        return self.client.post('/api/razorpay/webhook/', raw, content_type='application/json', headers=headers)
+
+    def test_signed_event_is_queued_without_touching_orders(self):
+        response = self.post_event({'event': 'payment.captured', 'payload': {}}, event_id='evt_1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(PaymentWebhookEvent.objects.get().event_id, 'evt_1')
+        self.captured.refresh_from_db()
+        self.assertEqual(self.captured.payment_status, 'pending')
+
+    def test_bad_signature_is_rejected(self):
+        response = self.post_event({'event': 'payment.captured'}, signature='forged')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PaymentWebhookEvent.objects.exists())
+
+    def test_unset_secret_rejects_everything(self):
+        body = {'event': 'payment.captured', 'payload': {}}
+        raw = json.dumps(body).encode()
+        with override_settings(RAZORPAY_WEBHOOK_SECRET=''), self.assertLogs('backend.views', 'ERROR'):
+            # Signed with the old public default, and with the empty key
+            for key in (b'olea-webhook-secret', b''):
+                signature = hmac.new(key, raw, hashlib.sha256).hexdigest()
+                self.assertEqual(self.post_event(body, signature=signature).status_code, 503)
+            with self.assertRaises(CommandError):
+                call_command('replay_razorpay_webhooks', stdout=StringIO())
+        self.assertFalse(PaymentWebhookEvent.objects.exists())
+
+    def test_replayed_samples_apply_transitions_once(self):
+        call_command('replay_razorpay_webhooks', stdout=StringIO())
+        self.assertEqual(PaymentWebhookEvent.objects.count(), 4)
+
+        # The batch's order events go out in a single INSERT
+        with self.assertNumQueries(14):
+            self.assertEqual(process_webhook_batch(), 4)
+
+        self.captured.refresh_from_db()
+        self.failed.refresh_from_db()
+        self.assertEqual(self.captured.payment_status, 'refunded')
+        self.assertEqual(self.captured.status, 'processing')
+        self.assertEqual(self.captured.razorpay_payment_id, 'pay_sample_1')
+        self.assertEqual(self.failed.payment_status, 'failed')
+        self.assertFalse(Cart.objects.filter(user=self.user).exists())
+        self.assertEqual(
+            sorted(PaymentWebhookEvent.objects.values_list('outcome', flat=True)),
+            ['applied', 'applied', 'applied', 'duplicate'],
+        )
+
+    def test_replay_fails_on_rejected_events(self):
+        command = 'backend.management.commands.replay_razorpay_webhooks'
+        with mock.patch(f'{command}.replay_host', return_value='elsewhere.example'), \
+                self.assertRaisesMessage(CommandError, '4 of 4 webhook events were rejected'):
+            call_command('replay_razorpay_webhooks', stdout=StringIO())
+        self.assertFalse(PaymentWebhookEvent.objects.exists())
+
+    def test_capture_after_failed_attempt_pays_the_order(self):
+        payment = {'order_id': 'order_sample_2', 'id': 'pay_retry_2'}
+        for event_id, event in (('evt_fail', 'payment.failed'), ('evt_capture', 'payment.captured')):
+            self.post_event({'event': event, 'payload': {'payment': {'entity': payment}}}, event_id=event_id)
+            process_webhook_batch()
+
+        self.failed.refresh_from_db()
+        self.assertEqual((self.failed.status, self.failed.payment_status), ('processing', 'paid'))
+        self.assertEqual(self.failed.razorpay_payment_id, 'pay_retry_2')
+        self.assertEqual(
+            list(PaymentWebhookEvent.objects.order_by('id').values_list('event_id', 'outcome')),
+            [('evt_fail', 'applied'), ('evt_capture', 'applied')],
+        )
+        self.assertEqual(
+            list(OrderEvent.objects.filter(order_id=self.failed.pk, field='payment_status', source='webhook')
+                 .order_by('id').values_list('from_value', 'to_value')),
+            [('pending', 'failed'), ('failed', 'paid')],
+        )
+
+    def test_redelivery_after_processing_is_a_duplicate(self):
+        call_command('replay_razorpay_webhooks', stdout=StringIO())
+        call_command('process_payment_webhooks', once=True, stdout=StringIO())
+        call_command('replay_razorpay_webhooks', stdout=StringIO())
+        call_command('process_payment_webhooks', once=True, stdout=StringIO())
+
+        self.assertEqual(PaymentWebhookEvent.objects.filter(outcome='duplicate').count(), 5)
+        self.captured.refresh_from_db()
+        self.assertEqual(self.captured.payment_status, 'refunded')
+
+
+class GatewayTests(APITestCase):
+    def setUp(self):
+        self.fake = FakeRazorpay().start()
+        self.addCleanup(self.fake.stop)
+        config = {
+            **settings.RAZORPAY_GATEWAY, 'BASE_URL': self.fake.url, 'BACKOFF': 0,
+            'READ_TIMEOUT': 0.5, 'FAILURE_THRESHOLD': 2, 'RESET_TIMEOUT': 30,
+        }
+        self.enterContext(override_settings(RAZORPAY_GATEWAY=config))
+        gateway_metrics.reset()
+
+    def test_get_is_retried_with_backoff(self):
+        order = self.fake.add_order()
+        self.fake.fail_next(503, 0)
+        self.assertEqual(get_gateway().fetch_order_payments(order['id']), [])
+        self.assertEqual(len(self.fake.requests), 3)
+        samples, _ = gateway_metrics.snapshot()
+        self.assertEqual(samples[('orders.payments', 'attempts')], [3])
+
+    def test_post_is_not_retried_once_sent(self):
+        self.fake.fail_next(500)
+        with self.assertRaises(GatewayError):
+            get_gateway().create_order(1000)
+        self.assertEqual(len(self.fake.requests), 1)
+        self.assertFalse(self.fake.orders)
+
+    def test_client_errors_are_not_retried(self):
+        with self.assertRaisesMessage(GatewayError, 'does not exist'):
+            get_gateway().fetch_payment('pay_missing')
+        self.assertEqual(len(self.fake.requests), 1)
+        self.assertEqual(get_gateway().breaker.state, 'closed')
+
+    def test_read_timeout_fails_fast(self):
+        self.fake.latency = 0.5
+        gateway = RazorpayGateway(MAX_RETRIES=0, READ_TIMEOUT=0.1)
+        with self.assertRaises(GatewayError):
+            gateway.create_order(1000)
+        samples, _ = gateway_metrics.snapshot()
+        self.assertLess(samples[('orders.create', 'duration_seconds')][0], 0.5)
+
+    def test_rate_limited_create_is_retried(self):
+        self.fake.fail_next(429)
+        order = get_gateway().create_order(2500, receipt='r1')
+        self.assertEqual(self.fake.orders[order['id']]['receipt'], 'r1')
+        samples, _ = gateway_metrics.snapshot()
+        self.assertEqual(samples[('orders.create', 'attempts')], [2])
+
+    async def test_async_calls_share_retries_and_metrics(self):
+        self.fake.fail_next(429)
+        order = await get_gateway().acreate_order(2500, receipt='r1')
+        self.assertEqual(self.fake.orders[order['id']]['receipt'], 'r1')
+        samples, _ = gateway_metrics.snapshot()
+        self.assertEqual(samples[('orders.create', 'attempts')], [2])
+
+    def test_circuit_opens_then_recovers(self):
+        now = [0.0]
+        gateway = get_gateway()
+        gateway.breaker.clock = lambda: now[0]
+        self.fake.fail_next(*[503] * 6)
+        for _ in range(2):
+            with self.assertRaises(GatewayError):
+                gateway.fetch_payment('pay_1')
+        self.assertEqual(gateway.breaker.state, 'open')
+
+        sent = len(self.fake.requests)
+        with self.assertRaises(GatewayUnavailable):
+            gateway.fetch_payment('pay_1')
+        self.assertEqual(len(self.fake.requests), sent)
+
+        now[0] = 31
+        self.assertEqual(gateway.breaker.state, 'half-open')
+        self.assertTrue(gateway.create_order(1000)['id'].startswith('order_fake'))
+        self.assertEqual(gateway.breaker.state, 'closed')
+
+    def test_checkout_records_pending_order_from_gateway(self):
+        user = CustomUser.objects.create_user(username='gw', email='gw@example.com', password='pass-12345')
+        Cart.objects.create(user=user, product=make_product(0), quantity=1)
+        self.client.force_authenticate(user)
+
+        response = self.client.post('/api/create-razorpay-order/', {'payment_method': 'card'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(response.data['razorpay_order_id'], self.fake.orders)
+        order = Order.objects.get(order_id=response.data['order_id'])
+        self.assertEqual(order.razorpay_order_id, response.data['razorpay_order_id'])
+
+        get_gateway().breaker.record_failure()
+        get_gateway().breaker.record_failure()
+        response = self.client.post('/api/create-razorpay-order/', {'payment_method': 'card'}, format='json')
+        self.assertEqual(response.status_code, 503)
+        self.assertIn(int(response['Retry-After']), range(1, 31))
+
+
+class UnpaidOrderTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(
+            username='books', email='books@example.com', password=None, role='admin', is_staff=True
+        )
+        cls.customer = CustomUser.objects.create_user(username='shopper', email='shopper@example.com', password=None)
+        combinations = [('cash', 'pending'), ('card', 'paid'), ('card', 'pending'), ('upi', 'failed'), ('upi', 'refunded')]
+        for index, (method, payment_status) in enumerate(combinations):
+            Order.objects.create(
+                user=cls.customer, order_id=f'PAY{index}', subtotal=100, shipping=0, total_amount=100,
+                payment_method=method, payment_status=payment_status,
+            )
+
+    def test_attempts_are_not_sales(self):
+        self.client.force_authenticate(self.admin)
+        dashboard = self.client.get('/api/admin-dashboard/').data
+        self.assertEqual((dashboard['totalRevenue'], dashboard['totalOrders']), (200.0, 2))
+        # Admins still see every order
+        self.assertEqual(len(self.client.get('/api/manage-orders/').data), 5)
+
+    def test_customer_history_skips_abandoned_checkouts(self):
+        self.client.force_authenticate(self.customer)
+        orders = json.loads(self.client.get('/api/orders/').content)
+        self.assertEqual([order['order_id'] for order in orders], ['PAY4', 'PAY1', 'PAY0'])
+        abandoned = Order.objects.get(order_id='PAY2')
+        self.assertEqual(self.client.get(f'/api/orders/{abandoned.pk}/').status_code, 404)
+
+
+class ReconcilePaymentsTests(TestCase):
+    def setUp(self):
+        self.fake = FakeRazorpay().start()
+        self.addCleanup(self.fake.stop)
+        config = {**settings.RAZORPAY_GATEWAY, 'BASE_URL': self.fake.url, 'BACKOFF': 0, 'FAILURE_THRESHOLD': 2}
+        self.enterContext(override_settings(RAZORPAY_GATEWAY=config))
+
+        self.user = CustomUser.objects.create_user(username='recon', email='recon@example.com', password='pass-12345')
+        product = make_product(0)
+        Cart.objects.create(user=self.user, product=product, quantity=1)
+        cart_items = list(Cart.objects.filter(user=self.user).select_related('product'))
+        self.orders = []
+        for _ in range(5):
+            gateway_order = self.fake.add_order()
+            self.orders.append(place_order(
+                self.user, cart_items, clear_cart=False, payment_method='card',
+                status='pending', payment_status='pending', razorpay_order_id=gateway_order['id'],
+            ))
+        self.fake.add_payment(self.orders[0].razorpay_order_id, status='failed')
+        self.fake.add_payment(self.orders[0].razorpay_order_id, status='captured', payment_id='pay_ok_0')
+        self.fake.add_payment(self.orders[2].razorpay_order_id, status='failed')
+        self.fake.add_payment(self.orders[3].razorpay_order_id, status='captured', payment_id='pay_ok_3')
+        self.fake.add_payment(self.orders[4].razorpay_order_id, status='authorized')
+
+    def statuses(self):
+        return list(Order.objects.order_by('pk').values_list('payment_status', 'razorpay_payment_id'))
+
+    def test_pending_orders_are_reconciled_in_batches(self):
+        call_command('reconcile_payments', batch_size=2, workers=3, older_than=0, stdout=StringIO())
+
+        self.assertEqual(self.statuses(), [
+            ('paid', 'pay_ok_0'), ('pending', None), ('pending', None), ('paid', 'pay_ok_3'), ('pending', None),
+        ])
+        self.assertEqual(Order.objects.get(pk=self.orders[3].pk).status, 'processing')
+        self.assertFalse(Cart.objects.filter(user=self.user).exists())
+
+    def test_abandoned_checkouts_expire(self):
+        Order.objects.update(created_at=timezone.now() - timedelta(days=2))
+        out = StringIO()
+        call_command('reconcile_payments', older_than=0, stdout=out)
+
+        # No payment at all, and all payments failed: cancelled. Authorized: may still be captured
+        self.assertEqual(
+            list(Order.objects.order_by('pk').values_list('status', 'payment_status')),
+            [('processing', 'paid'), ('cancelled', 'failed'), ('cancelled', 'failed'), ('processing', 'paid'), ('pending', 'pending')],
+        )
+        self.assertIn('2 expired', out.getvalue())
+        self.assertEqual(OrderEvent.objects.filter(source='reconcile', field='status', to_value='cancelled').count(), 2)
+
+    def test_failed_attempts_leave_orders_open_until_expiry(self):
+        # A payment.failed webhook marked the order failed; the customer then retried in the same Razorpay order
+        Order.objects.filter(pk__in=[self.orders[1].pk, self.orders[2].pk]).update(payment_status='failed')
+        call_command('reconcile_payments', older_than=0, stdout=StringIO())
+        self.assertEqual(Order.objects.get(pk=self.orders[2].pk).payment_status, 'failed')
+
+        self.fake.add_payment(self.orders[2].razorpay_order_id, status='captured', payment_id='pay_retry_2')
+        call_command('reconcile_payments', older_than=0, expire_after=0, stdout=StringIO())
+        self.assertEqual(
+            list(Order.objects.filter(pk__in=[self.orders[1].pk, self.orders[2].pk]).order_by('pk')
+                 .values_list('status', 'payment_status', 'razorpay_payment_id')),
+            [('cancelled', 'failed', None), ('processing', 'paid', 'pay_retry_2')],
+        )
+        self.assertEqual(Order.objects.get(pk=self.orders[4].pk).status, 'pending')
+
+    def test_recent_orders_are_left_alone(self):
+        call_command('reconcile_payments', stdout=StringIO())
+        self.assertEqual(Order.objects.filter(payment_status='pending').count(), 5)
+        self.assertEqual(self.fake.requests, [])
+
+    def test_resumes_from_checkpoint_after_gateway_outage(self):
+        original = self.fake.route
+        calls = []
+
+        def flaky_route(method, path, body):
+            # The first batch goes through, then the gateway degrades and the breaker opens
+            calls.append(path)
+            return original(method, path, body) if len(calls) <= 2 else (503, {})
+
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = f'{directory}/reconcile.json'
+            options = {'batch_size': 2, 'workers': 1, 'older_than': 0, 'checkpoint': checkpoint, 'stdout': StringIO()}
+            self.fake.route = flaky_route
+            with self.assertRaisesMessage(CommandError, '--resume'):
+                call_command('reconcile_payments', **options)
+            with open(checkpoint) as checkpoint_file:
+                self.assertEqual(json.load(checkpoint_file)['last_order_pk'], self.orders[3].pk)
+            self.assertEqual(self.statuses()[0], ('paid', 'pay_ok_0'))
+
+            self.fake.route = original
+            get_gateway().breaker.record_success()
+            sent = len(self.fake.requests)
+            call_command('reconcile_payments', resume=True, **options)
+            self.assertEqual(len(self.fake.requests) - sent, 1)
+
+        # Orders that errored stay pending and are picked up by the next full run
+        call_command('reconcile_payments', older_than=0, stdout=StringIO())
+        self.assertEqual(self.statuses(), [
+            ('paid', 'pay_ok_0'), ('pending', None), ('pending', None), ('paid', 'pay_ok_3'), ('pending', None),
+        ])
+
+
+class FastJSONTests(APITestCase):
+    def test_output_matches_drf_renderer(self):
+        from django.utils.translation import gettext_lazy
+        from rest_framework.renderers import JSONRenderer
+
+        data = {
+            'price': Decimal('1049.50'),
+            'created_at': datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc),
+            'day': date(2025, 1, 2),
+            'label': gettext_lazy('Paid'),
+            'text': 'caf\u00e9 \u2028 line',
+            7: [1.5, None, True, ('a', 'b')],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2'),
+        )
+
+    def test_parser_rejects_invalid_json(self):
+        self.assertEqual(FastJSONParser().parse(io.BytesIO(b'{"quantity": 2}')), {'quantity': 2})
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{"quantity": NaN}'))
+
+    def test_api_responses_use_fast_renderer(self):
+        make_product(0, price='19.99')
+        response = self.client.get('/api/products/')
+        self.assertIsInstance(response.accepted_renderer, FastJSONRenderer)
+        self.assertEqual(json.loads(response.content)[0]['price'], '19.99')
+
+
+class FastSerializerTests(APITestCase):
+    PAIRS = [
+        (fast_serializers.FastProductSerializer, serializer.ProductSerializer, Product),
+        (fast_serializers.FastUserSerializer, serializer.UserSerializer, CustomUser),
+        (fast_serializers.FastCartSerializer, serializer.CartSerializer, Cart),
+        (fast_serializers.FastWishlistSerializer, serializer.WishlistSerializer, Wishlist),
+        (fast_serializers.FastOrderItemSerializer, serializer.OrderItemSerializer, OrderItem),
+        (fast_serializers.FastOrderSerializer, serializer.OrderSerializer, Order),
+        (fast_serializers.FastOrderSummarySerializer, serializer.OrderSummarySerializer, Order),
+        (fast_serializers.FastAdminOrderSummarySerializer, serializer.AdminOrderSummarySerializer, Order),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            CustomUser.objects.create_user(username=f'fast{index}', email=f'fast{index}@example.com', password='pass-12345')
+            for index in range(2)
+        ]
+        products = [
+            make_product(0, price='19.90', age_range=None),
+            make_product(1, price='2500', category='toys', image=''),
+            make_product(2, price='0.05', status='inactive', name='Caf\u00e9 \u2028 set'),
+        ]
+        for user in cls.users:
+            for product in products[:2]:
+                Cart.objects.create(user=user, product=product, quantity=2)
+                Wishlist.objects.create(user=user, product=product)
+        for index in range(3):
+            order = Order.objects.create(
+                user=cls.users[index % 2], order_id=f'FAST{index}', subtotal='100.5', shipping=50,
+                total_amount='150.50', payment_method='card', payment_status='paid',
+                razorpay_order_id=f'order_{index}' if index else None,
+            )
+            for product in products[:index]:
+                OrderItem.objects.create(order=order, product=product, quantity=index, price=product.price)
+
+    def test_output_matches_drf_serializers(self):
+        request = APIRequestFactory().get('/api/products/')
+        for fast_class, drf_class, model in self.PAIRS:
+            for context in ({}, {'request': request}):
+                with self.subTest(serializer=drf_class.__name__, context=bool(context)):
+                    queryset = model.objects.order_by('pk')
+                    expected = json.loads(json.dumps(drf_class(queryset, many=True, context=context).data))
+                    self.assertEqual(fast_class(queryset, context=context).data, expected)
+
+    def test_orders_take_two_queries(self):
+        with self.assertNumQueries(2):
+            data = fast_serializers.FastOrderSerializer(Order.objects.all()).data
+        self.assertEqual([len(order['items']) for order in data], [0, 1, 2])
+
+    def test_list_endpoints_match_drf_output(self):
+        admin = CustomUser.objects.create_user(
+            username='fastadmin', email='fastadmin@example.com', password='pass-12345', is_staff=True, role='admin'
+        )
+        self.client.force_authenticate(admin)
+        orders = Order.objects.order_by('-created_at')
+
+        response = self.client.get('/api/manage-orders/')
+        self.assertEqual(json.loads(response.content), json.loads(json.dumps(serializer.OrderSerializer(orders, many=True).data)))
+
+        dashboard = json.loads(self.client.get('/api/admin-dashboard/').content)
+        self.assertEqual(dashboard['orders'], json.loads(json.dumps(serializer.OrderSerializer(orders, many=True).data)))
+        self.assertEqual(dashboard['totalRevenue'], 451.5)
+        self.assertEqual(dashboard['categoryData'], [{'name': 'boys', 'value': 3}, {'name': 'toys', 'value': 2}])
+        self.assertEqual(dashboard['recentActivity'][0]['message'], 'New order from fast0')
+
+
+class SparseFieldsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='sparse', email='sparse@example.com', password='pass-12345')
+        cls.product = make_product(0, price='49.00')
+        cls.cart_item = Cart.objects.create(user=cls.user, product=cls.product, quantity=2)
+        cls.order = Order.objects.create(
+            user=cls.user, order_id='SPARSE1', subtotal=98, shipping=50, total_amount=148, payment_method='cash',
+        )
+        OrderItem.objects.create(order=cls.order, product=cls.product, quantity=2, price='49.00')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_fields_and_omit_on_lists(self):
+        response = self.client.get('/api/products/', {'fields': 'id,name'})
+        self.assertEqual(response.data, [{'id': self.product.pk, 'name': 'Product 0'}])
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/orders/', {'fields': 'order_id,total_amount'})
+        self.assertEqual(response.data, [{'order_id': 'SPARSE1', 'total_amount': '148.00'}])
+
+        response = self.client.get('/api/orders/', {'fields': 'order_id,items.product.name,items.quantity'})
+        self.assertEqual(response.data, [{'order_id': 'SPARSE1', 'items': [{'product': {'name': 'Product 0'}, 'quantity': 2}]}])
+
+        response = self.client.get('/api/cart/', {'omit': 'user,product.description,product.image'})
+        self.assertNotIn('user', response.data[0])
+        self.assertNotIn('description', response.data[0]['product'])
+        self.assertEqual(response.data[0]['product']['price'], '49.00')
+
+    def test_fast_path_matches_drf_serializers(self):
+        request = APIRequestFactory().get('/api/orders/', {'fields': 'id,user.email,items.product', 'omit': 'items.product.image'})
+        request.query_params = request.GET
+        expected = json.loads(json.dumps(serializer.OrderSerializer(Order.objects.all(), many=True, context={'request': request}).data))
+        self.assertEqual(fast_serializers.FastOrderSerializer(Order.objects.all(), context={'request': request}).data, expected)
+
+    def test_detail_queryset_is_narrowed(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/cart/{self.cart_item.pk}/', {'fields': 'quantity,product.name'})
+        self.assertEqual(response.data, {'quantity': 2, 'product': {'name': 'Product 0'}})
+        sql = queries.captured_queries[-1]['sql']
+        self.assertIn('"backend_product"."name"', sql)
+        self.assertNotIn('description', sql)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/cart/{self.cart_item.pk}/', {'fields': 'quantity'})
+        # The product is still joined to skip archived ones, but none of its columns are read
+        self.assertNotIn('"backend_product"."name"', queries.captured_queries[-1]['sql'])
+
+    def test_writes_ignore_sparse_params(self):
+        product = make_product(1)
+        response = self.client.post('/api/cart/?fields=id', {'product_id': product.pk, 'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('product', response.data)
+
+
+@override_settings(COMPRESSION={**settings.COMPRESSION, 'CACHE_MIN_SIZE': 2048})
+class CompressionTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(30):
+            make_product(index)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_negotiation(self):
+        self.assertEqual(compression.negotiate('gzip'), 'gzip')
+        self.assertEqual(compression.negotiate('gzip;q=0, *'), compression.negotiate('*'))
+        self.assertIsNone(compression.negotiate('gzip;q=0'))
+        self.assertIsNone(compression.negotiate('identity'))
+        self.assertIsNone(compression.negotiate(None))
+        if 'br' in compression.CODECS:
+            self.assertEqual(compression.negotiate('gzip, br'), 'br')
+            self.assertEqual(compression.negotiate('gzip;q=1.0, br;q=0.5'), 'gzip')
+
+    def test_gzip_response(self):
+        plain = self.client.get('/api/products/')
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        response = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    @skipUnless('zstd' in compression.CODECS, 'zstandard is not installed')
+    def test_zstd_response(self):
+        plain = self.client.get('/api/products/')
+        response = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip, br, zstd')
+        self.assertEqual(response['Content-Encoding'], 'zstd')
+        self.assertEqual(compression.zstandard.ZstdDecompressor().decompress(response.content), plain.content)
+
+    def test_small_responses_are_not_compressed(self):
+        product = Product.objects.first()
+        response = self.client.get(f'/api/products/{product.pk}/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_hot_response_is_compressed_once(self):
+        calls = []
+
+        def counting_gzip(data, level):
+            calls.append(len(data))
+            return gzip.compress(data, compresslevel=level)
+
+        with mock.patch.dict(compression.CODECS, {'gzip': counting_gzip}):
+            first = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip')
+            second = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(first.content, second.content)
+
+            make_product(99)
+            self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(len(calls), 2)
+
+
+class BootstrapTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='boot', email='boot@example.com', password='pass-12345')
+        cls.products = [make_product(index) for index in range(3)]
+        Cart.objects.create(user=cls.user, product=cls.products[0], quantity=2)
+        Wishlist.objects.create(user=cls.user, product=cls.products[1])
+
+    def setUp(self):
+        cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(self.user).access_token}')
+
+    def test_sections_match_individual_endpoints(self):
+        response = self.client.get('/api/bootstrap/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['products'], self.client.get('/api/products/').data)
+        self.assertEqual(response.data['cart'], self.client.get('/api/cart/').data)
+        self.assertEqual(response.data['wishlist'], self.client.get('/api/wishlist/').data)
+        self.assertEqual(response.data['profile'], self.client.get(f'/api/users/{self.user.pk}/').data)
+
+    def test_one_query_per_section(self):
+        self.client.get('/api/bootstrap/')
+        # The auth cache holds no profile fields, so the profile is one query of its own
+        with self.assertNumQueries(4):
+            self.client.get('/api/bootstrap/')
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/bootstrap/', {'include': 'cart,wishlist', 'fields': 'id'})
+        self.assertEqual(list(response.data), ['cart', 'wishlist'])
+        self.assertIn('product', response.data['cart'][0])
+
+    def test_anonymous(self):
+        self.client.credentials()
+        response = self.client.get('/api/bootstrap/')
+        self.assertEqual(len(response.data['products']), 3)
+        self.assertEqual((response.data['cart'], response.data['wishlist'], response.data['profile']), ([], [], None))
+
+    def test_unknown_section(self):
+        response = self.client.get('/api/bootstrap/', {'include': 'cart,orders'})
+        self.assertEqual(response.status_code, 400)
+
+
+class MediaServingTests(APITestCase):
+    def setUp(self):
+        media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(ROOT_URLCONF=__name__, MEDIA_ROOT=media_root))
+        self.content = bytes(range(256)) * 8
+        # A file from before content-addressed names, served through its hashed URL
+        self.name = 'products/shirt.jpg'
+        os.makedirs(os.path.join(media_root, 'products'))
+        with open(os.path.join(media_root, self.name), 'wb') as file:
+            file.write(self.content)
+        self.digest = hashlib.sha256(self.content).hexdigest()
+        self.url = f'/media/products/shirt.{self.digest[:12]}.jpg'
+
+    def test_urls_carry_content_hash(self):
+        self.assertEqual(default_storage.url(self.name), self.url)
+        make_product(0, image=self.name)
+        self.assertTrue(self.client.get('/api/products/').data[0]['image'].endswith(self.url))
+        self.assertEqual(default_storage.url('products/missing.jpg'), '/media/products/missing.jpg')
+
+    def test_plain_urls_when_web_server_serves_media(self):
+        # Olea.urls as deployed with DEBUG and OFFLOAD off: no route resolves hashed names
+        with override_settings(ROOT_URLCONF='Olea.urls'):
+            self.assertEqual(default_storage.url(self.name), '/media/products/shirt.jpg')
+            make_product(0, image=self.name)
+            self.assertTrue(self.client.get('/api/products/').data[0]['image'].endswith('/media/products/shirt.jpg'))
+
+    def test_hashed_url_is_immutable(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        self.assertEqual(response['ETag'], f'"{self.digest}"')
+
+        plain = self.client.get('/media/products/shirt.jpg')
+        self.assertNotIn('immutable', plain['Cache-Control'])
+
+    def test_conditional_requests(self):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"{self.digest}"')
+        self.assertEqual(response.status_code, 304)
+        last_modified = self.client.get(self.url)['Last-Modified']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_range_requests(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-5:])
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=99999-').status_code, 416)
+        # A stale If-Range gets the whole file
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_stale_hash_redirects_to_current_url(self):
+        response = self.client.get('/media/products/shirt.000000000000.jpg')
+        self.assertEqual((response.status_code, response['Location']), (302, self.url))
+        self.assertEqual(self.client.get('/media/products/nothing.000000000000.jpg').status_code, 404)
+        self.assertEqual(self.client.get('/media/../settings.py').status_code, 404)
+
+    def test_offload_to_proxy(self):
+        with override_settings(MEDIA_SERVING={**settings.MEDIA_SERVING, 'OFFLOAD': 'x-accel-redirect'}):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/products/shirt.jpg')
+        self.assertEqual(response.content, b'')
+        self.assertIn('immutable', response['Cache-Control'])
+
+        with override_settings(MEDIA_SERVING={**settings.MEDIA_SERVING, 'OFFLOAD': 'x-sendfile'}):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], default_storage.path(self.name))
+
+    def test_route_needs_debug_or_offload(self):
+        self.addCleanup(importlib.reload, root_urls)
+        for debug, offload, routed in ((False, None, False), (True, None, True), (False, 'x-accel-redirect', True)):
+            with self.subTest(debug=debug, offload=offload), \
+                    override_settings(DEBUG=debug, MEDIA_SERVING={**settings.MEDIA_SERVING, 'OFFLOAD': offload}):
+                names = [pattern.pattern.name for pattern in importlib.reload(root_urls).urlpatterns]
+                self.assertEqual('media' in names, routed)
+
+
+class ContentAddressedStorageTests(APITestCase):
+    def setUp(self):
+        self.media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(ROOT_URLCONF=__name__, MEDIA_ROOT=self.media_root))
+        self.admin = CustomUser.objects.create_user(
+            username='media-admin', email='media-admin@example.com', password='pass-12345', is_staff=True, role='admin'
+        )
+
+    def image_bytes(self, color):
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new('RGB', (4, 4), color).save(buffer, 'JPEG')
+        return buffer.getvalue()
+
+    def test_identical_uploads_share_one_file(self):
+        content = self.image_bytes('red')
+        digest = hashlib.sha256(content).hexdigest()
+        first = default_storage.save('products/red.JPG', io.BytesIO(content))
+        second = default_storage.save('products/red-again.jpg', io.BytesIO(content))
+        self.assertEqual(first, second)
+        self.assertEqual(first, f'products/{digest}.jpg')
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'products')), [f'{digest}.jpg'])
+        # The name is already content-addressed, so the URL needs no extra hash
+        self.assertEqual(default_storage.url(first), f'/media/{first}')
+        self.assertIn('immutable', self.client.get(f'/media/{first}')['Cache-Control'])
+
+    def test_upload_is_hashed_while_streamed(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(self.admin).access_token}')
+        content = self.image_bytes('blue')
+        upload = io.BytesIO(content)
+        upload.name = 'blue.jpg'
+        fields = {'category': 'boys', 'name': 'Blue', 'description': 'x', 'price': '10.00', 'stock': 1, 'image': upload}
+        response = self.client.post('/api/products/', fields, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Product.objects.get().image.name, f'products/{hashlib.sha256(content).hexdigest()}.jpg')
+
+    def test_dedupe_media_command(self):
+        products_dir = os.path.join(self.media_root, 'products')
+        os.makedirs(products_dir)
+        content = self.image_bytes('green')
+        for name in ('boy6.jpg', 'boy6_n7teq67.jpg', 'orphan.jpg'):
+            with open(os.path.join(products_dir, name), 'wb') as file:
+                file.write(content if name != 'orphan.jpg' else self.image_bytes('black'))
+        first = make_product(0, image='products/boy6.jpg')
+        second = make_product(1, image='products/boy6_n7teq67.jpg')
+
+        out = StringIO()
+        call_command('dedupe_media', '--dry-run', '--min-age', '0', stdout=out)
+        self.assertIn('Would remove 3 unreferenced files', out.getvalue())
+        self.assertEqual(len(os.listdir(products_dir)), 3)
+
+        call_command('dedupe_media', '--min-age', '0', stdout=StringIO())
+        expected = f'products/{hashlib.sha256(content).hexdigest()}.jpg'
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.image.name, second.image.name), (expected, expected))
+        self.assertEqual(os.listdir(products_dir), [posixpath.basename(expected)])
+
+
+class AdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_superuser(username='root', email='root@example.com', password='pass-12345')
+        cls.product = make_product(0)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_orders(self, start, count):
+        for index in range(start, start + count):
+            user = CustomUser.objects.create_user(username=f'buyer{index}', email=f'buyer{index}@example.com', password=None)
+            order = Order.objects.create(
+                user=user, order_id=f'ADM{index}', subtotal=100, shipping=0, total_amount=100, payment_method='cash'
+            )
+            OrderItem.objects.create(order=order, product=self.product, quantity=1, price=100)
+            Cart.objects.create(user=user, product=self.product)
+
+    def test_change_lists_do_not_grow_with_rows(self):
+        self.add_orders(0, 2)
+        counts = {}
+        for url in ('/admin/backend/order/', '/admin/backend/orderitem/', '/admin/backend/cart/'):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            counts[url] = len(queries)
+
+        self.add_orders(2, 8)
+        for url, count in counts.items():
+            with self.assertNumQueries(count):
+                self.client.get(url)
+
+    def test_order_change_page_uses_autocomplete(self):
+        self.add_orders(0, 3)
+        order = Order.objects.get(order_id='ADM0')
+        response = self.client.get(f'/admin/backend/order/{order.pk}/change/')
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertNotContains(response, 'buyer1')
+        self.assertContains(response, 'Product 0')
+
+    def test_date_hierarchy_matches_django(self):
+        self.add_orders(0, 3)
+        Order.objects.filter(order_id='ADM0').update(created_at=datetime(2024, 2, 29, 23, 30, tzinfo=dt_timezone.utc))
+        queryset = Order.objects.all()
+        indexed = admin_module.IndexedDatesQuerySet(Order, query=queryset.query.chain())
+        for kind in ('year', 'month', 'day'):
+            self.assertEqual(list(indexed.datetimes('created_at', kind)), list(queryset.datetimes('created_at', kind)))
+        response = self.client.get('/admin/backend/order/', {'created_at__year': 2024})
+        self.assertContains(response, 'February 2024')
+
+    def test_capped_count_is_shown_as_a_floor(self):
+        self.add_orders(0, 3)
+        with mock.patch.object(admin_module.CappedCountPaginator, 'limit', 2):
+            response = self.client.get('/admin/backend/order/', {'status': 'pending'})
+        self.assertEqual(response.context['cl'].paginator.num_pages, 1)
+        self.assertContains(response, '2+ results')
+        self.assertContains(response, '2+ orders')
+
+    def test_product_search_uses_name_index(self):
+        make_product(1, name='Building Blocks')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/backend/product/', {'q': 'build'})
+        self.assertContains(response, 'Building Blocks')
+        self.assertNotContains(response, 'Product 0')
+        search = next(query['sql'] for query in queries if 'LIKE' in query['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {search}')
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        self.assertIn('product_name_nocase_idx', plan)
+
+
+class OrderStatusTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(
+            username='warehouse', email='warehouse@example.com', password='pass-12345', role='admin', is_staff=True
+        )
+        cls.product = make_product(0)
+        cls.orders = [
+            Order.objects.create(
+                user=cls.admin, order_id=f'ST{index}', subtotal=100, shipping=0, total_amount=100,
+                payment_method='cash', status=status,
+            )
+            for index, status in enumerate(['processing', 'processing', 'pending', 'delivered'])
+        ]
+
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(self.admin).access_token}')
+
+    def test_patch_rejects_illegal_transition(self):
+        delivered = self.orders[3]
+        response = self.client.patch(f'/api/manage-orders/{delivered.pk}/', {'status': 'pending'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("from 'delivered' to 'pending'", response.data['error'])
+        self.assertEqual(self.client.patch(f'/api/manage-orders/{delivered.pk}/', {'status': 'lost'}, format='json').status_code, 400)
+
+        response = self.client.patch(f'/api/manage-orders/{self.orders[0].pk}/', {'status': 'shipped'}, format='json')
+        self.assertEqual((response.status_code, response.data['status']), (200, 'shipped'))
+        # Repeating the same update is a no-op
+        response = self.client.patch(f'/api/manage-orders/{self.orders[0].pk}/', {'status': 'shipped'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_capitalised_status_from_admin_page(self):
+        response = self.client.patch(f'/api/manage-orders/{self.orders[0].pk}/', {'status': 'Shipped'}, format='json')
+        self.assertEqual((response.status_code, response.data['status']), (200, 'shipped'))
+
+        # Orders saved capitalised before statuses were validated
+        Order.objects.filter(pk=self.orders[1].pk).update(status='Shipped', payment_status='Paid')
+        migration = importlib.import_module('backend.migrations.0026_lowercase_order_status')
+        migration.lowercase_statuses(apps, connection.schema_editor())
+        self.assertEqual(Order.objects.filter(pk=self.orders[1].pk).values_list('status', 'payment_status').get(), ('shipped', 'paid'))
+        response = self.client.patch(f'/api/manage-orders/{self.orders[1].pk}/', {'status': 'Delivered'}, format='json')
+        self.assertEqual(response.data['status'], 'delivered')
+
+    def test_bulk_transition_is_one_update(self):
+        ids = [order.pk for order in self.orders] + [999999]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/manage-orders/bulk-status/', {'ids': ids, 'status': 'shipped'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], [self.orders[0].pk, self.orders[1].pk])
+        self.assertEqual(response.data['skipped'], [self.orders[2].pk, self.orders[3].pk, 999999])
+        updates = [query for query in queries.captured_queries if query['sql'].startswith('UPDATE "backend_order"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"backend_order"."status" IN', updates[0]['sql'])
+        self.assertEqual(
+            list(Order.objects.order_by('pk').values_list('status', flat=True)),
+            ['shipped', 'shipped', 'pending', 'delivered'],
+        )
+
+    def test_bulk_payment_and_validation(self):
+        response = self.client.post(
+            '/api/manage-orders/bulk-status/', {'ids': [self.orders[2].pk], 'status': 'processing', 'payment_status': 'paid'}, format='json'
+        )
+        self.assertEqual(response.data['updated'], [self.orders[2].pk])
+        self.assertEqual(Order.objects.get(pk=self.orders[2].pk).payment_status, 'paid')
+
+        for body in ({'ids': [], 'status': 'shipped'}, {'ids': ['x'], 'status': 'shipped'}, {'ids': [1]}, {'ids': [1], 'status': 'lost'}):
+            self.assertEqual(self.client.post('/api/manage-orders/bulk-status/', body, format='json').status_code, 400)
+
+
+class OrderEventTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(
+            username='support', email='support@example.com', password='pass-12345', role='admin', is_staff=True
+        )
+        cls.customer = CustomUser.objects.create_user(username='history', email='history@example.com', password='pass-12345')
+        cls.product = make_product(0, price=Decimal('50.00'))
+
+    def authorize(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(user).access_token}')
+
+    def test_timeline_records_every_transition(self):
+        Cart.objects.create(user=self.customer, product=self.product)
+        order = place_order(self.customer, list(Cart.objects.filter(user=self.customer).select_related('product')),
+                            payment_method='cash', status='pending', payment_status='pending')
+        self.authorize(self.admin)
+        self.client.patch(f'/api/manage-orders/{order.pk}/', {'status': 'processing'}, format='json')
+        self.client.post('/api/manage-orders/bulk-status/', {'ids': [order.pk], 'status': 'shipped'}, format='json')
+        # Rejected moves leave no trace
+        self.client.patch(f'/api/manage-orders/{order.pk}/', {'status': 'pending'}, format='json')
+
+        self.authorize(self.customer)
+        # The user, the ownership check and the timeline itself
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/orders/{order.pk}/events/')
+        self.assertEqual(
+            [(event['field'], event['from_value'], event['to_value'], event['source']) for event in response.data],
+            [
+                ('status', None, 'pending', 'checkout'),
+                ('payment_status', None, 'pending', 'checkout'),
+                ('status', 'pending', 'processing', 'admin'),
+                ('status', 'processing', 'shipped', 'admin'),
+            ],
+        )
+        self.assertEqual(OrderEvent.objects.filter(source='admin').values_list('actor_id', flat=True).distinct().get(), self.admin.pk)
+
+        other = CustomUser.objects.create_user(username='stranger', email='stranger@example.com', password=None)
+        self.authorize(other)
+        self.assertEqual(self.client.get(f'/api/orders/{order.pk}/events/').status_code, 404)
+
+    def test_timeline_query_uses_index(self):
+        sql = str(OrderEvent.objects.filter(order_id=1).order_by('created_at', 'id').query)
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        self.assertIn('orderevent_order_created_idx', plan)
+
+    def test_writer_batches_and_discards_on_error(self):
+        order = Order.objects.create(
+            user=self.customer, order_id='EVT1', subtotal=1, shipping=0, total_amount=1, payment_method='cash'
+        )
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic(), OrderEventWriter('admin') as events:
+                events.add(order.pk, 'status', 'pending', 'processing')
+                raise RuntimeError
+        self.assertFalse(OrderEvent.objects.exists())
+
+        with self.assertNumQueries(2):
+            with OrderEventWriter('admin') as events:
+                events.batch_size = 3
+                for index in range(5):
+                    events.add(order.pk, 'status', f'from{index}', f'to{index}')
+                events.add(order.pk, 'status', 'same', 'same')
+        self.assertEqual(OrderEvent.objects.count(), 5)
+
+
+class OrderItemSnapshotTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = CustomUser.objects.create_user(username='snapshot', email='snapshot@example.com', password=None)
+        cls.product = make_product(0, name='Dino Tee', category='boys', price=Decimal('20.00'))
+
+    def place(self):
+        Cart.objects.create(user=self.customer, product=self.product, quantity=2)
+        return place_order(self.customer, list(Cart.objects.filter(user=self.customer).select_related('product')),
+                           payment_method='cash', status='pending', payment_status='pending')
+
+    def test_history_renders_without_products(self):
+        order = self.place()
+        Product.objects.filter(pk=self.product.pk).update(name='Renamed', category='toys')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(self.customer).access_token}')
+
+        for url in ('/api/orders/', f'/api/orders/{order.pk}/'):
+            with self.subTest(url=url), CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            items = response.data[0]['items'] if url == '/api/orders/' else response.data['items']
+            self.assertEqual(items[0]['product']['name'], 'Dino Tee')
+            self.assertEqual(items[0]['product']['category'], 'boys')
+            self.assertTrue(items[0]['product']['image'].endswith('.jpg'))
+            self.assertFalse([query for query in queries if 'backend_product' in query['sql']])
+
+        self.product.delete()
+        item = OrderItem.objects.get(order=order)
+        self.assertIsNone(item.product_id)
+        self.assertEqual(str(item), 'Dino Tee x 2')
+        product = self.client.get(f'/api/orders/{order.pk}/').data['items'][0]['product']
+        self.assertEqual((product['id'], product['name']), (None, 'Dino Tee'))
+
+    def test_sparse_fields_read_snapshot_columns_only(self):
+        self.place()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(self.customer).access_token}')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/order-items/', {'fields': 'id,product.name'})
+        self.assertEqual(response.data, [{'id': OrderItem.objects.get().pk, 'product': {'name': 'Dino Tee'}}])
+        sql = queries[-1]['sql']
+        self.assertIn('product_name', sql)
+        self.assertNotIn('product_image', sql)
+
+    def test_backfill_migration_fills_in_chunks(self):
+        order = self.place()
+        other = make_product(1, name='Blocks', category='toys', image='products/building-blocks.jpg')
+        for index in range(4):
+            OrderItem.objects.create(order=order, product=other if index % 2 else self.product, quantity=1, price=1)
+        OrderItem.objects.update(product_name='', product_category='', product_image='')
+
+        migration = importlib.import_module('backend.migrations.0022_backfill_orderitem_product_snapshot')
+        with mock.patch.object(migration, 'CHUNK_SIZE', 2), CaptureQueriesContext(connection) as queries:
+            migration.backfill_snapshot(apps, connection.schema_editor())
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE')]), 3)
+        self.assertEqual(
+            sorted(OrderItem.objects.values_list('product_name', 'product_category', 'product_image').distinct()),
+            [('Blocks', 'toys', 'products/building-blocks.jpg'), ('Dino Tee', 'boys', 'products/boy6.jpg')],
+        )
+
+
+class ProductArchivalTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(
+            username='catalog', email='catalog@example.com', password=None, role='admin', is_staff=True
+        )
+        cls.shoppers = [
+            CustomUser.objects.create_user(username=f'shopper{index}', email=f'shopper{index}@example.com', password=None)
+            for index in range(3)
+        ]
+        cls.product, cls.other = make_product(0), make_product(1)
+        for user in cls.shoppers:
+            Cart.objects.create(user=user, product=cls.product)
+            Cart.objects.create(user=user, product=cls.other)
+            Wishlist.objects.create(user=user, product=cls.product)
+        order = Order.objects.create(
+            user=cls.shoppers[0], order_id='ARCH1', subtotal=100, shipping=0, total_amount=100, payment_method='cash'
+        )
+        OrderItem.objects.create(order=order, product=cls.product, quantity=1, price=100)
+
+    def authorize(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(user).access_token}')
+
+    def test_delete_archives_without_touching_references(self):
+        self.authorize(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(f'/api/manage-products/{self.product.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if query['sql'].startswith('DELETE')])
+
+        archived = Product.all_objects.get(pk=self.product.pk)
+        self.assertEqual(archived.status, 'inactive')
+        self.assertIsNotNone(archived.archived_at)
+        self.assertFalse(Product.objects.filter(pk=self.product.pk).exists())
+        self.assertEqual(OrderItem.objects.get().product_id, self.product.pk)
+        self.assertEqual(self.client.get(f'/api/products/{self.product.pk}/').status_code, 404)
+
+        # Rows still waiting for the purge are already hidden from their owners
+        self.assertEqual(Cart.objects.filter(product=self.product).count(), 3)
+        self.authorize(self.shoppers[0])
+        self.assertEqual([item['product']['id'] for item in self.client.get('/api/cart/').data], [self.other.pk])
+        self.assertEqual(self.client.get('/api/wishlist/').data, [])
+        response = self.client.post('/api/cart/', {'product_id': self.product.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_product_view_destroy_archives(self):
+        self.authorize(self.admin)
+        self.assertEqual(self.client.delete(f'/api/products/{self.other.pk}/').status_code, 204)
+        self.assertIsNotNone(Product.all_objects.get(pk=self.other.pk).archived_at)
+
+    def test_purge_removes_rows_in_batches(self):
+        self.product.archive()
+        self.assertEqual(archival.purge_archived_batch(batch_size=4), 4)
+        self.assertEqual(archival.purge_archived_batch(batch_size=4), 2)
+        self.assertEqual(archival.purge_archived_batch(batch_size=4), 0)
+        self.assertFalse(Cart.objects.filter(product=self.product).exists())
+        self.assertFalse(Wishlist.objects.exists())
+        self.assertEqual(Cart.objects.filter(product=self.other).count(), 3)
+
+        self.other.archive()
+        out = StringIO()
+        call_command('purge_archived_products', '--once', '--pause', '0', stdout=out)
+        self.assertIn('Removed 3 cart and wishlist rows', out.getvalue())
+
+    def test_live_listing_uses_partial_index(self):
+        sql = str(Product.objects.order_by('-created_at')[:50].query)
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        self.assertIn('product_live_created_idx', plan)
+
+
+class OrderArchivalTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = CustomUser.objects.create_user(username='archivist', email='archivist@example.com', password=None)
+        cls.other = CustomUser.objects.create_user(username='neighbour', email='neighbour@example.com', password=None)
+        products = [make_product(index, price=Decimal('10.00')) for index in range(2)]
+        old = timezone.now() - timedelta(days=400)
+        statuses = ['delivered', 'cancelled', 'shipped', 'delivered', 'delivered']
+        for index, order_status in enumerate(statuses):
+            order = Order.objects.create(
+                user=cls.other if index == 4 else cls.customer, order_id=f'ARC{index}', subtotal=20, shipping=0,
+                total_amount=20, payment_method='card', status=order_status, payment_status='paid',
+            )
+            for product in products[:index % 2 + 1]:
+                OrderItem.objects.create(order=order, product=product, quantity=index + 1, price=product.price)
+            OrderEvent.objects.create(order=order, field='status', to_value=order_status, source='admin')
+            # The fourth order is recent and stays in the hot table
+            if index != 3:
+                Order.objects.filter(pk=order.pk).update(created_at=old + timedelta(days=index))
+
+    def setUp(self):
+        self.client.force_authenticate(self.customer)
+
+    def test_command_moves_finished_orders_in_batches(self):
+        out = StringIO()
+        call_command('archive_orders', '--older-than', '365', '--dry-run', stdout=out)
+        self.assertIn('Would archive 3', out.getvalue())
+        self.assertFalse(ArchivedOrder.objects.exists())
+
+        call_command('archive_orders', '--older-than', '365', '--batch-size', '2', '--pause', '0', stdout=out)
+        self.assertIn('Archived 3 orders', out.getvalue())
+        self.assertEqual(sorted(Order.objects.values_list('order_id', flat=True)), ['ARC2', 'ARC3'])
+        self.assertEqual(sorted(ArchivedOrder.objects.values_list('order_id', flat=True)), ['ARC0', 'ARC1', 'ARC4'])
+        self.assertEqual(OrderItem.objects.count(), 3)
+        self.assertEqual(ArchivedOrderItem.objects.count(), 4)
+        archived = ArchivedOrder.objects.get(order_id='ARC1')
+        self.assertEqual(archived.created_at.date(), (timezone.now() - timedelta(days=399)).date())
+        self.assertEqual(OrderEvent.objects.count(), 5)
+
+        # Nothing left to move
+        call_command('archive_orders', '--older-than', '365', stdout=out)
+        self.assertEqual(ArchivedOrder.objects.count(), 3)
+
+    def test_history_is_unchanged_by_archiving(self):
+        before = json.loads(self.client.get('/api/orders/').content)
+        self.assertEqual([order['order_id'] for order in before], ['ARC3', 'ARC2', 'ARC1', 'ARC0'])
+        detail = self.client.get(f'/api/orders/{before[-1]["id"]}/').data
+
+        call_command('archive_orders', '--older-than', '365', '--pause', '0', stdout=StringIO())
+        # One UNION ALL for the orders, one for their items
+        with self.assertNumQueries(2):
+            after = json.loads(self.client.get('/api/orders/').content)
+        self.assertEqual(after, before)
+
+        response = self.client.get(f'/api/orders/{before[-1]["id"]}/')
+        self.assertEqual(json.loads(json.dumps(response.data)), json.loads(json.dumps(detail)))
+        events = self.client.get(f'/api/orders/{before[-1]["id"]}/events/')
+        self.assertEqual([event['to_value'] for event in events.data], ['delivered'])
+
+        stranger_order = ArchivedOrder.objects.get(order_id='ARC4')
+        self.assertEqual(self.client.get(f'/api/orders/{stranger_order.pk}/').status_code, 404)
+        self.assertEqual(self.client.get('/api/orders/', {'fields': 'order_id'}).data[-1], {'order_id': 'ARC0'})
+
+    def test_staff_views_include_archive(self):
+        admin = CustomUser.objects.create_superuser(
+            username='keeper', email='keeper@example.com', password=None, role='admin'
+        )
+        self.client.force_authenticate(admin)
+        dashboard = self.client.get('/api/admin-dashboard/').data
+        orders = json.loads(self.client.get('/api/manage-orders/').content)
+
+        call_command('archive_orders', '--older-than', '365', '--pause', '0', stdout=StringIO())
+        after = self.client.get('/api/admin-dashboard/').data
+        self.assertEqual((after['totalOrders'], after['totalRevenue']), (5, 100.0))
+        self.assertEqual((after['salesData'], after['categoryData']), (dashboard['salesData'], dashboard['categoryData']))
+        self.assertEqual(json.loads(self.client.get('/api/manage-orders/').content), orders)
+        summary = self.client.get('/api/manage-orders/', {'view': 'summary'}).data
+        self.assertEqual([row['order_id'] for row in summary], ['ARC4', 'ARC3', 'ARC2', 'ARC1', 'ARC0'])
+
+        archived = ArchivedOrder.objects.get(order_id='ARC1')
+        self.assertEqual(self.client.get(f'/api/manage-orders/{archived.pk}/').data['order_id'], 'ARC1')
+        self.assertEqual(self.client.patch(f'/api/manage-orders/{archived.pk}/', {'status': 'shipped'}).status_code, 404)
+
+        self.client.force_login(admin)
+        self.assertContains(self.client.get('/admin/backend/archivedorder/', {'q': 'ARC1'}), 'ARC1')
+        response = self.client.get(f'/admin/backend/archivedorder/{archived.pk}/change/')
+        self.assertContains(response, 'Product 0')
+        self.assertNotContains(response, 'name="_save"')
+
+
+class OrderSummaryTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(
+            username='lister', email='lister@example.com', password=None, role='admin', is_staff=True
+        )
+        cls.customer = CustomUser.objects.create_user(username='summary', email='summary@example.com', password=None)
+        cls.products = [make_product(0), make_product(1, image='products/building-blocks.jpg')]
+
+    def place(self):
+        for product in self.products:
+            Cart.objects.create(user=self.customer, product=product)
+        return place_order(self.customer, list(Cart.objects.filter(user=self.customer).select_related('product')),
+                           payment_method='cash', status='pending', payment_status='pending')
+
+    def test_checkout_and_item_changes_keep_summary(self):
+        order = self.place()
+        order.refresh_from_db()
+        self.assertEqual((order.item_count, order.first_item_thumbnail.name), (2, 'products/boy6.jpg'))
+
+        first = OrderItem.objects.filter(order=order).order_by('pk').first()
+        first.delete()
+        order.refresh_from_db()
+        self.assertEqual((order.item_count, order.first_item_thumbnail.name), (1, 'products/building-blocks.jpg'))
+        OrderItem.objects.create(order=order, product=self.products[0], quantity=1)
+        order.refresh_from_db()
+        self.assertEqual(order.item_count, 2)
+
+    def test_summary_lists_read_one_table(self):
+        order = self.place()
+        self.client.force_authenticate(self.customer)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/orders/', {'view': 'summary'})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('orderitem', queries[0]['sql'])
+        self.assertEqual(response.data[0]['item_count'], 2)
+        self.assertTrue(response.data[0]['first_item_thumbnail'].endswith('.jpg'))
+        self.assertNotIn('items', response.data[0])
+
+        self.client.force_authenticate(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/manage-orders/', {'view': 'summary'})
+        self.assertNotIn('orderitem', ' '.join(query['sql'] for query in queries))
+        row = response.data[0]
+        self.assertEqual((row['order_id'], row['user']['username'], row['user']['email']),
+                         (order.order_id, 'summary', 'summary@example.com'))
+        self.assertEqual(row['item_count'], 2)
+
+    def test_backfill_command(self):
+        order = self.place()
+        Order.objects.update(item_count=0, first_item_thumbnail='')
+        archived = ArchivedOrder.objects.create(
+            id=order.pk + 100, user=self.customer, order_id='OLDSUM', subtotal=1, shipping=0, total_amount=1,
+            payment_method='cash', status='delivered', payment_status='paid',
+            created_at=timezone.now(), updated_at=timezone.now(),
+        )
+        ArchivedOrderItem.objects.create(
+            id=999, order=archived, product_name='Old', product_image='products/old.jpg', quantity=1, price=1,
+            created_at=timezone.now(), updated_at=timezone.now(),
+        )
+        out = StringIO()
+        call_command('backfill_order_summaries', '--batch-size', '1', stdout=out)
+        self.assertEqual(Order.objects.values_list('item_count', 'first_item_thumbnail').get(), (2, 'products/boy6.jpg'))
+        self.assertEqual(ArchivedOrder.objects.values_list('item_count', 'first_item_thumbnail').get(), (1, 'products/old.jpg'))
+        self.assertIn('Order summaries are up to date', out.getvalue())
+
+    def test_backfill_migration_fills_in_chunks(self):
+        orders = [self.place() for _ in range(3)]
+        Order.objects.filter(pk=orders[1].pk).update(item_count=5)
+        Order.objects.exclude(pk=orders[1].pk).update(item_count=0, first_item_thumbnail='')
+        archived = ArchivedOrder.objects.create(
+            id=orders[-1].pk + 100, user=self.customer, order_id='OLDMIG', subtotal=1, shipping=0, total_amount=1,
+            payment_method='cash', status='delivered', payment_status='paid',
+            created_at=timezone.now(), updated_at=timezone.now(),
+        )
+        ArchivedOrderItem.objects.create(
+            id=998, order=archived, product_name='Old', product_image='products/old.jpg', quantity=1, price=1,
+            created_at=timezone.now(), updated_at=timezone.now(),
+        )
+
+        migration = importlib.import_module('backend.migrations.0028_backfill_order_summaries')
+        with mock.patch.object(migration, 'CHUNK_SIZE', 2), CaptureQueriesContext(connection) as queries:
+            migration.backfill_summaries(apps, connection.schema_editor())
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE')]), 3)
+        self.assertEqual(
+            list(Order.objects.order_by('pk').values_list('item_count', 'first_item_thumbnail')),
+            [(2, 'products/boy6.jpg'), (5, 'products/boy6.jpg'), (2, 'products/boy6.jpg')],
+        )
+        self.assertEqual(ArchivedOrder.objects.values_list('item_count', 'first_item_thumbnail').get(), (1, 'products/old.jpg'))
+
+
+TEST_RATES = {
+    'login': {'ip': '5/minute', 'account': '2/minute'},
+    'forgot_password': {'ip': '10/hour', 'account': '1/hour'},
+    'checkout': {'ip': '10/minute', 'account': '1/minute'},
+}
+
+
+@override_settings(RATE_LIMITS={'ENABLED': True, 'TRUSTED_PROXIES': 1, 'RATES': TEST_RATES})
+class RateLimitTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username='limited', email='limited@example.com', password='pass-12345')
+
+    def login(self, email='limited@example.com', ip='203.0.113.1'):
+        return self.client.post('/api/login/', {'email': email, 'password': 'wrong'}, format='json',
+                                HTTP_X_FORWARDED_FOR=ip)
+
+    def test_account_bucket_rejects_before_password_check(self):
+        self.assertEqual([self.login().status_code for _ in range(2)], [401, 401])
+        with mock.patch.object(CustomUser, 'check_password') as check_password:
+            response = self.login(email=' Limited@Example.com ', ip='198.51.100.7')
+        check_password.assert_not_called()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn(int(response['Retry-After']), range(1, 31))
+        # Another account from the same address still gets through
+        self.assertEqual(self.login(email='other@example.com').status_code, 401)
+
+    def test_ip_bucket_spans_accounts(self):
+        codes = [self.login(email=f'guess{index}@example.com').status_code for index in range(6)]
+        self.assertEqual(codes, [401] * 5 + [429])
+        self.assertEqual(self.login(email='fresh@example.com', ip='203.0.113.2').status_code, 401)
+
+    def test_tokens_refill_over_time(self):
+        now = 1_000_000.0
+        with mock.patch('backend.ratelimit.time.time', side_effect=lambda: now):
+            self.login()
+            self.login()
+            self.assertEqual(self.login().status_code, 429)
+            now += 30
+            self.assertEqual(self.login().status_code, 401)
+            self.assertEqual(self.login().status_code, 429)
+
+    def test_checkout_is_limited_per_account(self):
+        product = make_product(0)
+        self.client.force_authenticate(self.user)
+        Cart.objects.create(user=self.user, product=product)
+        self.assertEqual(self.client.post('/api/cart/checkout/', {'payment_method': 'cash'}, format='json').status_code, 201)
+        Cart.objects.create(user=self.user, product=product)
+        response = self.client.post('/api/cart/checkout/', {'payment_method': 'cash'}, format='json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(Order.objects.count(), 1)
+        # Login has its own buckets
+        self.assertEqual(self.login().status_code, 401)
+
+    def test_forgot_password_is_limited(self):
+        def forgot():
+            return self.client.post('/api/forgot-password/', {'email': 'limited@example.com'}, format='json')
+
+        self.assertEqual(forgot().status_code, 200)
+        response = forgot()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '3600')
+        self.assertEqual(len(mail.outbox), 1)
+
+    async def test_async_forgot_password_is_limited(self):
+        factory = AsyncRequestFactory()
+
+        async def forgot():
+            request = factory.post('/', {'email': 'limited@example.com'}, content_type='application/json')
+            return await async_views.forgot_password(request)
+
+        self.assertEqual((await forgot()).status_code, 200)
+        response = await forgot()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '3600')
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_disabled_limits_let_everything_through(self):
+        with override_settings(RATE_LIMITS={'ENABLED': False, 'TRUSTED_PROXIES': 0, 'RATES': TEST_RATES}):
+            self.assertEqual({self.login().status_code for _ in range(4)}, {401})
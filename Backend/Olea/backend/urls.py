@@ -1,16 +1,28 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
-    CartView, UserView, OrderView, ProductView, OrderItemView, WishlistView,
+    CartView, GuestCartView, UserView, OrderView, ProductView, OrderItemView, WishlistView,
     RegisterView, Checkout, CustomLoginView, ForgotPasswordView, ResetPasswordView,
-    create_razorpay_order, verify_razorpay_payment,
-    AdminDashboardView, AdminProductsView, AdminOrderView ,BlockUnblockUserView
+    create_razorpay_order, verify_razorpay_payment, razorpay_webhook,
+    BootstrapView, AdminDashboardView, AdminProductsView, AdminOrderView, AdminOrderBulkStatusView, BlockUnblockUserView, MetricsView
 )
 
+if settings.ASYNC_VIEWS:
+    from . import async_views
+    register_view = async_views.register
+    forgot_password_view = async_views.forgot_password
+    create_razorpay_order_view = async_views.create_razorpay_order
+else:
+    register_view = RegisterView.as_view()
+    forgot_password_view = ForgotPasswordView.as_view()
+    create_razorpay_order_view = create_razorpay_order
+
 
 router = DefaultRouter()
 router.register(r'cart', CartView, basename='cart')
+router.register(r'guest-cart', GuestCartView, basename='guest-cart')
 router.register(r'users', UserView, basename='users')
 router.register(r'order-items', OrderItemView, basename='order-items')
 router.register(r'orders', OrderView, basename='orders')
@@ -19,24 +31,28 @@ router.register(r'wishlist', WishlistView, basename='wishlist')
 
 urlpatterns = [
     
-    path('register/', RegisterView.as_view(), name='register'),
+    path('register/', register_view, name='register'),
     path('login/', CustomLoginView.as_view(), name='login'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-    path('forgot-password/', ForgotPasswordView.as_view(), name='forgot-password'),
+    path('forgot-password/', forgot_password_view, name='forgot-password'),
     path('reset-password/', ResetPasswordView.as_view(), name='reset-password'),
+    path('bootstrap/', BootstrapView.as_view(), name='bootstrap'),
 
     
     path('cart/checkout/', Checkout, name='checkout'),
-    path('create-razorpay-order/', create_razorpay_order, name='create-razorpay-order'),
+    path('create-razorpay-order/', create_razorpay_order_view, name='create-razorpay-order'),
     path('verify-razorpay-payment/', verify_razorpay_payment, name='verify-razorpay-payment'),
+    path('razorpay/webhook/', razorpay_webhook, name='razorpay-webhook'),
 
     
     path('admin-dashboard/', AdminDashboardView.as_view(), name='admin-dashboard'),
     path('manage-products/', AdminProductsView.as_view(), name='manage-products-list'),
     path('manage-products/<int:pk>/', AdminProductsView.as_view(), name='manage-products-detail'),
     path('manage-orders/', AdminOrderView.as_view()),            
+    path('manage-orders/bulk-status/', AdminOrderBulkStatusView.as_view(), name='manage-orders-bulk-status'),
     path('manage-orders/<int:pk>/', AdminOrderView.as_view()),
     path('block-user/<int:user_id>/', BlockUnblockUserView.as_view(), name='block-unblock-user'),
+    path('_metrics/', MetricsView.as_view(), name='metrics'),
 
     
     path('', include(router.urls)),
@@ -1,23 +1,107 @@
+import hashlib
+import json
+import logging
+import math
 from decimal import Decimal
 from django.core.mail import send_mail
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
 from django.utils.crypto import get_random_string
 from rest_framework import generics, status, viewsets
 from django.contrib.auth.tokens import default_token_generator
-from rest_framework.decorators import api_view, permission_classes
-from .models import Cart, Product, Wishlist, Order, OrderItem, CustomUser
-from .serializer import (CartSerializer, ProductSerializer, WishlistSerializer, OrderItemSerializer, OrderSerializer, UserSerializer, RegisterSerializer)
+from rest_framework.decorators import action, api_view, authentication_classes, permission_classes
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch, Q, prefetch_related_objects
+from django.utils import timezone
+from .models import ArchivedOrder, Cart, GuestCart, GuestCartItem, Product, Wishlist, Order, OrderEvent, OrderItem, CustomUser, PaymentWebhookEvent
+from .fast_serializers import (
+    FastAdminOrderSummaryHistorySerializer, FastArchivedOrderSerializer, FastCartSerializer, FastGuestCartItemSerializer,
+    FastOrderHistorySerializer, FastOrderItemSerializer, FastOrderSerializer, FastOrderSummaryHistorySerializer,
+    FastProductSerializer, FastUserSerializer, FastWishlistSerializer,
+)
+from .serializer import (CartSerializer, GuestCartItemSerializer, joined_relations, only_fields, sparse_fieldsets, ProductSerializer, WishlistSerializer, OrderEventSerializer, OrderItemSerializer, OrderSerializer, UserSerializer, RegisterSerializer)
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated 
-from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import load_deferred_fields, tokens_for_user
+from .idempotency import idempotent
+from .ratelimit import rate_limited, submitted_email, user_id
+from .order_events import OrderEventWriter
+from . import order_status
 from rest_framework.permissions import BasePermission 
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from .pagination import AdminPagination
+from .gateway import GatewayUnavailable, get_gateway
+from .middleware import gateway_metrics, metrics
 from django.conf import settings
+from django.http import Http404, HttpResponse
 import razorpay
 
+logger = logging.getLogger(__name__)
 
-client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+GUEST_CART_SALT = 'backend.guest_cart'
+
+
+def get_guest_cart(request, create=False):
+    key = request.get_signed_cookie(settings.GUEST_CART_COOKIE_NAME, default=None, salt=GUEST_CART_SALT)
+    guest_cart = GuestCart.objects.filter(key=key).first() if key else None
+    if guest_cart is None and create:
+        guest_cart = GuestCart.objects.create(key=get_random_string(length=32))
+    return guest_cart
+
+
+def order_items_prefetch():
+    # Items carry a snapshot of their product, so history never joins or prefetches products
+    return Prefetch('items', queryset=OrderItem.objects.all())
+
+
+def wants_summary(request):
+    # ?view=summary: compact order rows without their items, see OrderSummarySerializer
+    return request.query_params.get('view') == 'summary'
+
+
+def merge_guest_cart(request, user, response):
+    # Move the anonymous cart into the user's Cart in one upsert and drop the cookie
+    guest_cart = get_guest_cart(request)
+    if guest_cart:
+        with transaction.atomic():
+            guest_cart.merge_into(user)
+            guest_cart.delete()
+        response.delete_cookie(settings.GUEST_CART_COOKIE_NAME)
+    return response
+
+
+class SparseFieldsViewMixin:
+    """Narrows the list/detail queryset with .only() to the columns left after ?fields= / ?omit=."""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        field_tree, omit_tree = sparse_fieldsets(self.request)
+        select_related = queryset.query.select_related
+        if (field_tree is None and not omit_tree) or select_related is True:
+            return queryset
+
+        joined = joined_relations(select_related or {})
+        paths = only_fields(self.get_serializer_class()(), field_tree, omit_tree, joined)
+        if paths is None:
+            return queryset
+        # A relation can't be both deferred and followed by select_related
+        kept = [relation for relation in joined if relation in paths]
+        queryset = queryset.select_related(None)
+        if kept:
+            queryset = queryset.select_related(*kept)
+        return queryset.only(*paths)
+
+
+class FastListMixin:
+    """Serve list() through fast_serializer_class; writes and detail views keep the DRF serializer."""
+
+    fast_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(self.fast_serializer_class(queryset, context=self.get_serializer_context()).data)
 
 
 class IsAdminRole(BasePermission):
@@ -30,9 +114,40 @@ class IsAdminRole(BasePermission):
         )
 
 
+def send_welcome_email(user):
+    try:
+        send_mail(
+            subject="🎉 Welcome to Olea!",
+            message=(
+                f"Hi {user.username},\n\n"
+                "Your account has been created successfully!\n"
+                "We're thrilled to have you as part of our community.\n\n"
+                "You can now log in and start exploring our platform.\n\n"
+                "Best regards,\n"
+                "The Olea Team"
+            ),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=[user.email],
+            fail_silently=False,
+        )
+    except Exception:
+        logger.exception("Welcome email to %s failed", user.email)
+
+
+def send_otp_email(user, otp):
+    send_mail(
+        subject="Password Reset OTP",
+        message=f"Your OTP for password reset is: {otp}\n\nThis OTP will expire in 10 minutes.",
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[user.email],
+        fail_silently=False,
+    )
+
+
 class CustomLoginView(APIView):
     permission_classes = [AllowAny]  # ✅ CRITICAL: Allow unauthenticated access
     
+    @method_decorator(rate_limited('login', account=submitted_email))
     def post(self, request):
         email = request.data.get("email")
         password = request.data.get("password")
@@ -63,8 +178,8 @@ class CustomLoginView(APIView):
                 status=status.HTTP_401_UNAUTHORIZED,
             )
 
-        refresh = RefreshToken.for_user(user)
-        return Response(
+        refresh = tokens_for_user(user)
+        response = Response(
             {
                 "refresh": str(refresh),
                 "access": str(refresh.access_token),
@@ -77,6 +192,7 @@ class CustomLoginView(APIView):
             },
             status=status.HTTP_200_OK,
         )
+        return merge_guest_cart(request, user, response)
 
 
 class BlockUnblockUserView(APIView):
@@ -134,52 +250,39 @@ class RegisterView(generics.CreateAPIView):
 
     def perform_create(self, serializer):
         user = serializer.save(is_active=True, is_verified=True)
-
-        try:
-            send_mail(
-                subject="🎉 Welcome to Olea!",
-                message=(
-                    f"Hi {user.username},\n\n"
-                    "Your account has been created successfully!\n"
-                    "We're thrilled to have you as part of our community.\n\n"
-                    "You can now log in and start exploring our platform.\n\n"
-                    "Best regards,\n"
-                    "The Olea Team"
-                ),
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                fail_silently=False,
-            )
-        except Exception as e:
-            print("Email sending failed:", e)
-
+        send_welcome_email(user)
         return user
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = self.perform_create(serializer)
-        refresh = RefreshToken.for_user(user)
-
-        return Response(
-            {
-                "message": "Account created successfully! A welcome email has been sent.",
-                "refresh": str(refresh),
-                "access": str(refresh.access_token),
-                "user": {
-                    "id": user.id,
-                    "email": user.email,
-                    "username": user.username,
-                    "role": user.role,  # ✅ ADDED: Include role here too
-                },
+        return registered_response(request, user)
+
+
+def registered_response(request, user):
+    refresh = tokens_for_user(user)
+    response = Response(
+        {
+            "message": "Account created successfully! A welcome email has been sent.",
+            "refresh": str(refresh),
+            "access": str(refresh.access_token),
+            "user": {
+                "id": user.id,
+                "email": user.email,
+                "username": user.username,
+                "role": user.role,  # ✅ ADDED: Include role here too
             },
-            status=status.HTTP_201_CREATED,
-        )
+        },
+        status=status.HTTP_201_CREATED,
+    )
+    return merge_guest_cart(request, user, response)
 
 
-class UserView(viewsets.ModelViewSet):
+class UserView(SparseFieldsViewMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = CustomUser.objects.all()
     serializer_class = UserSerializer
+    fast_serializer_class = FastUserSerializer
 
     def get_permissions(self):
         if self.action == "create":
@@ -197,9 +300,10 @@ class UserView(viewsets.ModelViewSet):
         return CustomUser.objects.filter(id=user.id)
 
 
-class ProductView(viewsets.ModelViewSet):
+class ProductView(SparseFieldsViewMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
+    fast_serializer_class = FastProductSerializer
 
     def get_permissions(self):
         if self.action in ["create", "update", "partial_update", "destroy"]:
@@ -208,13 +312,17 @@ class ProductView(viewsets.ModelViewSet):
             permission_classes = [AllowAny]
         return [permission() for permission in permission_classes]
 
+    def perform_destroy(self, instance):
+        instance.archive()
 
-class CartView(viewsets.ModelViewSet):
+
+class CartView(SparseFieldsViewMixin, FastListMixin, viewsets.ModelViewSet):
     serializer_class = CartSerializer
+    fast_serializer_class = FastCartSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Cart.objects.filter(user=self.request.user)
+        return Cart.objects.filter(user=self.request.user, product__archived_at=None).select_related('product')
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -234,12 +342,55 @@ class CartView(viewsets.ModelViewSet):
             cart_item.save()
 
 
-class WishlistView(viewsets.ModelViewSet):
+class GuestCartView(SparseFieldsViewMixin, FastListMixin, viewsets.ModelViewSet):
+    serializer_class = GuestCartItemSerializer
+    fast_serializer_class = FastGuestCartItemSerializer
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get_queryset(self):
+        guest_cart = get_guest_cart(self.request)
+        if guest_cart is None:
+            return GuestCartItem.objects.none()
+        return guest_cart.items.filter(product__archived_at=None).select_related('product')
+
+    def create(self, request, *args, **kwargs):
+        # Invalid adds fail validation before perform_create, so they never create a cart
+        response = super().create(request, *args, **kwargs)
+        response.set_signed_cookie(
+            settings.GUEST_CART_COOKIE_NAME,
+            self.guest_cart.key,
+            salt=GUEST_CART_SALT,
+            max_age=settings.GUEST_CART_COOKIE_AGE,
+            httponly=True,
+            samesite='Lax',
+        )
+        return response
+
+    def perform_create(self, serializer):
+        self.guest_cart = get_guest_cart(self.request, create=True)
+        product = serializer.validated_data['product']
+        quantity = serializer.validated_data.get('quantity', 1)
+
+        cart_item, created = GuestCartItem.objects.get_or_create(
+            guest_cart=self.guest_cart,
+            product=product,
+            defaults={'quantity': quantity}
+        )
+
+        if not created:
+            cart_item.quantity += quantity
+            cart_item.save()
+        serializer.instance = cart_item
+
+
+class WishlistView(SparseFieldsViewMixin, FastListMixin, viewsets.ModelViewSet):
     serializer_class = WishlistSerializer
+    fast_serializer_class = FastWishlistSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Wishlist.objects.filter(user=self.request.user)
+        return Wishlist.objects.filter(user=self.request.user, product__archived_at=None).select_related('product')
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -252,23 +403,59 @@ class WishlistView(viewsets.ModelViewSet):
             pass
 
 
-class OrderView(viewsets.ModelViewSet):
+class OrderView(SparseFieldsViewMixin, FastListMixin, viewsets.ModelViewSet):
     serializer_class = OrderSerializer
+    fast_serializer_class = FastOrderSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         user = self.request.user
+        orders = Order.objects.select_related('user').prefetch_related(order_items_prefetch())
         if user.is_staff:
-            return Order.objects.all()
-        return Order.objects.filter(user=user)
+            return orders
+        # Abandoned card/UPI checkouts aren't orders as far as the customer is concerned
+        return orders.filter(user=user).exclude(Order.unpaid_online())
+
+    def get_archived_queryset(self):
+        # Reads only: archived orders are finished and can't be changed through the API
+        user = self.request.user
+        archived = ArchivedOrder.objects.select_related('user')
+        return archived if user.is_staff else archived.filter(user=user).exclude(Order.unpaid_online())
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        history_class = FastOrderSummaryHistorySerializer if wants_summary(request) else FastOrderHistorySerializer
+        history = history_class(queryset, self.get_archived_queryset(), context=self.get_serializer_context())
+        return Response(history.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            if not str(kwargs['pk']).isdigit():
+                raise
+            archived = self.get_archived_queryset().filter(pk=kwargs['pk'])
+            data = FastArchivedOrderSerializer(archived, context=self.get_serializer_context()).data
+            if not data:
+                raise
+            return Response(data[0])
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        serializer.save(user=load_deferred_fields(self.request.user))
 
+    @action(detail=True, methods=['get'])
+    def events(self, request, pk=None):
+        # Only the ownership check touches Order; the timeline is one range scan of the (order, created_at) index
+        if not (self.get_queryset().filter(pk=pk).exists() or self.get_archived_queryset().filter(pk=pk).exists()):
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        events = OrderEvent.objects.filter(order_id=pk).order_by('created_at', 'id')
+        return Response(OrderEventSerializer(events, many=True, context=self.get_serializer_context()).data)
 
-class OrderItemView(viewsets.ModelViewSet):
+
+class OrderItemView(SparseFieldsViewMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = OrderItem.objects.all()
     serializer_class = OrderItemSerializer
+    fast_serializer_class = FastOrderItemSerializer
 
     def get_permissions(self):
         if self.action in ["list", "retrieve"]:
@@ -281,35 +468,31 @@ class OrderItemView(viewsets.ModelViewSet):
 class ForgotPasswordView(APIView):
     permission_classes = [AllowAny]
 
+    @method_decorator(rate_limited('forgot_password', account=submitted_email))
     def post(self, request):
         email = request.data.get("email")
         if not email:
-            return Response(
-                {"detail": "Email is required"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+            return Response(EMAIL_REQUIRED, status=status.HTTP_400_BAD_REQUEST)
 
         try:
             user = CustomUser.objects.get(email=email)
         except CustomUser.DoesNotExist:
-            return Response(
-                {"detail": "User with this email does not exist"},
-                status=status.HTTP_404_NOT_FOUND,
-            )
+            return Response(NO_USER_WITH_EMAIL, status=status.HTTP_404_NOT_FOUND)
 
         otp = user.generate_otp()
-        send_mail(
-            subject="Password Reset OTP",
-            message=f"Your OTP for password reset is: {otp}\n\nThis OTP will expire in 10 minutes.",
-            from_email=settings.DEFAULT_FROM_EMAIL,  # Fixed: Use settings
-            recipient_list=[user.email],
-            fail_silently=False,
-        )
+        send_otp_email(user, otp)
+        return otp_sent_response(user)
 
-        return Response(
-            {"message": "OTP sent to your email for password reset", "email": user.email},
-            status=status.HTTP_200_OK,
-        )
+
+EMAIL_REQUIRED = {"detail": "Email is required"}
+NO_USER_WITH_EMAIL = {"detail": "User with this email does not exist"}
+
+
+def otp_sent_response(user):
+    return Response(
+        {"message": "OTP sent to your email for password reset", "email": user.email},
+        status=status.HTTP_200_OK,
+    )
 
 
 class ResetPasswordView(APIView):
@@ -350,48 +533,150 @@ class ResetPasswordView(APIView):
         )
 
 
+def get_cart_items(user):
+    # Rows of archived products are skipped until purge_archived_products removes them
+    return list(Cart.objects.filter(user=user, product__archived_at=None).select_related('product'))
+
+
+def cart_totals(cart_items):
+    subtotal = sum((item.product.price * item.quantity for item in cart_items), Decimal(0))
+    shipping = Decimal(50)
+    return subtotal, shipping, subtotal + shipping
+
+
+def place_order(user, cart_items, clear_cart=True, source='checkout', **fields):
+    # Turn the given cart rows into an order with its line items, then remove them from the cart
+    # (card/UPI orders keep the cart until the payment is confirmed)
+    subtotal, shipping, total_amount = cart_totals(cart_items)
+    with transaction.atomic(), OrderEventWriter(source, user) as events:
+        order = Order.objects.create(
+            user=user,
+            order_id=get_random_string(length=10).upper(),
+            subtotal=subtotal,
+            shipping=shipping,
+            total_amount=total_amount,
+            item_count=len(cart_items),
+            first_item_thumbnail=cart_items[0].product.image.name if cart_items else '',
+            **fields
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=item.product,
+                quantity=item.quantity,
+                price=item.product.price,
+                **OrderItem.product_snapshot(item.product)
+            )
+            for item in cart_items
+        ])
+        events.add_created(order)
+        if clear_cart:
+            Cart.objects.filter(pk__in=[item.pk for item in cart_items]).delete()
+
+    # The response serializes order.user; request.user may hold only the cached auth fields
+    load_deferred_fields(user)
+    prefetch_related_objects([order], order_items_prefetch())
+    return order
+
+
+def clear_ordered_cart_items(order_ids):
+    products_by_user = {}
+    for user_id, product_id in OrderItem.objects.filter(order_id__in=order_ids).values_list('order__user_id', 'product_id'):
+        products_by_user.setdefault(user_id, []).append(product_id)
+
+    condition = Q()
+    for user_id, product_ids in products_by_user.items():
+        condition |= Q(user_id=user_id, product_id__in=product_ids)
+    if condition:
+        Cart.objects.filter(condition).delete()
+
+
+def confirm_pending_order(user, razorpay_order_id, razorpay_payment_id):
+    # Card/UPI orders recorded by create_razorpay_order stay pending until the payment is verified
+    # (here or by the webhook worker); the conditional update keeps the two from both applying it.
+    # A failed attempt before this one doesn't count: the customer may retry inside the same order
+    with transaction.atomic(), OrderEventWriter('payment', user) as events:
+        pending = Order.objects.select_for_update().filter(
+            user=user, razorpay_order_id=razorpay_order_id, payment_status__in=order_status.CAPTURABLE
+        )
+        before = list(pending.values('pk', 'status', 'payment_status'))
+        if not before:
+            return None
+        Order.objects.filter(pk__in=[row['pk'] for row in before], payment_status__in=order_status.CAPTURABLE).update(
+            status=order_status.captured_status(),
+            payment_status='paid',
+            razorpay_payment_id=razorpay_payment_id,
+            updated_at=timezone.now(),
+        )
+        for row in before:
+            events.add_changes(row['pk'], row, order_status.captured_changes(row['status']))
+        order = get_paid_order(user, razorpay_payment_id)
+        clear_ordered_cart_items([order.pk])
+    return order
+
+
+def get_paid_order(user, razorpay_payment_id):
+    return (
+        Order.objects.filter(user=user, razorpay_payment_id=razorpay_payment_id)
+        .select_related('user').prefetch_related(order_items_prefetch()).first()
+    )
+
+
+# razorpay_payment_id is unique across orders, so a payment can't pay for a second one
+PAYMENT_IN_USE = {"error": "This payment has already been used for another order."}
+
+
+def payment_conflict_response(user, razorpay_payment_id):
+    # A concurrent verification of the same payment won the unique constraint, or the payment is on another order
+    order = get_paid_order(user, razorpay_payment_id)
+    if order is None:
+        return Response(PAYMENT_IN_USE, status=status.HTTP_409_CONFLICT)
+    return Response(already_verified_response(order), status=status.HTTP_200_OK)
+
+
+def already_verified_response(order):
+    return {
+        "message": "Payment already verified.",
+        "order_id": order.order_id,
+        "order": OrderSerializer(order).data
+    }
+
+
+def status_changes(data):
+    # Statuses are stored lowercase; the admin page has sent 'Shipped' and the like
+    return {
+        field: value.lower() if isinstance(value, str) else value
+        for field, value in ((field, data.get(field)) for field in order_status.TRANSITIONS) if value
+    }
+
+
+def gateway_retry_headers():
+    return {"Retry-After": str(max(1, math.ceil(get_gateway().breaker.retry_after())))}
+
+
+def gateway_unavailable_response(error):
+    return Response({"error": str(error)}, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers=gateway_retry_headers())
+
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@rate_limited('checkout', account=user_id)
+@idempotent
 def Checkout(request):
     user = request.user
-    cart_items = Cart.objects.filter(user=user)
+    cart_items = get_cart_items(user)
 
-    if not cart_items.exists():
+    if not cart_items:
         return Response({"error": "Cart is empty"}, status=status.HTTP_400_BAD_REQUEST)
 
-    subtotal = Decimal(0)
-    for cart_item in cart_items:
-        product = cart_item.product
-        quantity = cart_item.quantity
-        subtotal += product.price * quantity
-
-    shipping = Decimal(50)
-    total_amount = subtotal + shipping
-
-    # Create order
-    order = Order.objects.create(
-        user=user,
-        order_id=get_random_string(length=10).upper(),
-        subtotal=subtotal,
-        shipping=shipping,
-        total_amount=total_amount,
+    order = place_order(
+        user,
+        cart_items,
         payment_method=request.data.get("payment_method", "cash"),
         status='pending',
         payment_status='pending'
     )
 
-    # Create order items and link to order
-    for cart_item in cart_items:
-        order_item = OrderItem.objects.create(
-            order=order,  # Fixed: Link to order
-            product=cart_item.product,
-            quantity=cart_item.quantity,
-            price=cart_item.product.price
-        )
-
-    # Clear cart
-    cart_items.delete()
-
     serializer = OrderSerializer(order)
     return Response({
         "message": "Order created successfully",
@@ -399,50 +684,23 @@ def Checkout(request):
     }, status=status.HTTP_201_CREATED)
 
 
-@api_view(["POST"])
-@permission_classes([IsAuthenticated])
-def create_razorpay_order(request):
+def plan_razorpay_order(request):
+    """The first half of create_razorpay_order, up to the gateway call.
+
+    Returns the response when no gateway order is needed (empty cart, cash,
+    a bad payment method), else (cart_items, total_amount, amount_paise).
+    """
     user = request.user
     payment_method = request.data.get("payment_method", "card")
 
-    cart_items = Cart.objects.filter(user=user)
-    if not cart_items.exists():
+    cart_items = get_cart_items(user)
+    if not cart_items:
         return Response({"error": "Cart is empty"}, status=status.HTTP_400_BAD_REQUEST)
 
-    subtotal = Decimal(0)
-    for item in cart_items:
-        subtotal += item.product.price * item.quantity
-
-    shipping = Decimal(50)
-    total_amount = subtotal + shipping
-
     # For cash: create DB order directly
     if payment_method == "cash":
         try:
-            # Create order first
-            order = Order.objects.create(
-                user=user,
-                order_id=get_random_string(length=10).upper(),
-                subtotal=subtotal,
-                shipping=shipping,
-                total_amount=total_amount,
-                payment_method="cash",
-                status="pending",
-                payment_status="pending",
-            )
-
-            # Create order items and link them to the order
-            for item in cart_items:
-                order_item = OrderItem.objects.create(
-                    order=order,  # Fixed: Link to order
-                    product=item.product,
-                    quantity=item.quantity,
-                    price=item.product.price
-                )
-                # No need to use order.items.add() since we're setting the order directly
-
-            # Clear cart
-            cart_items.delete()
+            order = place_order(user, cart_items, payment_method="cash", status="pending", payment_status="pending")
 
             serializer = OrderSerializer(order)
             return Response({
@@ -459,28 +717,9 @@ def create_razorpay_order(request):
 
     # For UPI/Card: create Razorpay order
     elif payment_method in ["upi", "card"]:
+        _, _, total_amount = cart_totals(cart_items)
         amount_paise = int(total_amount * 100)  # Razorpay amount is in paise
-        
-        try:
-            razorpay_order = client.order.create({
-                "amount": amount_paise,
-                "currency": "INR",
-                "payment_capture": 1,  # automatic capture
-            })
-            
-            return Response({
-                "razorpay_order_id": razorpay_order["id"],
-                "amount": float(total_amount),
-                "amount_paise": amount_paise,
-                "currency": "INR",
-                "key_id": settings.RAZORPAY_KEY_ID,
-            }, status=status.HTTP_200_OK)
-            
-        except Exception as e:
-            return Response(
-                {"error": f"Failed to create Razorpay order: {str(e)}"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        return cart_items, total_amount, amount_paise
 
     else:
         return Response(
@@ -489,8 +728,57 @@ def create_razorpay_order(request):
         )
 
 
+def record_razorpay_order(request, plan, razorpay_order):
+    """The second half of create_razorpay_order: the pending order for the gateway's order."""
+    cart_items, total_amount, amount_paise = plan
+    order = place_order(
+        request.user,
+        cart_items,
+        clear_cart=False,
+        payment_method=request.data.get("payment_method", "card"),
+        status="pending",
+        payment_status="pending",
+        razorpay_order_id=razorpay_order["id"],
+    )
+    return Response({
+        "order_id": order.order_id,
+        "razorpay_order_id": razorpay_order["id"],
+        "amount": float(total_amount),
+        "amount_paise": amount_paise,
+        "currency": "INR",
+        "key_id": settings.RAZORPAY_KEY_ID,
+    }, status=status.HTTP_200_OK)
+
+
+def razorpay_order_failed_response(error):
+    if isinstance(error, GatewayUnavailable):
+        return gateway_unavailable_response(error)
+    return Response(
+        {"error": f"Failed to create Razorpay order: {str(error)}"},
+        status=status.HTTP_500_INTERNAL_SERVER_ERROR
+    )
+
+
+# backend.async_views has the async twin of this view, sharing the two halves around the gateway call
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@rate_limited('create_razorpay_order', account=user_id)
+@idempotent
+def create_razorpay_order(request):
+    plan = plan_razorpay_order(request)
+    if isinstance(plan, Response):
+        return plan
+    _, _, amount_paise = plan
+    try:
+        razorpay_order = get_gateway().create_order(amount_paise, currency="INR")
+        return record_razorpay_order(request, plan, razorpay_order)
+    except Exception as e:
+        return razorpay_order_failed_response(e)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@idempotent
 def verify_razorpay_payment(request):
     user = request.user
     razorpay_payment_id = request.data.get("razorpay_payment_id")
@@ -511,33 +799,42 @@ def verify_razorpay_payment(request):
     }
 
     try:
-        client.utility.verify_payment_signature(params_dict)
+        get_gateway().verify_payment_signature(params_dict)
     except razorpay.errors.SignatureVerificationError:
         return Response(
             {"error": "Payment verification failed"}, 
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    # Payment successful → create DB order
-    cart_items = Cart.objects.filter(user=user)
-    if not cart_items.exists():
+    # A retried verification returns the order the payment already created
+    order = get_paid_order(user, razorpay_payment_id)
+    if order:
+        return Response(already_verified_response(order), status=status.HTTP_200_OK)
+
+    try:
+        order = confirm_pending_order(user, razorpay_order_id, razorpay_payment_id)
+    except IntegrityError:
+        return payment_conflict_response(user, razorpay_payment_id)
+    if order:
+        return Response({
+            "message": "Payment successful & order created!",
+            "order_id": order.order_id,
+            "order": OrderSerializer(order).data
+        }, status=status.HTTP_201_CREATED)
+
+    # No pending order recorded for this payment → create DB order from the cart
+    cart_items = get_cart_items(user)
+    if not cart_items:
         return Response(
             {"error": "Cart items not found"}, 
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    subtotal = sum([item.product.price * item.quantity for item in cart_items])
-    shipping = Decimal(50)
-    total_amount = subtotal + shipping
-
     try:
-        # Create order first
-        order = Order.objects.create(
-            user=user,
-            order_id=get_random_string(length=10).upper(),
-            subtotal=subtotal,
-            shipping=shipping,
-            total_amount=total_amount,
+        order = place_order(
+            user,
+            cart_items,
+            source="payment",
             payment_method="card",
             status="processing",
             payment_status="paid",
@@ -545,24 +842,15 @@ def verify_razorpay_payment(request):
             razorpay_order_id=razorpay_order_id
         )
 
-        # Create order items and link them to the order
-        for item in cart_items:
-            order_item = OrderItem.objects.create(
-                order=order,  # Fixed: Link to order
-                product=item.product,
-                quantity=item.quantity,
-                price=item.product.price
-            )
-
-        # Clear cart
-        cart_items.delete()
-
         serializer = OrderSerializer(order)
         return Response({
             "message": "Payment successful & order created!", 
             "order_id": order.order_id,
             "order": serializer.data
         }, status=status.HTTP_201_CREATED)
+
+    except IntegrityError:
+        return payment_conflict_response(user, razorpay_payment_id)
         
     except Exception as e:
         return Response(
@@ -571,29 +859,109 @@ def verify_razorpay_payment(request):
         )
 
 
+@api_view(["POST"])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def razorpay_webhook(request):
+    # Verify and enqueue only; process_payment_webhooks applies the events in batches
+    if not settings.RAZORPAY_WEBHOOK_SECRET:
+        logger.error("RAZORPAY_WEBHOOK_SECRET is not set; rejecting Razorpay webhook")
+        return Response({"error": "Webhooks are not configured"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    body = request.body
+    try:
+        get_gateway().verify_webhook_signature(
+            body.decode(), request.headers.get("X-Razorpay-Signature", ""), settings.RAZORPAY_WEBHOOK_SECRET
+        )
+        payload = json.loads(body)
+    except (razorpay.errors.SignatureVerificationError, ValueError):
+        return Response({"error": "Invalid webhook"}, status=status.HTTP_400_BAD_REQUEST)
+
+    PaymentWebhookEvent.objects.create(
+        # Fall back to the body hash so replays without the header still dedupe
+        event_id=request.headers.get("X-Razorpay-Event-Id") or hashlib.sha256(body).hexdigest(),
+        event=payload.get("event", ""),
+        payload=payload,
+    )
+    return Response({"status": "queued"}, status=status.HTTP_200_OK)
+
+
+class BootstrapView(APIView):
+    """What the SPA loads on first render, in one round trip with one authentication.
+
+    ?include=products,cart,wishlist,profile picks the sections (all by default).
+    Anonymous users get their guest cart, an empty wishlist and a null profile.
+    """
+    permission_classes = [AllowAny]
+    SECTIONS = ('products', 'cart', 'wishlist', 'profile')
+
+    def get(self, request):
+        include = request.query_params.get('include')
+        sections = [section for section in include.split(',') if section] if include else self.SECTIONS
+        unknown = sorted(set(sections) - set(self.SECTIONS))
+        if unknown:
+            return Response({"error": f"Unknown sections: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        context = {'request': request}
+        return Response({section: getattr(self, f'get_{section}')(request, context) for section in sections})
+
+    # Sections are whole lists: omit={} stops the fast serializers from applying ?fields= to each of them
+
+    def get_products(self, request, context):
+        return FastProductSerializer(Product.objects.all(), context=context, omit={}).data
+
+    def get_cart(self, request, context):
+        if request.user.is_authenticated:
+            return FastCartSerializer(Cart.objects.filter(user=request.user, product__archived_at=None), context=context, omit={}).data
+        guest_cart = get_guest_cart(request)
+        if guest_cart is None:
+            return []
+        return FastGuestCartItemSerializer(guest_cart.items.filter(product__archived_at=None), context=context, omit={}).data
+
+    def get_wishlist(self, request, context):
+        if not request.user.is_authenticated:
+            return []
+        return FastWishlistSerializer(Wishlist.objects.filter(user=request.user, product__archived_at=None), context=context, omit={}).data
+
+    def get_profile(self, request, context):
+        if not request.user.is_authenticated:
+            return None
+        # request.user may hold only the auth fields cached by CachedJWTAuthentication
+        return UserSerializer(load_deferred_fields(request.user), context=context).data
+
+
 class AdminDashboardView(APIView):
     permission_classes = [IsAdminUser]
 
     def get(self, request):
-        # Fetch all data
-        orders = Order.objects.all().order_by('-created_at')
+        # One pass over the raw order rows, archived ones included, both aggregates and
+        # serializes them. Only money actually taken counts: unpaid and refunded card/UPI
+        # orders are left out
+        unpaid = Order.unpaid_online(settled=('paid',))
+        orders_serializer = FastOrderHistorySerializer(Order.objects.exclude(unpaid), ArchivedOrder.objects.exclude(unpaid))
         products = Product.objects.all()
         users = CustomUser.objects.all()
 
-        # Calculate total revenue
-        total_revenue = sum([float(order.total_amount or 0) for order in orders])
-
-        # Sales data grouped by date
+        total_revenue = 0
         sales_dict = {}
         category_count = {}
+        orders = []
+        recent_orders = []
+
+        for order in orders_serializer.iter_rows():
+            orders.append(orders_serializer.to_representation(order))
+            if len(recent_orders) < 4:
+                recent_orders.append(order)
+
+            # Calculate total revenue
+            total_revenue += float(order['total_amount'] or 0)
 
-        for order in orders:
-            date_str = order.created_at.strftime("%Y-%m-%d")
-            sales_dict[date_str] = sales_dict.get(date_str, 0) + float(order.total_amount or 0)
+            # Sales data grouped by date
+            date_str = order['created_at'].strftime("%Y-%m-%d")
+            sales_dict[date_str] = sales_dict.get(date_str, 0) + float(order['total_amount'] or 0)
 
-            for item in order.items.all():
-                category = item.product.category if item.product.category else "Uncategorized"
-                category_count[category] = category_count.get(category, 0) + item.quantity
+            for item in order['items']:
+                category = item['product_category'] or "Uncategorized"
+                category_count[category] = category_count.get(category, 0) + item['quantity']
 
         sales_data = [{"date": date, "total": total} for date, total in sales_dict.items()]
         category_data = [{"name": name, "value": value} for name, value in category_count.items()]
@@ -603,27 +971,27 @@ class AdminDashboardView(APIView):
             {
                 "id": idx + 1,
                 "type": "order",
-                "message": f"New order from {order.user.username if order.user else 'Customer'}",
-                "time": order.created_at.strftime("%H:%M:%S"),
-                "amount": f"₹{order.total_amount or 0}"
+                "message": f"New order from {order['user__username'] or 'Customer'}",
+                "time": order['created_at'].strftime("%H:%M:%S"),
+                "amount": f"₹{order['total_amount'] or 0}"
             }
-            for idx, order in enumerate(orders[:4])
+            for idx, order in enumerate(recent_orders)
         ]
 
         # Serialize users and products
-        users_serializer = UserSerializer(users, many=True)
-        products_serializer = ProductSerializer(products, many=True)
+        users_serializer = FastUserSerializer(users)
+        products_serializer = FastProductSerializer(products)
 
         # Return consolidated response
         return Response({
             "totalRevenue": float(total_revenue),
-            "totalOrders": orders.count(),
+            "totalOrders": len(orders),
             "totalUsers": users.count(),
             "totalProducts": products.count(),
             "salesData": sales_data,
             "categoryData": category_data,
             "recentActivity": recent_activity,
-            "orders": OrderSerializer(orders, many=True).data,
+            "orders": orders,
             "users": users_serializer.data,
             "products": products_serializer.data
         })
@@ -675,7 +1043,7 @@ class AdminProductsView(APIView):
 
     def delete(self, request, pk=None):
         product = get_object_or_404(Product, pk=pk)
-        product.delete()
+        product.archive()
         return Response({"message": "Product deleted successfully"}, status=status.HTTP_200_OK)
 
 
@@ -684,21 +1052,69 @@ class AdminOrderView(APIView):
 
     def get(self, request, pk=None):
         if pk:
-            order = get_object_or_404(Order.objects.select_related('user').prefetch_related('items'), pk=pk)
-            serializer = OrderSerializer(order)
-            return Response(serializer.data)
+            order = Order.objects.select_related('user').prefetch_related(order_items_prefetch()).filter(pk=pk).first()
+            if order:
+                return Response(OrderSerializer(order).data)
+            # Archived orders can be looked at but not changed
+            data = FastArchivedOrderSerializer(ArchivedOrder.objects.filter(pk=pk)).data
+            if not data:
+                raise Http404
+            return Response(data[0])
         else:
-            orders = Order.objects.all().select_related('user').prefetch_related('items').order_by('-created_at')
-            serializer = OrderSerializer(orders, many=True)
-            return Response(serializer.data)
+            field_tree, omit_tree = sparse_fieldsets(request)
+            history_class = FastAdminOrderSummaryHistorySerializer if wants_summary(request) else FastOrderHistorySerializer
+            history = history_class(Order.objects.all(), ArchivedOrder.objects.all(), fields=field_tree, omit=omit_tree)
+            return Response(history.data)
 
     def patch(self, request, pk=None):
-        order = get_object_or_404(Order.objects.select_related('user').prefetch_related('items'), pk=pk)
-        status_value = request.data.get("status")
-        if not status_value:
+        order = get_object_or_404(Order.objects.only('pk', 'status', 'payment_status'), pk=pk)
+        changes = status_changes(request.data)
+        if not changes:
             return Response({"error": "Status field is required."}, status=400)
 
-        order.status = status_value
-        order.save()
+        # Setting the current value again is a no-op, not an illegal transition
+        changes = {field: value for field, value in changes.items() if getattr(order, field) != value}
+        try:
+            if changes and not order_status.transition(Order.objects.filter(pk=pk), 'admin', request.user, **changes):
+                moves = ", ".join(f"{field} from '{getattr(order, field)}' to '{value}'" for field, value in changes.items())
+                return Response({"error": f"Cannot change {moves}."}, status=400)
+        except order_status.TransitionError as e:
+            return Response({"error": str(e)}, status=400)
+
+        order = Order.objects.select_related('user').prefetch_related(order_items_prefetch()).get(pk=pk)
         serializer = OrderSerializer(order)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+
+class AdminOrderBulkStatusView(APIView):
+    """Moves many orders in one conditional UPDATE, e.g. a dispatch batch from processing to shipped."""
+    permission_classes = [IsAdminUser, IsAdminRole]
+    max_ids = 5000
+
+    def post(self, request):
+        ids = request.data.get("ids")
+        if not isinstance(ids, list) or not ids or not all(isinstance(pk, int) for pk in ids):
+            return Response({"error": "'ids' must be a non-empty list of order ids."}, status=400)
+        if len(ids) > self.max_ids:
+            return Response({"error": f"At most {self.max_ids} orders per request."}, status=400)
+        changes = status_changes(request.data)
+        if not changes:
+            return Response({"error": "Give 'status' and/or 'payment_status'."}, status=400)
+
+        try:
+            updated = order_status.transition(Order.objects.filter(pk__in=ids), 'admin', request.user, **changes)
+        except order_status.TransitionError as e:
+            return Response({"error": str(e)}, status=400)
+        changed = set(updated)
+        # Skipped ids don't exist or aren't in a state the change is allowed from
+        return Response({**changes, "updated": updated, "skipped": [pk for pk in dict.fromkeys(ids) if pk not in changed]})
+
+
+class MetricsView(APIView):
+    permission_classes = [IsAdminUser, IsAdminRole]
+
+    def get(self, request):
+        return HttpResponse(
+            metrics.to_prometheus() + gateway_metrics.to_prometheus(),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
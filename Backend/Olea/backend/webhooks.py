@@ -0,0 +1,115 @@
+"""
+Razorpay webhook inbox.
+
+The endpoint only verifies the signature and appends the raw event to
+PaymentWebhookEvent. ``manage.py process_payment_webhooks`` drains the inbox
+in batches, drops events whose id was already processed and applies the
+resulting payment transitions to Order with a few set-based updates.
+"""
+from django.db import transaction
+from django.db.models import Case, CharField, Value, When
+from django.utils import timezone
+
+from . import order_status
+from .models import Order, PaymentWebhookEvent
+from .order_events import OrderEventWriter
+from .views import clear_ordered_cart_items
+
+CAPTURED_EVENTS = ('payment.captured', 'order.paid')
+FAILED_EVENTS = ('payment.failed',)
+REFUND_EVENTS = ('refund.created', 'refund.processed')
+
+
+def entity(payload, name):
+    return (payload.get('payload', {}).get(name) or {}).get('entity') or {}
+
+
+def apply_captured(captured, events):
+    """captured maps razorpay_order_id -> razorpay_payment_id; returns the order ids it matched."""
+    orders = list(
+        Order.objects.filter(razorpay_order_id__in=captured, payment_status__in=order_status.CAPTURABLE)
+        .values_list('pk', 'razorpay_order_id', 'status', 'payment_status')
+    )
+    if not orders:
+        return set()
+
+    Order.objects.filter(pk__in=[row[0] for row in orders], payment_status__in=order_status.CAPTURABLE).update(
+        status=order_status.captured_status(),
+        payment_status='paid',
+        razorpay_payment_id=Case(
+            *[When(razorpay_order_id=order_id, then=Value(captured[order_id])) for _, order_id, _, _ in orders],
+            output_field=CharField(),
+        ),
+        updated_at=timezone.now(),
+    )
+    for pk, _, status, payment_status in orders:
+        events.add_changes(pk, {'status': status, 'payment_status': payment_status}, order_status.captured_changes(status))
+    clear_ordered_cart_items([row[0] for row in orders])
+    return {order_id for _, order_id, _, _ in orders}
+
+
+def apply_payment_status(orders, key, events, from_status, to_status, now):
+    """Move ``orders`` from one payment status to another; returns the ``key`` values of the orders it matched."""
+    rows = list(orders.filter(payment_status=from_status).values_list('pk', key))
+    if rows:
+        Order.objects.filter(pk__in=[pk for pk, _ in rows], payment_status=from_status).update(
+            payment_status=to_status, updated_at=now
+        )
+    for pk, _ in rows:
+        events.add(pk, 'payment_status', from_status, to_status)
+    return {value for _, value in rows}
+
+
+def process_webhook_batch(batch_size=200):
+    """Process up to batch_size unprocessed events; returns how many were consumed."""
+    with transaction.atomic(), OrderEventWriter('webhook') as order_events:
+        events = list(
+            PaymentWebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(processed_at__isnull=True).order_by('id')[:batch_size]
+        )
+        if not events:
+            return 0
+
+        seen = set(
+            PaymentWebhookEvent.objects.filter(
+                event_id__in={event.event_id for event in events}, processed_at__isnull=False
+            ).values_list('event_id', flat=True)
+        )
+        captured, failed, refunded = {}, set(), set()
+        for event in events:
+            if event.event_id in seen:
+                event.outcome = 'duplicate'
+                continue
+            seen.add(event.event_id)
+
+            payment = entity(event.payload, 'payment')
+            if event.event in CAPTURED_EVENTS and payment.get('order_id'):
+                captured[payment['order_id']] = payment['id']
+            elif event.event in FAILED_EVENTS and payment.get('order_id'):
+                failed.add(payment['order_id'])
+            elif event.event in REFUND_EVENTS and entity(event.payload, 'refund').get('payment_id'):
+                refunded.add(entity(event.payload, 'refund')['payment_id'])
+            else:
+                event.outcome = 'ignored'
+
+        # A capture wins over an earlier failed attempt for the same order
+        failed -= captured.keys()
+        matched = apply_captured(captured, order_events) if captured else set()
+        now = timezone.now()
+        if failed:
+            matched |= apply_payment_status(
+                Order.objects.filter(razorpay_order_id__in=failed), 'razorpay_order_id', order_events, 'pending', 'failed', now
+            )
+        if refunded:
+            matched |= apply_payment_status(
+                Order.objects.filter(razorpay_payment_id__in=refunded), 'razorpay_payment_id', order_events, 'paid', 'refunded', now
+            )
+
+        for event in events:
+            event.processed_at = now
+            if not event.outcome:
+                payment, refund = entity(event.payload, 'payment'), entity(event.payload, 'refund')
+                key = refund.get('payment_id') if event.event in REFUND_EVENTS else payment.get('order_id')
+                event.outcome = 'applied' if key in matched else 'unmatched'
+        PaymentWebhookEvent.objects.bulk_update(events, ['processed_at', 'outcome'])
+    return len(events)
@@ -0,0 +1,25 @@
+# Gunicorn managing uvicorn workers for the ASGI app (pip install uvicorn-worker):
+#
+#     gunicorn Olea.asgi:application -c gunicorn.conf.py
+#
+# Each worker runs one event loop. The async views (backend.async_views) wait on
+# Razorpay and SMTP without holding a thread, so one worker keeps taking checkouts
+# while payment calls are in flight; the other views run in Django's thread pool.
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = 'uvicorn_worker.UvicornWorker'
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+
+# A stuck worker gets recycled
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers periodically to bound memory growth
+max_requests = 2000
+max_requests_jitter = 200
+
+accesslog = '-'
+errorlog = '-'
@@ -22,7 +22,7 @@ function ManageOrders() {
     try {
       setError(null);
       setLoading(true);
-      const res = await axiosInstance.get("/manage-orders/");
+      const res = await axiosInstance.get("/manage-orders/", { params: { view: "summary" } });
       console.log("Orders API Response:", res.data);
       setOrders(Array.isArray(res.data) ? res.data : []);
     } catch (err) {
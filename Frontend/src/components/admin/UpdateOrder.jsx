@@ -30,7 +30,7 @@ export default function UpdateOrder() {
       setLoading(true);
       const res = await axiosInstance.get(`/manage-orders/${id}/`);
       setOrder(res.data);
-      setStatus(res.data.status || "");
+      setStatus(res.data.status?.toLowerCase() || "");
     } catch (err) {
       console.error("Error fetching order details", err);
       setError(err.response?.data?.message || "Failed to fetch order details.");
@@ -91,7 +91,14 @@ export default function UpdateOrder() {
     }
   };
 
-  const statusOptions = ["Pending", "Processing", "Shipped", "Delivered", "Cancelled"];
+  // Values are what the API accepts; labels are for display
+  const statusOptions = [
+    { value: "pending", label: "Pending" },
+    { value: "processing", label: "Processing" },
+    { value: "shipped", label: "Shipped" },
+    { value: "delivered", label: "Delivered" },
+    { value: "cancelled", label: "Cancelled" },
+  ];
 
   if (loading) {
     return (
@@ -192,8 +199,8 @@ export default function UpdateOrder() {
                 className="w-full border border-gray-300 rounded-lg px-3 py-2 focus:ring-2 focus:ring-purple-500"
               >
                 {statusOptions.map((s) => (
-                  <option key={s} value={s}>
-                    {s}
+                  <option key={s.value} value={s.value}>
+                    {s.label}
                   </option>
                 ))}
               </select>
@@ -14,8 +14,7 @@ export const CartWishlistProvider = ({ children }) => {
 
   useEffect(() => {
     if (user) {
-      loadCartCount();
-      loadWishlist();
+      loadInitialState();
     } else {
       setWishlist([]);
       setWishlistCount(0);
@@ -24,6 +23,21 @@ export const CartWishlistProvider = ({ children }) => {
   }, [user]);
 
 
+  // Cart and wishlist arrive in one /bootstrap/ round trip on login and page load
+  const loadInitialState = async () => {
+    try {
+      const res = await axiosInstance.get("/bootstrap/", { params: { include: "cart,wishlist" } });
+      setCartCount(res.data.cart.reduce((sum, item) => sum + (item.quantity || 1), 0));
+      setWishlist(res.data.wishlist);
+      setWishlistCount(res.data.wishlist.length);
+    } catch (err) {
+      console.error("Failed to load cart and wishlist", err.response || err);
+      setWishlist([]);
+      setWishlistCount(0);
+      setCartCount(0);
+    }
+  };
+
   const loadCartCount = async () => {
     if (!user) {
       setCartCount(0);
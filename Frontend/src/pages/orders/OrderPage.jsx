@@ -9,6 +9,7 @@ const OrderPage = () => {
   const [orders, setOrders] = useState([]);
   const [loading, setLoading] = useState(true);
   const [expandedOrder, setExpandedOrder] = useState(null);
+  const [orderItems, setOrderItems] = useState({});
   const navigate = useNavigate();
   const location = useLocation();
 
@@ -22,7 +23,8 @@ const OrderPage = () => {
     const fetchOrders = async () => {
       if (!user?.id) return;
       try {
-        const res = await axiosInstance.get('/orders/');
+        // Compact rows read from the order table alone; items are fetched when an order is expanded
+        const res = await axiosInstance.get('/orders/', { params: { view: 'summary' } });
         
         const transformedOrders = res.data.map(order => ({
           orderId: order.order_id,
@@ -32,18 +34,11 @@ const OrderPage = () => {
           paymentStatus: order.payment_status,
           paymentMethod: order.payment_method,
           totalAmount: parseFloat(order.total_amount),
-          subtotal: parseFloat(order.subtotal),
-          shipping: parseFloat(order.shipping),
-          items: order.items ? order.items.map(item => ({
-            id: item.id,
-            name: item.product?.name || 'Product',
-            price: parseFloat(item.price || item.product?.price || 0),
-            quantity: item.quantity,
-            image: item.product?.image || '/placeholder-image.jpg'
-          })) : []
+          itemCount: order.item_count,
+          thumbnail: order.first_item_thumbnail
         }));
         
-        setOrders(transformedOrders.reverse()); 
+        setOrders(transformedOrders); 
       } catch (err) {
         console.error('Failed to fetch orders', err.response?.data || err);
       } finally {
@@ -54,6 +49,30 @@ const OrderPage = () => {
     fetchOrders();
   }, [user]);
 
+  const toggleItems = async (order) => {
+    if (expandedOrder === order.id) {
+      setExpandedOrder(null);
+      return;
+    }
+    if (!orderItems[order.id]) {
+      try {
+        const res = await axiosInstance.get(`/orders/${order.id}/`);
+        const items = res.data.items.map(item => ({
+          id: item.id,
+          name: item.product?.name || 'Product',
+          price: parseFloat(item.price || 0),
+          quantity: item.quantity,
+          image: item.product?.image || '/placeholder-image.jpg'
+        }));
+        setOrderItems(prev => ({ ...prev, [order.id]: items }));
+      } catch (err) {
+        console.error('Failed to fetch order items', err.response?.data || err);
+        return;
+      }
+    }
+    setExpandedOrder(order.id);
+  };
+
   const getStatusIcon = (status) => {
     switch (status?.toLowerCase()) {
       case 'delivered':
@@ -243,7 +262,7 @@ const OrderPage = () => {
                         </span>
                         <span className="flex items-center">
                           <Package className="w-4 h-4 mr-1" />
-                          {order.items?.length || 0} item{(order.items?.length || 0) > 1 ? 's' : ''}
+                          {order.itemCount || 0} item{(order.itemCount || 0) > 1 ? 's' : ''}
                         </span>
                         <span className="flex items-center">
                           <CreditCard className="w-4 h-4 mr-1" />
@@ -282,9 +301,9 @@ const OrderPage = () => {
                   </div>
                 )}
 
-                {/* Items Preview */}
+                {/* Items Preview: the first item's picture until the order is expanded */}
                 <div className="space-y-4">
-                  {order.items?.slice(0, expandedOrder === order.orderId ? order.items.length : 2).map((item, itemIndex) => (
+                  {expandedOrder === order.id ? orderItems[order.id].map((item, itemIndex) => (
                     <div key={item.id || itemIndex} className="flex items-center space-x-4 p-4 bg-gray-50/50 rounded-2xl hover:bg-gray-50 transition-colors">
                       <div className="flex-shrink-0">
                         <img
@@ -307,18 +326,36 @@ const OrderPage = () => {
                         )}
                       </div>
                     </div>
-                  ))}
+                  )) : order.itemCount > 0 && (
+                    <div className="flex items-center space-x-4 p-4 bg-gray-50/50 rounded-2xl">
+                      <div className="flex-shrink-0">
+                        <img
+                          src={order.thumbnail || '/placeholder-image.jpg'}
+                          alt={`Order ${order.orderId}`}
+                          className="w-16 h-16 object-cover rounded-xl shadow-md"
+                          onError={(e) => {
+                            e.target.src = '/placeholder-image.jpg';
+                          }}
+                        />
+                      </div>
+                      <div className="flex-1 min-w-0">
+                        <h4 className="font-semibold text-gray-900">
+                          {order.itemCount} item{order.itemCount > 1 ? 's' : ''}
+                        </h4>
+                      </div>
+                    </div>
+                  )}
 
-                  {order.items?.length > 2 && (
+                  {order.itemCount > 0 && (
                     <button
-                      onClick={() => setExpandedOrder(expandedOrder === order.orderId ? null : order.orderId)}
+                      onClick={() => toggleItems(order)}
                       className="w-full flex items-center justify-center space-x-2 py-3 text-purple-600 hover:text-purple-800 font-medium transition-colors"
                     >
                       <Eye className="w-4 h-4" />
                       <span>
-                        {expandedOrder === order.orderId 
-                          ? 'Show Less' 
-                          : `View ${order.items.length - 2} More Items`}
+                        {expandedOrder === order.id 
+                          ? 'Hide Items' 
+                          : `View Item${order.itemCount > 1 ? 's' : ''}`}
                       </span>
                     </button>
                   )}